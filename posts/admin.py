@@ -1,18 +1,239 @@
+import datetime as dt
+
 from ckeditor.widgets import CKEditorWidget
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.auth.admin import UserAdmin
 from django.contrib.flatpages.admin import FlatPageAdmin
 from django.contrib.flatpages.models import FlatPage
-from django.db import models
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.db.models import Case, Count, OuterRef, Subquery, When
+from django.db.models.functions import Substr
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-from .models import Comment, Follow, Group, Post
+from . import fingerprints, moderation
+from .deletion import delete_posts, delete_users, invalidate_feed_caches
+from .notfound import forget_posts
+from .models import Comment, Flag, Follow, Group, Post, User
+from .routers import sharding_enabled
+from .sharding import each_shard
 
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ("pk", "text", "pub_date", "author")
-    search_fields = ("text",)
-    list_filter = ("pub_date",)
+PREVIEW_LENGTH = 80
+
+
+def estimated_count(queryset):
+    """
+    Оценка числа строк таблицы по статистике СУБД или None.
+
+    PostgreSQL хранит оценку в pg_class.reltuples, SQLite — в sqlite_stat1
+    после ANALYZE: первое число статистики каждого индекса — количество
+    строк в нём (у частичных индексов меньше, поэтому берётся максимум).
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [table]
+            )
+        elif connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = %s",
+                [table]
+            )
+        else:
+            return None
+        rows = [row[0] for row in cursor.fetchall() if row[0] is not None]
+    if not rows:
+        return None
+    return max(int(str(stat).split()[0]) for stat in rows)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Паджинатор списка в админке без точного COUNT(*) по большим таблицам.
+
+    Для списка без фильтров берётся оценка из статистики СУБД, если она
+    больше ADMIN_EXACT_COUNT_LIMIT; иначе количество считается точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and (
+                estimate > settings.ADMIN_EXACT_COUNT_LIMIT
+            ):
+                return estimate
+        return super().count
+
+
+class ListPerformanceMixin:
+    """Общие настройки быстрых списков в админке."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = "-пусто-"
 
+    def is_changelist(self, request):
+        match = request.resolver_match
+        return match is not None and match.url_name.endswith("_changelist")
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """
+    База записей из POST_SHARDS: список записей или комментариев в
+    админке читает одну базу, по умолчанию основную.
+    """
+    title = "база"
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in settings.POST_SHARDS]
+
+    def queryset(self, request, queryset):
+        if self.value() in settings.POST_SHARDS:
+            return queryset.using(self.value())
+        return queryset
+
+
+class ShardedListMixin:
+    """Фильтр по базе записей, если их несколько (POST_SHARDS)."""
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if sharding_enabled():
+            return (ShardFilter, *list_filter)
+        return list_filter
+
+    def get_list_select_related(self, request):
+        # в базах записей нет пользователей: соединение с ними пустое,
+        # авторы там читаются из основной базы по одному
+        if request.GET.get(ShardFilter.parameter_name, DEFAULT_DB_ALIAS) != (
+            DEFAULT_DB_ALIAS
+        ):
+            return ()
+        return super().get_list_select_related(request)
+
+
+def preview_of(field):
+    """
+    Начало текста на символ длиннее превью: по нему видно, обрезан ли
+    текст.
+    """
+    return Substr(field, 1, PREVIEW_LENGTH + 1)
+
+
+def preview(text):
+    if len(text) <= PREVIEW_LENGTH:
+        return text
+    return text[:PREVIEW_LENGTH] + "…"
+
+
+class PostAdmin(ShardedListMixin, ListPerformanceMixin, admin.ModelAdmin):
+    list_display = (
+        "pk", "text_preview", "pub_date", "author", "is_deleted", "is_hidden"
+    )
+    list_select_related = ("author",)
+    raw_id_fields = ("author", "group")
+    search_fields = ("text",)
+    list_filter = ("pub_date", "is_deleted", "is_hidden")
+    actions = (
+        "soft_delete", "restore", "bulk_delete", "hide", "unhide", "ban"
+    )
+
+    def get_queryset(self, request):
+        # в админке видны и помеченные удалёнными записи
+        queryset = Post.all_objects.annotate(
+            text_preview=preview_of("text")
+        )
+        if self.is_changelist(request):
+            # для списка достаточно начала текста
+            queryset = queryset.defer("text")
+        return queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Поиск по индексам: число ищется как id, «@имя» — как автор.
+        Поиск по тексту без фильтра по дате ограничен последними
+        ADMIN_TEXT_SEARCH_DAYS днями, чтобы не сканировать всю таблицу;
+        об ограничении сообщается над списком.
+        """
+        term = search_term.strip()
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        if term.startswith("@"):
+            author_ids = list(User.objects.filter(
+                username=term[1:]
+            ).values_list("pk", flat=True))
+            return queryset.filter(author_id__in=author_ids), False
+        if term and not any(
+            param.startswith("pub_date__") for param in request.GET
+        ):
+            queryset = queryset.filter(pub_date__gte=timezone.now() - (
+                dt.timedelta(days=settings.ADMIN_TEXT_SEARCH_DAYS)
+            ))
+            messages.info(request, (
+                f"Поиск по тексту — только за последние "
+                f"{settings.ADMIN_TEXT_SEARCH_DAYS} дней. Для более ранних "
+                f"записей выберите дату публикации в фильтре."
+            ))
+        return super().get_search_results(request, queryset, search_term)
+
+    def text_preview(self, post):
+        return preview(post.text_preview)
+    text_preview.short_description = "Текст статьи"
+
+    def soft_delete(self, request, queryset):
+        post_ids = list(queryset.values_list("pk", flat=True))
+        moderation.update_all(
+            Post.all_objects.filter(pk__in=post_ids),
+            is_deleted=True,
+            updated=timezone.now()
+        )
+        fingerprints.set_active(False, post_ids)
+        invalidate_feed_caches()
+    soft_delete.short_description = "Пометить удалёнными"
+
+    def restore(self, request, queryset):
+        post_ids = list(queryset.values_list("pk", flat=True))
+        moderation.update_all(
+            Post.all_objects.filter(pk__in=post_ids),
+            is_deleted=False,
+            updated=timezone.now()
+        )
+        fingerprints.set_active(True, post_ids)
+        forget_posts(post_ids)
+        invalidate_feed_caches()
+    restore.short_description = "Восстановить"
+
+    def bulk_delete(self, request, queryset):
+        deleted = delete_posts(queryset)
+        self.message_user(request, f"Удалено записей: {deleted}")
+    bulk_delete.short_description = "Удалить пакетно (без сигналов)"
+
+    def hide(self, request, queryset):
+        moderation.hide(post_ids=queryset.values_list("pk", flat=True))
+    hide.short_description = "Скрыть"
+
+    def unhide(self, request, queryset):
+        moderation.unhide(post_ids=queryset.values_list("pk", flat=True))
+    unhide.short_description = "Показать"
+
+    def ban(self, request, queryset):
+        moderation.ban(queryset.values_list("author_id", flat=True))
+    ban.short_description = "Заблокировать авторов"
+
 
 class GroupAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("title",)}
@@ -20,19 +241,152 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ListPerformanceMixin, admin.ModelAdmin):
     list_display = ("pk", "user", "author")
-    empty_value_display = "-пусто-"
+    list_select_related = ("user", "author")
+    raw_id_fields = ("user", "author")
+    search_fields = ("=user__username", "=author__username")
 
 
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ("pk", "post", "author", "text", "created")
-    empty_value_display = "-пусто-"
+class CommentAdmin(
+    ShardedListMixin, ListPerformanceMixin, admin.ModelAdmin
+):
+    list_display = ("pk", "post_preview", "author", "text_preview", "created")
+    list_select_related = ("author",)
+    raw_id_fields = ("post", "author")
+    search_fields = ("=post__id", "=author__username")
+    list_filter = ("created", "is_hidden")
+    actions = ("hide", "unhide", "ban")
+
+    def get_queryset(self, request):
+        # в админке видны и скрытые комментарии
+        queryset = Comment.all_objects.annotate(
+            post_preview=preview_of("post__text"),
+            text_preview=preview_of("text"),
+        )
+        if self.is_changelist(request):
+            queryset = queryset.defer("text")
+        return queryset
+
+    def post_preview(self, comment):
+        return preview(comment.post_preview)
+    post_preview.short_description = "Запись"
+
+    def text_preview(self, comment):
+        return preview(comment.text_preview)
+    text_preview.short_description = "Текст комментария"
+
+    def hide(self, request, queryset):
+        moderation.hide(comment_ids=queryset.values_list("pk", flat=True))
+    hide.short_description = "Скрыть"
+
+    def unhide(self, request, queryset):
+        moderation.unhide(comment_ids=queryset.values_list("pk", flat=True))
+    unhide.short_description = "Показать"
+
+    def ban(self, request, queryset):
+        moderation.ban(queryset.values_list("author_id", flat=True))
+    ban.short_description = "Заблокировать авторов"
+
+
+def open_flags_count(**target):
+    return Subquery(
+        Flag.objects.filter(resolved=False, **target).order_by().values(
+            "resolved"
+        ).annotate(count=Count("pk")).values("count"),
+        output_field=models.IntegerField()
+    )
+
+
+class FlagAdmin(ListPerformanceMixin, admin.ModelAdmin):
+    """Очередь модерации: сначала объекты с наибольшим числом жалоб."""
+    list_display = (
+        "pk", "target", "reason", "reporter", "priority", "created",
+        "resolved"
+    )
+    list_select_related = ("reporter",)
+    list_filter = ("resolved",)
+    raw_id_fields = ("reporter", "post", "comment")
+    actions = ("hide_targets", "delete_targets", "ban_authors", "dismiss")
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).annotate(
+            priority=Case(
+                When(
+                    comment__isnull=False,
+                    then=open_flags_count(comment_id=OuterRef("comment_id"))
+                ),
+                default=open_flags_count(
+                    comment__isnull=True,
+                    post_id=OuterRef("post_id")
+                ),
+            ),
+            target_preview=Case(
+                When(
+                    comment__isnull=False,
+                    then=preview_of("comment__text")
+                ),
+                default=preview_of("post__text"),
+            ),
+        )
+        return queryset.order_by("resolved", "-priority", "created")
+
+    def target(self, flag):
+        return preview(flag.target_preview or "")
+    target.short_description = "Объект жалобы"
+
+    def priority(self, flag):
+        return flag.priority
+    priority.short_description = "Жалоб"
+    priority.admin_order_field = "priority"
+
+    def targets(self, queryset):
+        post_ids = queryset.filter(comment__isnull=True).values_list(
+            "post_id",
+            flat=True
+        )
+        comment_ids = queryset.filter(comment__isnull=False).values_list(
+            "comment_id",
+            flat=True
+        )
+        return post_ids, comment_ids
+
+    def hide_targets(self, request, queryset):
+        moderation.hide(*self.targets(queryset))
+    hide_targets.short_description = "Скрыть объекты жалоб"
+
+    def delete_targets(self, request, queryset):
+        moderation.delete(*self.targets(queryset))
+    delete_targets.short_description = "Удалить объекты жалоб"
+
+    def ban_authors(self, request, queryset):
+        post_ids, comment_ids = map(list, self.targets(queryset))
+        # объекты жалоб лежат в разных базах: авторы собираются из каждой
+        author_ids = set()
+        for targets in (
+            Post.all_objects.filter(pk__in=post_ids),
+            Comment.all_objects.filter(pk__in=comment_ids),
+        ):
+            for part in each_shard(targets):
+                author_ids.update(part.values_list("author_id", flat=True))
+        moderation.ban(author_ids)
+    ban_authors.short_description = "Заблокировать авторов"
+
+    def dismiss(self, request, queryset):
+        # объекты, скрытые очередью повторов до решения модератора
+        # (жалоба без автора), возвращаются в ленты
+        moderation.unhide(*self.targets(
+            queryset.filter(reporter=None, resolved=False)
+        ))
+        # сортировка по аннотации priority в UPDATE недоступна
+        queryset.order_by().update(resolved=True)
+    dismiss.short_description = "Отклонить жалобы"
 
 
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Post, PostAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Flag, FlagAdmin)
 admin.site.register(Group, GroupAdmin)
 
 
@@ -43,3 +397,15 @@ class FlatPageCustom(FlatPageAdmin):
 
 admin.site.unregister(FlatPage)
 admin.site.register(FlatPage, FlatPageCustom)
+
+
+class UserBulkDeleteAdmin(UserAdmin):
+    actions = ("bulk_delete",)
+
+    def bulk_delete(self, request, queryset):
+        deleted = delete_users(queryset)
+        self.message_user(request, f"Удалено пользователей: {deleted}")
+    bulk_delete.short_description = "Удалить со всем содержимым пакетно"
+
+admin.site.unregister(User)
+admin.site.register(User, UserBulkDeleteAdmin)
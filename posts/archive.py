@@ -0,0 +1,173 @@
+"""
+Перенос старых записей в архивные таблицы и чтение из архива.
+
+Архивируются записи старше ARCHIVE_AFTER_DAYS дней из всех баз
+POST_SHARDS вместе со всеми их комментариями, включая скрытые
+и удалённые: они переносятся с теми же флагами, а модерация меняет
+флаги и в архиве. Поэтому архивные записи всегда старше живых, и ленту
+автора можно получить, просто продолжив живые записи архивными.
+"""
+import datetime as dt
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .loaders import count_subquery
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+from .sharding import each_shard
+
+
+class ChainedList:
+    """
+    Несколько упорядоченных выборок, идущих друг за другом.
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator:
+    на каждую страницу выполняются только нужные выборки, а количество
+    строк выборки считается, только если срез начинается за её концом.
+    """
+
+    ordered = True
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+        self._counts = {}
+
+    def count_of(self, index):
+        if index not in self._counts:
+            self._counts[index] = self.querysets[index].count()
+        return self._counts[index]
+
+    def count(self):
+        return sum(map(self.count_of, range(len(self.querysets))))
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            stop = self.count()
+        result = []
+        for index, queryset in enumerate(self.querysets):
+            if stop <= 0:
+                break
+            known = self._counts.get(index)
+            if known is not None and start >= known:
+                chunk = []
+            else:
+                chunk = list(queryset[start:stop])
+            result.extend(chunk)
+            if len(chunk) == stop - start:
+                break
+            # выборка кончилась раньше среза: её размер известен без
+            # COUNT(*), если из неё что-то попало в срез
+            if chunk or start == 0:
+                size = start + len(chunk)
+            else:
+                size = self.count_of(index)
+            self._counts[index] = size
+            start = max(start - size, 0)
+            stop -= size
+        return result
+
+
+def archived_feed(post_list):
+    """
+    Архивные записи в виде, пригодном для шаблона ленты.
+
+    Архив может лежать в другой базе, поэтому автор и группа
+    подгружаются отдельными запросами, а не соединением таблиц.
+    """
+    return post_list.prefetch_related("author", "group").annotate(
+        comment_count=count_subquery(
+            ArchivedComment.objects.filter(is_hidden=False),
+            "post"
+        )
+    )
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    return timezone.now() - dt.timedelta(days=days)
+
+
+def archive_batch(post_ids, using=DEFAULT_DB_ALIAS):
+    """Переносит записи post_ids с комментариями из базы using в архив."""
+    posts = Post.all_objects.using(using).filter(id__in=post_ids)
+    # скрытые модератором комментарии переносятся скрытыми
+    comments = Comment.all_objects.using(using).filter(post_id__in=post_ids)
+    archive_db = settings.ARCHIVE_DATABASE
+    # Сначала пишем в архив, потом удаляем: повторный запуск после сбоя
+    # между этими шагами не создаст дублей благодаря ignore_conflicts.
+    with transaction.atomic(using=archive_db):
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(
+                id=post.id,
+                text=post.text,
+                pub_date=post.pub_date,
+                group_id=post.group_id,
+                author_id=post.author_id,
+                image=post.image.name or None,
+                is_deleted=post.is_deleted,
+                is_hidden=post.is_hidden,
+            )
+            for post in posts
+        ], ignore_conflicts=True)
+        ArchivedComment.objects.bulk_create([
+            ArchivedComment(
+                id=comment.id,
+                post_id=comment.post_id,
+                author_id=comment.author_id,
+                text=comment.text,
+                created=comment.created,
+                is_hidden=comment.is_hidden,
+            )
+            for comment in comments
+        ], ignore_conflicts=True)
+    with transaction.atomic(using=using):
+        comments.delete()
+        posts.delete()
+
+
+def archive_posts(days=None, batch_size=500):
+    """Архивирует записи старше days дней; возвращает их количество."""
+    cutoff = archive_cutoff(days)
+    archived = 0
+    for old_posts in each_shard(
+        Post.all_objects.filter(pub_date__lt=cutoff)
+    ):
+        while True:
+            post_ids = list(
+                old_posts.order_by("id").values_list(
+                    "id", flat=True
+                )[:batch_size]
+            )
+            if not post_ids:
+                break
+            archive_batch(post_ids, old_posts.db)
+            archived += len(post_ids)
+    return archived
+
+
+def purge_deleted(batch_size=500):
+    """Физически удаляет записи, помеченные удалёнными, и в архиве."""
+    purged = 0
+    for deleted in each_shard(Post.all_objects.filter(is_deleted=True)) + [
+        ArchivedPost.all_objects.filter(is_deleted=True)
+    ]:
+        while True:
+            post_ids = list(
+                deleted.values_list("id", flat=True)[:batch_size]
+            )
+            if not post_ids:
+                break
+            with transaction.atomic(using=deleted.db):
+                deleted.model.all_objects.using(deleted.db).filter(
+                    id__in=post_ids
+                ).delete()
+            purged += len(post_ids)
+    return purged
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_count
+
+
+def notifications(request):
+    """Число непрочитанных уведомлений для значка в навигации."""
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {
+        "unread_notifications": SimpleLazyObject(
+            lambda: unread_count(user.pk)
+        )
+    }
+
+
+def about_site(request):
+    """
+    Откуда брать страницы «Об авторе» и «Технологии» для подвала: с этого
+    же сайта, с MAIN_SITE_URL или ниоткуда, если flatpages не установлены.
+    """
+    if "django.contrib.flatpages" in settings.INSTALLED_APPS:
+        return {"about_site": ""}
+    if settings.MAIN_SITE_URL:
+        return {"about_site": settings.MAIN_SITE_URL}
+    return {"about_site": None}
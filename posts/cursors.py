@@ -0,0 +1,64 @@
+"""
+Курсоры ленты для подгрузки записей без OFFSET.
+
+Курсор — пара (pub_date в микросекундах от эпохи, id) последней
+показанной записи в виде "<микросекунды>_<id>". Следующая порция —
+записи строго раньше неё в порядке (-pub_date, -id), что выбирается
+по индексу pub_date независимо от того, как далеко прокручена лента.
+"""
+import datetime as dt
+
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def encode_cursor_values(pub_date, post_id):
+    delta = pub_date - EPOCH
+    seconds = delta.days * 86400 + delta.seconds
+    return f"{seconds * 10 ** 6 + delta.microseconds}_{post_id}"
+
+
+def encode_cursor(post):
+    return encode_cursor_values(post.pub_date, post.id)
+
+
+# Наибольший id, который примет BIGINT базы
+MAX_ID = 2 ** 63 - 1
+
+
+def decode_cursor(value):
+    """
+    Разбирает курсор; при неверном формате или значениях вне допустимых
+    дат и id поднимает ValueError.
+    """
+    micros, post_id = value.split("_")
+    post_id = int(post_id)
+    if not 0 < post_id <= MAX_ID:
+        raise ValueError(f"id курсора вне диапазона: {post_id}")
+    try:
+        return EPOCH + dt.timedelta(microseconds=int(micros)), post_id
+    except OverflowError as error:
+        raise ValueError(f"дата курсора вне диапазона: {micros}") from error
+
+
+def after_cursor(post_list, cursor):
+    """
+    Записи post_list, идущие в ленте после курсора. Условие записано без
+    OR: так SQLite идёт по индексу pub_date в порядке ленты, а не сливает
+    две выборки и сортирует остаток ленты во временном B-дереве.
+    """
+    pub_date, post_id = cursor
+    return post_list.filter(pub_date__lte=pub_date).exclude(
+        pub_date=pub_date, id__gte=post_id
+    ).order_by("-pub_date", "-id")
+
+
+def between_cursors(post_list, after, latest):
+    """Записи post_list позже курсора after, но не позже курсора latest."""
+    (after_date, after_id), (latest_date, latest_id) = after, latest
+    return post_list.filter(
+        pub_date__gte=after_date, pub_date__lte=latest_date
+    ).exclude(
+        pub_date=after_date, id__lte=after_id
+    ).exclude(
+        pub_date=latest_date, id__gt=latest_id
+    ).order_by("-pub_date", "-id")
@@ -0,0 +1,168 @@
+"""
+Пакетное удаление пользователей и записей.
+
+Стандартный Collector загружает в память каждую удаляемую строку и
+отправляет по ней сигналы. Здесь строки удаляются SQL-запросами DELETE
+по пачкам первичных ключей, каждая пачка — в своей транзакции. Зависимые
+таблицы обходятся по метаданным моделей, поэтому новые связи с Post или
+User учитываются автоматически. Сигналы pre_delete/post_delete при этом
+не отправляются.
+
+Если записи разнесены по базам (POST_SHARDS), удаление проходит по всем
+базам записей, а зависимые строки удаляются в базе своей модели: жалобы
+и уведомления записи из другой базы — в основной.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import models, router, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+
+from users.auth import forget_users
+
+from .models import ArchivedComment, ArchivedPost
+from .paginators import bump_counts
+from .routers import databases_for, is_sharded_model
+from .warmup import schedule_warmup
+
+User = get_user_model()
+
+CHUNK_SIZE = 500
+# Страницы главной, кеш списка которых сбрасывается при удалении записей;
+# на дальних страницах удалённая запись видна не дольше времени кеша
+INDEX_CACHED_PAGES = 10
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def delete_rows(model, pks, using, chunk_size=CHUNK_SIZE):
+    """Удаляет строки model по pks вместе с зависимыми, не загружая объекты."""
+    relations = [
+        relation for relation in get_candidate_relations_to_delete(model._meta)
+        if relation.field.remote_field.on_delete is not models.DO_NOTHING
+    ]
+    if any(
+        relation.field.remote_field.on_delete not in (
+            models.CASCADE, models.SET_NULL
+        )
+        for relation in relations
+    ):
+        # PROTECT, SET_DEFAULT и т.п. оставляем стандартному Collector
+        model._base_manager.using(using).filter(pk__in=pks).delete()
+        return
+    for relation in relations:
+        field = relation.field
+        # комментарии записи лежат в её базе, остальное — в базе модели
+        related_using = using if is_sharded_model(
+            relation.related_model
+        ) else router.db_for_write(relation.related_model)
+        related = relation.related_model._base_manager.using(related_using)
+        for pks_chunk in chunks(pks, chunk_size):
+            dependent = related.filter(**{f"{field.name}__in": pks_chunk})
+            if field.remote_field.on_delete is models.CASCADE:
+                delete_rows(
+                    relation.related_model,
+                    list(dependent.values_list("pk", flat=True)),
+                    related_using,
+                    chunk_size
+                )
+            else:
+                dependent.update(**{field.name: None})
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        for pks_chunk in chunks(pks, chunk_size):
+            through._base_manager.using(using).filter(**{
+                f"{field.m2m_field_name()}__in": pks_chunk
+            })._raw_delete(using)
+    for pks_chunk in chunks(pks, chunk_size):
+        model._base_manager.using(using).filter(
+            pk__in=pks_chunk
+        )._raw_delete(using)
+
+
+def delete_queryset(queryset, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Удаляет строки queryset пачками по chunk_size, каждую в транзакции.
+
+    progress(label, deleted) вызывается после каждой пачки.
+    Возвращает количество удалённых строк верхнего уровня.
+    """
+    model = queryset.model
+    deleted = 0
+    for using in databases_for(model):
+        pks_query = queryset.using(using).order_by().values_list(
+            "pk",
+            flat=True
+        )
+        while True:
+            pks = list(pks_query[:chunk_size])
+            if not pks:
+                break
+            with transaction.atomic(using=using):
+                delete_rows(model, pks, using, chunk_size)
+            deleted += len(pks)
+            if progress is not None:
+                progress(model._meta.label, deleted)
+    return deleted
+
+
+def index_fragment_keys(pages=INDEX_CACHED_PAGES):
+    """Ключи кеша списка записей на первых страницах главной."""
+    return [
+        make_template_fragment_key("index_page", [number])
+        for number in range(1, pages + 1)
+    ]
+
+
+def invalidate_feed_caches():
+    """Сбрасывает кеши лент, в которых могли остаться удалённые записи."""
+    cache.delete_many(index_fragment_keys() + ["posts:latest"])
+    bump_counts()
+    schedule_warmup()
+
+
+def delete_posts(queryset, chunk_size=CHUNK_SIZE, progress=None):
+    deleted = delete_queryset(queryset, chunk_size, progress)
+    invalidate_feed_caches()
+    return deleted
+
+
+def delete_users(queryset, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Удаляет пользователей со всем их содержимым.
+
+    Крупные зависимые наборы (записи, комментарии, подписки) удаляются
+    отдельными пачками до удаления самого пользователя, чтобы ни одна
+    транзакция не разрасталась. Архивные строки лежат, возможно, в другой
+    базе и связаны без каскада, поэтому удаляются явно; комментарии
+    других пользователей к архивным записям уходят каскадом.
+    """
+    deleted = 0
+    for user_id in list(queryset.values_list("pk", flat=True)):
+        for relation in get_candidate_relations_to_delete(User._meta):
+            if relation.field.remote_field.on_delete is not models.CASCADE:
+                continue
+            delete_queryset(
+                relation.related_model._base_manager.filter(
+                    **{relation.field.name: user_id}
+                ),
+                chunk_size,
+                progress
+            )
+        for model in (ArchivedComment, ArchivedPost):
+            delete_queryset(
+                model._base_manager.filter(author_id=user_id),
+                chunk_size,
+                progress
+            )
+        deleted += delete_queryset(
+            User._base_manager.filter(pk=user_id),
+            chunk_size,
+            progress
+        )
+        forget_users([user_id])
+    invalidate_feed_caches()
+    return deleted
@@ -0,0 +1,244 @@
+"""
+Выгрузка публичных страниц в статические файлы для анонимного зеркала.
+
+Страницы отрисовываются тем же кодом, что и обычные запросы, от имени
+анонимного пользователя. Первая страница адреса /<путь>/ сохраняется в
+<путь>/index.html, страница N — в <путь>/page-N.html, поэтому веб-сервер
+отдаёт их без Django, а запросы с сессией передаёт приложению:
+
+    location / {
+        if ($cookie_sessionid) { proxy_pass http://django; }
+        try_files $uri/page-$arg_page.html $uri/index.html @django;
+    }
+
+Повторный запуск перерисовывает только страницы, затронутые после
+прошлой выгрузки: записи с новым значением Post.updated или новыми
+комментариями, их авторов, группы и главную. Время начала выгрузки
+хранится в файле WATERMARK_FILE в корне выгрузки. Удалённые из базы
+пользователи и группы убираются только полной выгрузкой.
+
+Файл страницы удаляется, только если сайт ответил 404 или 410. Любой
+другой ответ прерывает выгрузку с ExportError, и метка не сдвигается:
+следующий запуск повторит те же страницы, а зеркало останется прежним.
+"""
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from yatube import selfrequest
+
+from .deletion import index_fragment_keys
+from .models import ArchivedPost, Comment, Group, Post, User
+from .sharding import author_posts, count_all, each_shard
+from .views import PAGE_SIZE
+
+WATERMARK_FILE = ".export-watermark"
+PAGE_FILE_RE = re.compile(r"^page-(\d+)\.html$")
+GONE_STATUSES = (404, 410)
+
+
+class ExportError(Exception):
+    """Страница ответила ошибкой: выгрузка прервана, метка не сдвинута."""
+
+
+def read_watermark(root):
+    try:
+        with open(os.path.join(root, WATERMARK_FILE)) as f:
+            return parse_datetime(f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def write_watermark(root, moment):
+    write_file(
+        os.path.join(root, WATERMARK_FILE), moment.isoformat().encode()
+    )
+
+
+def write_file(path, content):
+    """Атомарная запись: читатель видит старый файл или новый целиком."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def page_file(root, url, number):
+    directory = os.path.join(root, url.strip("/"))
+    name = "index.html" if number == 1 else f"page-{number}.html"
+    return os.path.join(directory, name)
+
+
+def page_count(count):
+    return max(1, math.ceil(count / PAGE_SIZE))
+
+
+def render_page(root, url, number):
+    """
+    Отрисовывает одну страницу и сохраняет её в файл.
+
+    Страница, которой больше нет (404, 410), удаляется.
+    """
+    path = page_file(root, url, number)
+    response = selfrequest.get(url, {"page": number} if number > 1 else {})
+    if response.status_code == 200:
+        write_file(path, response.content)
+        return path
+    if response.status_code in GONE_STATUSES:
+        remove_file(path)
+        return None
+    raise ExportError(f"{url} (страница {number}): {response.status_code}")
+
+
+def prune_pages(root, url, pages):
+    """Удаляет файлы страниц за пределами текущего числа страниц."""
+    directory = os.path.join(root, url.strip("/"))
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in names:
+        match = PAGE_FILE_RE.match(name)
+        if match and int(match.group(1)) > pages:
+            remove_file(os.path.join(directory, name))
+
+
+def all_pages():
+    """Все публичные адреса с числом их страниц."""
+    yield reverse("index"), count_all(Post.objects.all())
+    for group in Group.objects.all():
+        yield (
+            reverse("group_posts", args=[group.slug]),
+            count_all(Post.objects.filter(group=group))
+        )
+    archived = dict(
+        ArchivedPost.objects.order_by().values_list("author_id").annotate(
+            Count("id")
+        )
+    )
+    for author in User.objects.all():
+        yield (
+            reverse("profile", args=[author.username]),
+            author_posts(author.id).count() + archived.get(author.id, 0)
+        )
+    # в базах записей нет пользователей: авторы читаются из основной
+    for post_list in each_shard(Post.objects.prefetch_related("author")):
+        for post in post_list:
+            yield post_page(post)
+
+
+def changed_pages(since):
+    """Адреса, содержимое которых могло измениться после since."""
+    posts = [
+        post
+        for post_list in each_shard(Post.all_objects.filter(
+            Q(updated__gt=since)
+            | Q(comments__created__gt=since)
+        ).prefetch_related("author", "group").distinct())
+        for post in post_list
+    ]
+    authors = {post.author for post in posts}
+    authors.update(User.objects.filter(date_joined__gt=since))
+    groups = {post.group for post in posts if post.group is not None}
+    if posts:
+        yield reverse("index"), count_all(Post.objects.all())
+    for group in groups:
+        yield (
+            reverse("group_posts", args=[group.slug]),
+            count_all(Post.objects.filter(group=group))
+        )
+    for author in authors:
+        yield (
+            reverse("profile", args=[author.username]),
+            author_posts(author.id).count()
+            + ArchivedPost.objects.filter(author_id=author.id).count()
+        )
+    for post in posts:
+        yield post_page(post)
+
+
+def post_page(post):
+    url = reverse("post", args=[post.author.username, post.id])
+    if post.is_deleted or post.is_hidden:
+        return url, 0
+    return url, Comment.objects.using(post._state.db).filter(
+        post_id=post.id
+    ).count()
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _render_many(root, tasks):
+    return [render_page(root, url, number) for url, number in tasks]
+
+
+def export(root, workers=1, full=False):
+    """
+    Выгружает страницы в каталог root.
+
+    Возвращает число записанных файлов. При workers > 1 страницы
+    отрисовываются пулом процессов порциями.
+    """
+    started = timezone.now()
+    since = None if full else read_watermark(root)
+    pages = list(all_pages() if since is None else changed_pages(since))
+
+    tasks = []
+    for url, count in pages:
+        total = page_count(count)
+        tasks.extend((url, number) for number in range(1, total + 1))
+        if url == reverse("index"):
+            # список записей главной кешируется шаблоном; выгрузка после
+            # метки не должна сохранить его устаревшую копию
+            cache.delete_many(index_fragment_keys(total))
+
+    if workers > 1 and len(tasks) > 1:
+        # дочерние процессы не должны делить открытые соединения с базой
+        connections.close_all()
+        chunks = [tasks[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+            results = pool.map(_render_many, [root] * workers, chunks)
+            written = [path for chunk in results for path in chunk]
+    else:
+        written = _render_many(root, tasks)
+    written = {path for path in written if path}
+
+    for url, count in pages:
+        prune_pages(root, url, page_count(count))
+    if since is None:
+        remove_stale(root, written)
+    write_watermark(root, started)
+    return len(written)
+
+
+def remove_stale(root, written):
+    """После полной выгрузки удаляет страницы, которых больше нет."""
+    for directory, _, names in os.walk(root, topdown=False):
+        for name in names:
+            path = os.path.join(directory, name)
+            if name.endswith(".html") and path not in written:
+                remove_file(path)
+        if directory != root and not os.listdir(directory):
+            os.rmdir(directory)
@@ -0,0 +1,200 @@
+"""
+RSS и Atom для главной, групп и авторов.
+
+Ответы кешируются по водяному знаку — последнему изменению записей
+ленты (поле updated, включая скрытые и удалённые мягко) и поколению
+счётчиков лент, которое растёт при физическом удалении: пока ничего не
+изменилось, лента отдаётся из кеша, а клиент с If-Modified-Since или
+If-None-Match получает 304. Водяной знак — один агрегат по индексу
+updated.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import Max
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, urlencode
+from django.views.decorators.http import condition
+
+from yatube.singleflight import get_or_build
+
+from .models import Group, Post, User
+from .paginators import counts_version
+from .sharding import author_posts
+
+
+def last_change(post_list):
+    return post_list.aggregate(updated=Max("updated"))["updated"]
+
+
+def render_response(response):
+    if hasattr(response, "render"):
+        response.render()
+    return response
+
+
+def cached_by_watermark(get_posts, params=()):
+    """
+    Кеширует ответ представления, пока записи ленты не изменятся.
+
+    get_posts(**kwargs) возвращает выборку записей ленты вместе со
+    скрытыми и удалёнными; kwargs — именованные аргументы представления
+    из URL. params — параметры запроса, от которых зависит ответ: ключ
+    кеша строится из пути и только их, прочие параметры не плодят копий.
+    """
+    def decorator(view):
+        def watermark(request, **kwargs):
+            if not hasattr(request, "_feed_watermark"):
+                request._feed_watermark = last_change(get_posts(**kwargs))
+            return request._feed_watermark
+
+        def version(request, **kwargs):
+            mark = watermark(request, **kwargs)
+            return "%s-%s" % (
+                counts_version(),
+                mark.timestamp() if mark else 0
+            )
+
+        def build(request, *args, **kwargs):
+            response = render_response(view(request, *args, **kwargs))
+            mark = watermark(request, **kwargs)
+            if mark:
+                # Feed ставит дату последней публикации, а не изменения
+                response["Last-Modified"] = http_date(mark.timestamp())
+            return response
+
+        @wraps(view)
+        @condition(etag_func=version, last_modified_func=watermark)
+        def wrapper(request, *args, **kwargs):
+            key = "feeds:%s?%s:%s" % (
+                request.path,
+                urlencode([
+                    (name, request.GET[name])
+                    for name in params if name in request.GET
+                ]),
+                version(request, **kwargs)
+            )
+            response = get_or_build(
+                key,
+                lambda: build(request, *args, **kwargs),
+                settings.FEEDS_CACHE_TIMEOUT
+            )
+            if response.status_code != 200:
+                # ошибки не кешируются
+                cache.delete(key)
+            return response
+        return wrapper
+    return decorator
+
+
+class LatestPostsFeed(Feed):
+    title = "Yatube: последние записи"
+
+    def description(self, obj):
+        return "Новые записи всех авторов"
+
+    def link(self):
+        return reverse("index")
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.posts(obj).select_related("author", "group")[
+            :settings.FEED_SIZE
+        ]
+
+    def item_title(self, item):
+        return item.text[:60]
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse("post", args=[item.author.username, item.id])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f"Yatube: {obj.title}"
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse("group_posts", args=[obj.slug])
+
+    def posts(self, obj):
+        return Post.objects.filter(group=obj)
+
+
+class AuthorFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f"Yatube: {obj.get_full_name() or obj.username}"
+
+    def description(self, obj):
+        return f"Записи автора {obj.username}"
+
+    def link(self, obj):
+        return reverse("profile", args=[obj.username])
+
+    def posts(self, obj):
+        return author_posts(obj.pk)
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+class LatestPostsAtomFeed(AtomMixin, LatestPostsFeed):
+    pass
+
+
+class GroupAtomFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class AuthorAtomFeed(AtomMixin, AuthorFeed):
+    pass
+
+
+def all_posts(**kwargs):
+    return Post.all_objects.all()
+
+
+def posts_in_group(slug, **kwargs):
+    return Post.all_objects.filter(group__slug=slug)
+
+
+def posts_by_author(username, **kwargs):
+    return Post.all_objects.filter(author__username=username)
+
+
+index_rss = cached_by_watermark(all_posts)(LatestPostsFeed())
+index_atom = cached_by_watermark(all_posts)(LatestPostsAtomFeed())
+group_rss = cached_by_watermark(posts_in_group)(GroupFeed())
+group_atom = cached_by_watermark(posts_in_group)(GroupAtomFeed())
+author_rss = cached_by_watermark(posts_by_author)(AuthorFeed())
+author_atom = cached_by_watermark(posts_by_author)(AuthorAtomFeed())
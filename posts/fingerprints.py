@@ -0,0 +1,202 @@
+"""
+Поиск повторов среди новых записей и комментариев.
+
+Каждый текст при сохранении получает отпечаток Fingerprint: хеш
+нормализованного текста и SimHash его слов. Новый текст сравнивается
+только с отпечатками за последние DUPLICATE_WINDOW_HOURS, найденными по
+индексам хеша и частей SimHash: один запрос, без чтения самих текстов.
+
+Повтор своего же текста в том же месте (среди записей или в обсуждении
+той же записи) отклоняется. Похожий на чужой текст или свой текст из
+другого обсуждения сохраняется скрытым, с жалобой в очереди модерации.
+Короткие тексты («Спасибо!») сравниваются только с собственными в том же
+месте, только точно и никогда не отклоняются — самое большее уходят
+модератору. Отпечатки удалённых и скрытых текстов не учитываются.
+"""
+import hashlib
+import re
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import Fingerprint, Flag
+
+BITS = 64
+# Части simhash (Fingerprint.band0..band5): повтор с отличием не больше
+# BANDS - 1 бит совпадает с оригиналом хотя бы в одной части
+BANDS = 6
+
+OK, QUEUE, REJECT = "ok", "queue", "reject"
+
+WORD_RE = re.compile(r"\w+")
+
+Verdict = namedtuple("Verdict", "action fingerprint match distance")
+
+
+def words(text):
+    return WORD_RE.findall(strip_tags(text).casefold())
+
+
+def text_hash(tokens):
+    return hashlib.sha1(" ".join(tokens).encode()).hexdigest()
+
+
+def feature_hash(feature):
+    digest = hashlib.blake2b(feature.encode(), digest_size=BITS // 8)
+    return int.from_bytes(digest.digest(), "big")
+
+
+def simhash(tokens):
+    """
+    64-битный SimHash по словам текста.
+
+    Признаки — отдельные слова, а не шинглы: в коротких записях замена
+    одного слова меняет слишком большую долю шинглов.
+    """
+    weights = [0] * BITS
+    for token in tokens:
+        value = feature_hash(token)
+        for bit in range(BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(BITS) if weights[bit] > 0)
+
+
+def bands(value):
+    """BANDS частей value почти равной ширины, от младших битов."""
+    parts, shift = [], 0
+    for band in range(BANDS):
+        width = (BITS - shift) // (BANDS - band)
+        parts.append(value >> shift & ((1 << width) - 1))
+        shift += width
+    return parts
+
+
+def to_signed(value):
+    """BigIntegerField хранит знаковые 64 бита."""
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+
+def distance(a, b):
+    return bin((a ^ b) & ((1 << BITS) - 1)).count("1")
+
+
+def fingerprint(text, author, thread=None):
+    """Отпечаток текста; thread — запись, к которой пишется комментарий."""
+    tokens = words(text)
+    value = simhash(tokens)
+    return Fingerprint(
+        author=author,
+        post=thread,
+        text_hash=text_hash(tokens),
+        simhash=to_signed(value),
+        **{f"band{band}": part for band, part in enumerate(bands(value))}
+    ), len(tokens)
+
+
+def same_place(match, candidate):
+    """Оба текста — записи или комментарии к одной записи."""
+    if candidate.post_id is None:
+        return match.comment_id is None
+    return match.comment_id is not None and match.post_id == candidate.post_id
+
+
+def nearest(candidate, short, edited=None):
+    """Ближайший отпечаток за окно и расстояние до него в битах."""
+    since = timezone.now() - timedelta(hours=settings.DUPLICATE_WINDOW_HOURS)
+    if short:
+        lookup = Q(
+            text_hash=candidate.text_hash,
+            author=candidate.author,
+            post=candidate.post,
+            comment__isnull=candidate.post_id is None
+        )
+    else:
+        lookup = Q(text_hash=candidate.text_hash)
+        for band in range(BANDS):
+            name = f"band{band}"
+            lookup |= Q(**{name: getattr(candidate, name)})
+    matches = Fingerprint.objects.filter(
+        lookup,
+        is_active=True,
+        created__gte=since
+    )
+    if edited is not None:
+        matches = matches.exclude(post=edited, comment=None)
+    best, best_distance = None, None
+    for match in matches:
+        if match.text_hash == candidate.text_hash:
+            return match, 0
+        bits = distance(match.simhash, candidate.simhash)
+        if bits <= settings.DUPLICATE_MAX_DISTANCE and (
+            best is None or bits < best_distance
+        ):
+            best, best_distance = match, bits
+    return best, best_distance
+
+
+def check(text, author, thread=None, edited=None):
+    """
+    Решение по новому тексту: OK, QUEUE (сохранить скрытым и отправить
+    модератору) или REJECT (не сохранять). thread — запись, к которой
+    пишется комментарий, edited — запись, текст которой правится.
+    """
+    candidate, length = fingerprint(text, author, thread)
+    short = length < settings.DUPLICATE_MIN_WORDS
+    match, bits = nearest(candidate, short, edited)
+    if match is None:
+        action = OK
+    elif (
+        not short
+        and match.author_id == author.pk
+        and same_place(match, candidate)
+    ):
+        action = REJECT
+    else:
+        action = QUEUE
+    return Verdict(action, candidate, match, bits)
+
+
+def record(verdict, post=None, comment=None):
+    """
+    Сохраняет отпечаток нового текста (у правленой записи — вместо
+    прежнего) и жалобу без автора, если текст на модерации.
+    """
+    if comment is not None:
+        post = comment.post
+    else:
+        Fingerprint.objects.filter(post=post, comment=None).delete()
+    verdict.fingerprint.post = post
+    verdict.fingerprint.comment = comment
+    verdict.fingerprint.is_active = verdict.action != QUEUE
+    verdict.fingerprint.save()
+    if verdict.action == QUEUE:
+        Flag.objects.create(
+            reporter=None,
+            post=post,
+            comment=comment,
+            reason=duplicate_reason(verdict)
+        )
+
+
+def set_active(active, post_ids=(), comment_ids=()):
+    """Учитывать ли отпечатки записей и комментариев при поиске повторов."""
+    Fingerprint.objects.filter(
+        post_id__in=post_ids,
+        comment=None
+    ).update(is_active=active)
+    Fingerprint.objects.filter(comment_id__in=comment_ids).update(
+        is_active=active
+    )
+
+
+def duplicate_reason(verdict):
+    match = verdict.match
+    if match.comment_id:
+        source = f"комментария #{match.comment_id}"
+    else:
+        source = f"записи #{match.post_id}"
+    return f"Повтор {source}, отличие {verdict.distance} бит"
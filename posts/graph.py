@@ -0,0 +1,56 @@
+"""
+Списки подписчиков и подписок.
+
+Страница списка — связи Follow одного автора (или одного подписчика)
+с id меньше курсора, по индексу (author, id) или (user, id): без OFFSET,
+сколько бы страниц ни было пролистано. Пользователи страницы загружаются
+одним запросом, отметки «вы тоже подписаны» — ещё одним.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+
+from .models import Follow, User
+
+FollowPage = namedtuple("FollowPage", "users next_cursor")
+
+# в какую сторону смотреть: чей id фильтруем и чей id показываем
+DIRECTIONS = {
+    "followers": ("author_id", "user_id"),
+    "following": ("user_id", "author_id"),
+}
+
+
+def follow_page(direction, user_id, viewer=None, after=None, size=None):
+    """
+    Страница подписчиков (direction="followers") или подписок
+    ("following") пользователя user_id, новые связи первыми.
+
+    У каждого пользователя is_followed — подписан ли на него viewer.
+    """
+    size = size or settings.FOLLOW_LIST_SIZE
+    owner_field, other_field = DIRECTIONS[direction]
+    rows = Follow.objects.filter(**{owner_field: user_id})
+    if after is not None:
+        rows = rows.filter(id__lt=after)
+    # на одну строку больше, чтобы узнать, есть ли следующая страница
+    rows = list(rows.order_by("-id").values_list("id", other_field)[:size + 1])
+    next_cursor = rows[size - 1][0] if len(rows) > size else None
+    rows = rows[:size]
+
+    ids = [other_id for _, other_id in rows]
+    users = User.objects.in_bulk(ids)
+    followed = set()
+    if viewer is not None and viewer.is_authenticated and ids:
+        followed = set(Follow.objects.filter(
+            user_id=viewer.pk,
+            author_id__in=ids
+        ).values_list("author_id", flat=True))
+
+    page = []
+    for other_id in ids:
+        user = users.get(other_id)
+        if user is not None:
+            user.is_followed = other_id in followed
+            page.append(user)
+    return FollowPage(page, next_cursor)
@@ -0,0 +1,187 @@
+"""
+Загрузка данных для представлений пакетами.
+
+Загрузчики живут в пределах одного запроса: ключи собираются и
+дедуплицируются, а затем загружаются одним запросом к базе. Независимые
+выборки можно выполнить параллельно в пуле потоков через run_parallel.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from yatube import tracing
+
+from .models import Comment, Follow, Post, User
+from .routers import shard_for_author, sharding_enabled
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.PARALLEL_QUERIES_WORKERS,
+    thread_name_prefix="loaders"
+)
+
+
+class DataLoader:
+    """
+    Пакетная загрузка по ключам с кешем на время запроса.
+
+    batch_load получает список уникальных ключей и возвращает словарь
+    {ключ: значение}; ключи без значения загружаются как None.
+    """
+
+    def __init__(self, batch_load):
+        self.batch_load = batch_load
+        self.cache = {}
+
+    def load_many(self, keys):
+        keys = list(keys)
+        missing = [key for key in dict.fromkeys(keys) if key not in self.cache]
+        if missing:
+            loaded = self.batch_load(missing)
+            for key in missing:
+                self.cache[key] = loaded.get(key)
+        return [self.cache[key] for key in keys]
+
+    def load(self, key):
+        return self.load_many([key])[0]
+
+
+def count_subquery(queryset, field, outer="pk"):
+    """
+    Количество строк queryset, у которых field равен outer внешней
+    строки.
+    """
+    counts = queryset.filter(**{field: OuterRef(outer)}).order_by().values(
+        field
+    ).annotate(count=Count("pk")).values("count")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def with_author_and_group(post_list):
+    """
+    Записи вместе с автором и группой: соединением таблиц или, если
+    записи разнесены по базам (POST_SHARDS), запросами к основной базе.
+    """
+    if sharding_enabled():
+        return post_list.prefetch_related("author", "group")
+    return post_list.select_related("author", "group")
+
+
+def with_feed_data(post_list):
+    """
+    Записи ленты вместе с автором, группой и числом комментариев.
+
+    Число комментариев считается коррелированным подзапросом только для
+    записей текущей страницы, без отдельного запроса на каждую запись.
+    """
+    return with_author_and_group(post_list).annotate(
+        comment_count=count_subquery(Comment.objects, "post")
+    )
+
+
+def light_feed_data(post_list):
+    """Записи ленты без числа комментариев — ответ при перегрузке."""
+    return with_author_and_group(post_list)
+
+
+class FeedList:
+    """
+    Лента для Paginator.
+
+    Количество считается по простой выборке, а записи страницы
+    загружаются вместе с данными для шаблона (prepare), чтобы подзапросы
+    аннотаций не попадали в COUNT(*).
+    """
+
+    ordered = True
+
+    def __init__(self, queryset, prepare=with_feed_data):
+        self.queryset = queryset
+        self.prepare = prepare
+
+    def count(self):
+        return self.queryset.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        return self.prepare(self.queryset)[key]
+
+
+class RequestLoaders:
+    def __init__(self, user):
+        self.user_id = user.pk if user.is_authenticated else None
+        self.authors = DataLoader(self.load_authors)
+
+    def load_authors(self, usernames):
+        """Авторы вместе со счётчиками карточки автора одним запросом."""
+        counts = {
+            "followers_count": count_subquery(Follow.objects, "author"),
+            "following_count": count_subquery(Follow.objects, "user"),
+        }
+        if not sharding_enabled():
+            counts["posts_count"] = count_subquery(Post.objects, "author")
+        authors = User.objects.filter(username__in=usernames).annotate(
+            **counts
+        )
+        if self.user_id is not None:
+            authors = authors.annotate(is_followed=Exists(
+                Follow.objects.filter(
+                    user_id=self.user_id,
+                    author=OuterRef("pk")
+                )
+            ))
+        authors = {author.username: author for author in authors}
+        if sharding_enabled():
+            # записи автора лежат в его базе, а не в основной
+            for author in authors.values():
+                author.posts_count = Post.objects.using(
+                    shard_for_author(author.pk)
+                ).filter(author_id=author.pk).count()
+        return authors
+
+
+def load_page(paginator, number):
+    """Страница паджинатора с уже выполненной выборкой записей."""
+    page = paginator.get_page(number)
+    page.object_list = list(page.object_list)
+    return page
+
+
+def get_loaders(request):
+    """Загрузчики текущего запроса."""
+    if not hasattr(request, "_loaders"):
+        request._loaders = RequestLoaders(request.user)
+    return request._loaders
+
+
+def parallel_allowed():
+    """
+    Параллельные выборки имеют смысл, только если СУБД принимает
+    несколько соединений одновременно и мы не внутри транзакции:
+    другие потоки не увидели бы её незафиксированных данных.
+    """
+    return (
+        settings.PARALLEL_QUERIES
+        and connection.vendor != "sqlite"
+        and not connection.in_atomic_block
+    )
+
+
+def _run_in_thread(func):
+    close_old_connections()
+    return func()
+
+
+def run_parallel(*funcs):
+    """Выполняет независимые выборки и возвращает их результаты по порядку."""
+    if not parallel_allowed():
+        return [func() for func in funcs]
+    futures = [
+        _executor.submit(_run_in_thread, tracing.bind(func))
+        for func in funcs
+    ]
+    return [future.result() for future in futures]
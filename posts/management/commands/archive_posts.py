@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.archive import archive_posts, purge_deleted
+
+
+class Command(BaseCommand):
+    help = "Переносит старые записи и их комментарии в архив"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help="Архивировать записи старше стольких дней",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--purge-deleted",
+            action="store_true",
+            help="Физически удалить записи, помеченные удалёнными",
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_posts(options["days"], options["batch_size"])
+        self.stdout.write(f"Перенесено в архив записей: {archived}")
+        if options["purge_deleted"]:
+            purged = purge_deleted(options["batch_size"])
+            self.stdout.write(f"Удалено записей: {purged}")
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.deletion import CHUNK_SIZE, delete_posts, delete_users
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = "Пакетно удаляет пользователей и записи со всем содержимым"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            dest="usernames",
+            action="append",
+            default=[],
+            help="Имя удаляемого пользователя (можно повторять)",
+        )
+        parser.add_argument(
+            "--post",
+            dest="post_ids",
+            action="append",
+            type=int,
+            default=[],
+            help="Идентификатор удаляемой записи (можно повторять)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def progress(self, label, deleted):
+        self.stdout.write(f"{label}: удалено {deleted}")
+
+    def handle(self, *args, **options):
+        if not options["usernames"] and not options["post_ids"]:
+            raise CommandError("Укажите --user или --post")
+        if options["post_ids"]:
+            deleted = delete_posts(
+                Post.all_objects.filter(pk__in=options["post_ids"]),
+                options["chunk_size"],
+                self.progress
+            )
+            self.stdout.write(f"Удалено записей: {deleted}")
+        if options["usernames"]:
+            deleted = delete_users(
+                User.objects.filter(username__in=options["usernames"]),
+                options["chunk_size"],
+                self.progress
+            )
+            self.stdout.write(f"Удалено пользователей: {deleted}")
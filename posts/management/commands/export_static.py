@@ -0,0 +1,42 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import ExportError, export
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает публичные страницы в статические файлы; повторный "
+        "запуск перерисовывает только изменившиеся"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=settings.STATIC_EXPORT_ROOT,
+            help="Каталог выгрузки",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Число процессов; 1 — без пула",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Перерисовать всё и удалить устаревшие файлы",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            written = export(
+                options["output"],
+                workers=options["workers"],
+                full=options["full"],
+            )
+        except ExportError as error:
+            raise CommandError(f"Выгрузка прервана: {error}")
+        self.stdout.write(f"Записано страниц: {written}")
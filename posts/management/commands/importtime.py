@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Запуск воркера: настройка Django, WSGI-приложение и URLconf, которую
+# загружает первый запрос. Последней строкой — пиковая память процесса.
+STARTUP_SCRIPT = (
+    "import resource\n"
+    "from django.core.wsgi import get_wsgi_application\n"
+    "from django.urls import get_resolver\n"
+    "application = get_wsgi_application()\n"
+    "get_resolver().url_patterns\n"
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+
+def parse_importtime(output):
+    """
+    Собственное время импорта (мкс) и число модулей по пакетам верхнего
+    уровня из вывода python -X importtime.
+    """
+    packages = defaultdict(lambda: [0, 0])
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # заголовок таблицы
+        package = packages[name.strip().split(".")[0]]
+        package[0] += int(self_us)
+        package[1] += 1
+    return packages
+
+
+class Command(BaseCommand):
+    help = (
+        "Стоимость импорта при запуске воркера (python -X importtime) "
+        "по пакетам и пиковая память процесса"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--role",
+            nargs="+",
+            choices=("full", "feed"),
+            default=[settings.YATUBE_ROLE],
+            help="Роли для замера (YATUBE_ROLE), можно несколько",
+        )
+        parser.add_argument(
+            "--env",
+            # YATUBE_ENV есть только в профилях yatube.settings
+            default=getattr(
+                settings,
+                "YATUBE_ENV",
+                os.environ.get("YATUBE_ENV", "production")
+            ),
+            help="Профиль настроек (YATUBE_ENV)",
+        )
+        parser.add_argument("--top", type=int, default=15)
+
+    def measure(self, role, profile):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE="yatube.settings",
+            YATUBE_ENV=profile,
+            YATUBE_ROLE=role,
+        )
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        max_rss_kb = int(result.stdout.split()[-1])
+        return parse_importtime(result.stderr), max_rss_kb
+
+    def handle(self, *args, **options):
+        for role in options["role"]:
+            packages, max_rss_kb = self.measure(role, options["env"])
+            self.stdout.write(f"Роль {role}, профиль {options['env']}")
+            self.stdout.write(f"{'Пакет':<30}{'Модулей':>10}{'мс':>10}")
+            ranked = sorted(
+                packages.items(),
+                key=lambda item: item[1][0],
+                reverse=True
+            )
+            for name, (self_us, modules) in ranked[:options["top"]]:
+                self.stdout.write(
+                    f"{name:<30}{modules:>10}{self_us / 1000:>10.1f}"
+                )
+            total_us = sum(self_us for self_us, _ in packages.values())
+            total_modules = sum(modules for _, modules in packages.values())
+            self.stdout.write(
+                f"Всего: {total_modules} модулей, {total_us / 1000:.1f} мс, "
+                f"пиковая память {max_rss_kb / 1024:.1f} МБ\n"
+            )
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.sharding import reshard
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит записи с комментариями в базы, положенные им "
+        "по POST_SHARDS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from",
+            dest="sources",
+            action="append",
+            default=[],
+            help=(
+                "Ещё одна база с записями, например выведенная "
+                "из POST_SHARDS"
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать, сколько записей куда переедет",
+        )
+
+    def handle(self, *args, **options):
+        unknown = [
+            alias for alias in [*settings.POST_SHARDS, *options["sources"]]
+            if alias not in settings.DATABASES
+        ]
+        if unknown:
+            raise CommandError(f"Нет таких баз: {', '.join(unknown)}")
+        moved = reshard(
+            options["sources"],
+            options["batch_size"],
+            options["dry_run"]
+        )
+        verb = "Переедет" if options["dry_run"] else "Перенесено"
+        for (source, target), count in sorted(moved.items()):
+            self.stdout.write(f"{verb} из {source} в {target}: {count}")
+        self.stdout.write(f"Всего записей: {sum(moved.values())}")
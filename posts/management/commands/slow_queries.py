@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from yatube.slowlog import aggregate, read_log
+
+
+class Command(BaseCommand):
+    help = "Самые долгие запросы к базе по журналу медленных запросов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--log",
+            default=settings.SLOW_QUERY_LOG,
+            help="Файл журнала (SLOW_QUERY_LOG)",
+        )
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="Вывести план самого долгого запроса каждой группы",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["log"], encoding="utf-8") as f:
+                groups = aggregate(read_log(f))
+        except FileNotFoundError:
+            raise CommandError(f"Нет журнала {options['log']}")
+        self.stdout.write(
+            f"{'Всего, мс':>12}{'Запросов':>10}{'Среднее':>10}{'Макс.':>10}"
+        )
+        for group in groups[:options["top"]]:
+            self.stdout.write(
+                f"{group['total_ms']:>12.1f}{group['count']:>10}"
+                f"{group['total_ms'] / group['count']:>10.1f}"
+                f"{group['max_ms']:>10.1f}"
+            )
+            self.stdout.write(f"    {group['fingerprint']}")
+            for caller, count in group["callers"].most_common(3):
+                self.stdout.write(f"    {count} × {caller}")
+            if options["plans"] and group["plan"]:
+                for line in group["plan"]:
+                    self.stdout.write(f"      {line}")
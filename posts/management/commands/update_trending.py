@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import update_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает рейтинг популярных записей по событиям после "
+        "предыдущего запуска (запускать периодически, например из cron)"
+    )
+
+    def handle(self, *args, **options):
+        updated = update_scores()
+        self.stdout.write(f"Обновлён рейтинг записей: {updated}")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.warmup import warm
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогревает кеш: первые страницы главной, крупные группы, "
+        "популярные профили и миниатюры на них"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "urls",
+            nargs="*",
+            help="Адреса вместо списка горячих страниц",
+        )
+
+    def handle(self, *args, **options):
+        results = warm(options["urls"] or None)
+        for url, status, ms in results:
+            self.stdout.write(f"{status} {ms:>8.1f} мс  {url}")
+        failed = sum(1 for _, status, _ in results if status != 200)
+        self.stdout.write(
+            f"Прогрето страниц: {len(results) - failed}, с ошибкой: {failed}"
+        )
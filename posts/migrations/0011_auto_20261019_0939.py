@@ -0,0 +1,69 @@
+# Generated by Django 2.2.9 on 2026-10-19 09:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0010_auto_20261019_0938'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Flag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(blank=True, max_length=200, verbose_name='Причина')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата жалобы')),
+                ('resolved', models.BooleanField(default=False, verbose_name='Рассмотрена')),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='posts_post_live_pub_date',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='Скрыт модератором'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='Скрыта модератором'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(is_hidden=False), fields=['post', '-created'], name='posts_comment_visible_post'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('is_hidden', False)), fields=['-pub_date'], name='posts_post_live_pub_date'),
+        ),
+        migrations.AddField(
+            model_name='flag',
+            name='comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='flags', to='posts.Comment'),
+        ),
+        migrations.AddField(
+            model_name='flag',
+            name='post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='flags', to='posts.Post'),
+        ),
+        migrations.AddField(
+            model_name='flag',
+            name='reporter',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flags', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='flag',
+            index=models.Index(condition=models.Q(resolved=False), fields=['post', 'comment'], name='posts_flag_open_target'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.9 on 2026-10-19 09:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_auto_20261019_0939'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post')),
+                ('score', models.FloatField(db_index=True, verbose_name='Рейтинг')),
+                ('updated', models.DateTimeField(db_index=True, verbose_name='Учтены события до')),
+            ],
+            options={
+                'ordering': ['-score'],
+            },
+        ),
+    ]
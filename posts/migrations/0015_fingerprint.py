@@ -0,0 +1,62 @@
+# Generated by Django 2.2.9 on 2026-10-19 10:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text_hash', models.CharField(max_length=40, verbose_name='Хеш текста')),
+                ('simhash', models.BigIntegerField(verbose_name='SimHash')),
+                ('band0', models.PositiveIntegerField()),
+                ('band1', models.PositiveIntegerField()),
+                ('band2', models.PositiveIntegerField()),
+                ('band3', models.PositiveIntegerField()),
+                ('band4', models.PositiveIntegerField()),
+                ('band5', models.PositiveIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to=settings.AUTH_USER_MODEL)),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='posts.Comment')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='posts.Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='fingerprint',
+            index=models.Index(fields=['text_hash', 'created'], name='posts_fingerprint_hash'),
+        ),
+        migrations.AddIndex(
+            model_name='fingerprint',
+            index=models.Index(fields=['band0', 'created'], name='posts_fingerprint_band0'),
+        ),
+        migrations.AddIndex(
+            model_name='fingerprint',
+            index=models.Index(fields=['band1', 'created'], name='posts_fingerprint_band1'),
+        ),
+        migrations.AddIndex(
+            model_name='fingerprint',
+            index=models.Index(fields=['band2', 'created'], name='posts_fingerprint_band2'),
+        ),
+        migrations.AddIndex(
+            model_name='fingerprint',
+            index=models.Index(fields=['band3', 'created'], name='posts_fingerprint_band3'),
+        ),
+        migrations.AddIndex(
+            model_name='fingerprint',
+            index=models.Index(fields=['band4', 'created'], name='posts_fingerprint_band4'),
+        ),
+        migrations.AddIndex(
+            model_name='fingerprint',
+            index=models.Index(fields=['band5', 'created'], name='posts_fingerprint_band5'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.9 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'id'], name='posts_follow_author_id'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['user', 'id'], name='posts_follow_user_id'),
+        ),
+    ]
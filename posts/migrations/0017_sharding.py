@@ -0,0 +1,72 @@
+# Generated by Django 2.2.9 on 2026-10-19 10:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_follow_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Модель')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Последний id')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='comment', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='fingerprint',
+            name='comment',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='posts.Comment'),
+        ),
+        migrations.AlterField(
+            model_name='fingerprint',
+            name='post',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='posts.Post'),
+        ),
+        migrations.AlterField(
+            model_name='flag',
+            name='comment',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='flags', to='posts.Comment'),
+        ),
+        migrations.AlterField(
+            model_name='flag',
+            name='post',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='flags', to='posts.Post'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='comment',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Comment'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='post',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='group',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to='posts.Group'),
+        ),
+        migrations.AlterField(
+            model_name='postscore',
+            name='post',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='posts.Post'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.9 on 2026-10-19 10:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_sharding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fingerprint',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='Учитывается'),
+        ),
+        migrations.AlterField(
+            model_name='flag',
+            name='reporter',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='flags', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.9 on 2026-10-19 10:32
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_duplicate_scope'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='archivedpost',
+            options={'ordering': ['-pub_date', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ['-pub_date', '-id']},
+        ),
+    ]
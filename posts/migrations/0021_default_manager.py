@@ -0,0 +1,26 @@
+# Generated by Django 2.2.9 on 2026-10-19 10:39
+
+from django.db import migrations
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_archived_comment_hidden'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='comment',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='post',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.9 on 2026-10-19 10:59
+
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_default_manager'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='archivedpost',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedpost',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='Удалена'),
+        ),
+        migrations.AddField(
+            model_name='archivedpost',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='Скрыта модератором'),
+        ),
+    ]
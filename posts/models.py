@@ -16,7 +16,24 @@ class Group(models.Model):
         return self.title
 
 
+class PostManager(models.Manager):
+    """Записи без помеченных удалёнными и скрытых модератором."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            is_deleted=False,
+            is_hidden=False
+        )
+
+
 class Post(models.Model):
+    """
+    Запись автора.
+
+    Записи с комментариями можно разнести по нескольким базам
+    (POST_SHARDS), поэтому внешние ключи между ними и остальными
+    таблицами не создают ограничений в базе данных.
+    """
     text = models.TextField(verbose_name='Текст статьи')
     pub_date = models.DateTimeField(
         "Дата публикации", 
@@ -28,34 +45,342 @@ class Post(models.Model):
         on_delete=models.CASCADE,
         related_name="posts",
         blank=True,
-        null=True
+        null=True,
+        db_constraint=False
+    )
+    author = models.ForeignKey(
+        User,
+        models.CASCADE,
+        "posts",
+        db_constraint=False
     )
-    author = models.ForeignKey(User, models.CASCADE, "posts")
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    is_deleted = models.BooleanField("Удалена", default=False)
+    is_hidden = models.BooleanField("Скрыта модератором", default=False)
+    updated = models.DateTimeField("Изменена", auto_now=True, db_index=True)
+
+    # all_objects объявлен первым и потому менеджер по умолчанию:
+    # dumpdata и обходы связей видят и удалённые, и скрытые записи
+    all_objects = models.Manager()
+    objects = PostManager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date'],
+                name='posts_post_live_pub_date',
+                condition=models.Q(is_deleted=False, is_hidden=False)
+            ),
+        ]
 
     def __str__(self):
         return self.text
 
+    def soft_delete(self):
+        """
+        Скрывает запись без каскадного удаления комментариев;
+        физически строки удаляет команда archive_posts --purge-deleted.
+        """
+        self.is_deleted = True
+        self.save(update_fields=['is_deleted'])
+        Fingerprint.objects.filter(post=self, comment=None).update(
+            is_active=False
+        )
+
+
+class CommentManager(models.Manager):
+    """Комментарии без скрытых модератором."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_hidden=False)
+
     
 class Comment(models.Model):
     post = models.ForeignKey(Post, models.CASCADE, "comments")
-    author = models.ForeignKey(User, models.CASCADE, "comment")
+    author = models.ForeignKey(
+        User,
+        models.CASCADE,
+        "comment",
+        db_constraint=False
+    )
     text = models.TextField("Текст комментария")
-    created = models.DateTimeField("Дата публикации", auto_now_add=True)
+    created = models.DateTimeField(
+        "Дата публикации",
+        auto_now_add=True,
+        db_index=True
+    )
+    is_hidden = models.BooleanField("Скрыт модератором", default=False)
+
+    all_objects = models.Manager()
+    objects = CommentManager()
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='posts_comment_visible_post',
+                condition=models.Q(is_hidden=False)
+            ),
+        ]
 
     def __str__(self):
         return self.text
 
 
+class Flag(models.Model):
+    """Жалоба пользователя на запись или комментарий."""
+    # без автора жалобы — поставлена автоматически (поиск повторов)
+    reporter = models.ForeignKey(
+        User,
+        models.CASCADE,
+        "flags",
+        blank=True,
+        null=True
+    )
+    post = models.ForeignKey(
+        Post,
+        models.CASCADE,
+        "flags",
+        blank=True,
+        null=True,
+        db_constraint=False
+    )
+    comment = models.ForeignKey(
+        Comment,
+        models.CASCADE,
+        "flags",
+        blank=True,
+        null=True,
+        db_constraint=False
+    )
+    reason = models.CharField("Причина", max_length=200, blank=True)
+    created = models.DateTimeField("Дата жалобы", auto_now_add=True)
+    resolved = models.BooleanField("Рассмотрена", default=False)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', 'comment'],
+                name='posts_flag_open_target',
+                condition=models.Q(resolved=False)
+            ),
+        ]
+
+    def __str__(self):
+        return f"Жалоба на {self.comment or self.post}"
+
+
+class Fingerprint(models.Model):
+    """
+    Отпечаток текста записи или комментария для поиска повторов.
+
+    text_hash — SHA-1 нормализованного текста, simhash — 64-битный SimHash
+    его слов. У комментария post — запись, к которой он написан.
+    band0..band5 — шесть частей simhash по 10–11 бит: у текстов,
+    отличающихся не более чем пятью битами, хотя бы одна часть совпадает,
+    поэтому похожие тексты находятся по индексам без сравнения текстов.
+    """
+    author = models.ForeignKey(User, models.CASCADE, "fingerprints")
+    post = models.ForeignKey(
+        Post,
+        models.CASCADE,
+        "fingerprints",
+        blank=True,
+        null=True,
+        db_constraint=False
+    )
+    comment = models.ForeignKey(
+        Comment,
+        models.CASCADE,
+        "fingerprints",
+        blank=True,
+        null=True,
+        db_constraint=False
+    )
+    text_hash = models.CharField("Хеш текста", max_length=40)
+    simhash = models.BigIntegerField("SimHash")
+    band0 = models.PositiveIntegerField()
+    band1 = models.PositiveIntegerField()
+    band2 = models.PositiveIntegerField()
+    band3 = models.PositiveIntegerField()
+    band4 = models.PositiveIntegerField()
+    band5 = models.PositiveIntegerField()
+    # снимается, когда запись или комментарий удалены или скрыты
+    is_active = models.BooleanField("Учитывается", default=True)
+    created = models.DateTimeField("Дата", auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['text_hash', 'created'],
+                name='posts_fingerprint_hash'
+            ),
+        ] + [
+            models.Index(
+                fields=[f'band{band}', 'created'],
+                name=f'posts_fingerprint_band{band}'
+            )
+            for band in range(6)
+        ]
+
+
+class PostScore(models.Model):
+    """
+    Рейтинг записи для ленты популярного.
+
+    score — логарифм суммы весов событий (публикация, комментарии),
+    каждое из которых затухает вдвое за TRENDING_HALF_LIFE_HOURS.
+    Значения отсчитываются от общей точки, поэтому их можно сравнивать
+    без пересчёта. updated — момент пересчёта: все события до него учтены.
+    """
+    post = models.OneToOneField(
+        Post,
+        models.CASCADE,
+        primary_key=True,
+        related_name="score",
+        db_constraint=False
+    )
+    score = models.FloatField("Рейтинг", db_index=True)
+    updated = models.DateTimeField("Учтены события до", db_index=True)
+
+    class Meta:
+        ordering = ['-score']
+
+
+class Notification(models.Model):
+    """Уведомление о комментарии к записи или новом подписчике."""
+    COMMENT = 1
+    FOLLOW = 2
+    VERBS = (
+        (COMMENT, "прокомментировал(а) вашу запись"),
+        (FOLLOW, "подписался(ась) на вас"),
+    )
+
+    recipient = models.ForeignKey(User, models.CASCADE, "notifications")
+    actor = models.ForeignKey(User, models.CASCADE, "sent_notifications")
+    verb = models.PositiveSmallIntegerField("Событие", choices=VERBS)
+    post = models.ForeignKey(
+        Post,
+        models.CASCADE,
+        "+",
+        blank=True,
+        null=True,
+        db_constraint=False
+    )
+    comment = models.ForeignKey(
+        Comment,
+        models.CASCADE,
+        "+",
+        blank=True,
+        null=True,
+        db_constraint=False
+    )
+    created = models.DateTimeField("Дата", auto_now_add=True)
+    is_read = models.BooleanField("Прочитано", default=False)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['recipient', '-id'],
+                name='posts_notification_inbox'
+            ),
+            models.Index(
+                fields=['recipient'],
+                name='posts_notification_unread',
+                condition=models.Q(is_read=False)
+            ),
+        ]
+
+
 class Follow(models.Model):
     user = models.ForeignKey(User, models.CASCADE, "follower")
     author = models.ForeignKey(User, models.CASCADE, "following")
 
     class Meta:
         unique_together = ["user", "author"]
+        # списки подписчиков и подписок листаются по id внутри автора
+        # или подписчика, без OFFSET
+        indexes = [
+            models.Index(
+                fields=['author', 'id'],
+                name='posts_follow_author_id'
+            ),
+            models.Index(
+                fields=['user', 'id'],
+                name='posts_follow_user_id'
+            ),
+        ]
+
+
+class IdSequence(models.Model):
+    """
+    Счётчик id записей или комментариев, общий для всех баз POST_SHARDS:
+    value — последний выданный id (см. posts/sharding.py).
+    """
+    name = models.CharField("Модель", max_length=100, primary_key=True)
+    value = models.BigIntegerField("Последний id", default=0)
+
+
+class ArchivedPost(models.Model):
+    """
+    Запись, перенесённая из Post командой archive_posts.
+
+    Хранится в базе ARCHIVE_DATABASE (по умолчанию в основной), поэтому
+    внешние ключи не создают ограничений в базе данных. Скрытые
+    и удалённые записи переносятся с теми же флагами.
+    """
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name='Текст статьи')
+    pub_date = models.DateTimeField("Дата публикации", db_index=True)
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.DO_NOTHING,
+        related_name="archived_posts",
+        blank=True,
+        null=True,
+        db_constraint=False
+    )
+    author = models.ForeignKey(
+        User,
+        models.DO_NOTHING,
+        "archived_posts",
+        db_constraint=False
+    )
+    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    is_deleted = models.BooleanField("Удалена", default=False)
+    is_hidden = models.BooleanField("Скрыта модератором", default=False)
+
+    all_objects = models.Manager()
+    objects = PostManager()
+
+    is_archived = True
+
+    class Meta:
+        ordering = ['-pub_date', '-id']
+
+    def __str__(self):
+        return self.text
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(ArchivedPost, models.CASCADE, "comments")
+    author = models.ForeignKey(
+        User,
+        models.DO_NOTHING,
+        "archived_comments",
+        db_constraint=False
+    )
+    text = models.TextField("Текст комментария")
+    created = models.DateTimeField("Дата публикации")
+    is_hidden = models.BooleanField("Скрыт модератором", default=False)
+
+    class Meta:
+        ordering = ['-created']
+
+    def __str__(self):
+        return self.text
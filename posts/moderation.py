@@ -0,0 +1,138 @@
+"""
+Модерация: пакетные действия над содержимым. Очередь жалоб — FlagAdmin
+(posts/admin.py): объекты с наибольшим числом жалоб первыми.
+
+Каждое действие — несколько UPDATE по множеству строк, без загрузки
+объектов. Скрытые записи и комментарии отсекаются менеджерами моделей
+по флагу is_hidden, на который опираются частичные индексы лент.
+Записи и комментарии меняются во всех базах POST_SHARDS (each_shard)
+и в архиве (update_archived); транзакция действия охватывает только
+основную базу.
+
+Идентификаторы принимаются списками или выборками values_list(flat=True)
+и вычисляются один раз до первого изменения: иначе выборка с фильтром по
+тем же флагам вернула бы для следующих UPDATE другие строки.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.auth import forget_users
+
+from . import fingerprints
+from .deletion import delete_queryset, invalidate_feed_caches
+from .notfound import forget_posts
+from .models import (ArchivedComment, ArchivedPost, Comment, Fingerprint,
+                     Flag, Post, User)
+from .sharding import each_shard
+
+
+def resolve_flags(post_ids=(), comment_ids=()):
+    Flag.objects.filter(resolved=False, post_id__in=post_ids).update(
+        resolved=True
+    )
+    Flag.objects.filter(resolved=False, comment_id__in=comment_ids).update(
+        resolved=True
+    )
+
+
+def update_all(queryset, **values):
+    """UPDATE queryset во всех базах, где лежат его строки."""
+    for part in each_shard(queryset):
+        part.update(**values)
+
+
+def update_archived(post_ids=(), comment_ids=(), **values):
+    """Те же флаги у записей и комментариев, уже перенесённых в архив."""
+    ArchivedPost.all_objects.filter(pk__in=post_ids).update(**values)
+    if comment_ids:
+        ArchivedComment.objects.filter(pk__in=comment_ids).update(**values)
+
+
+def touch(post_ids=(), comment_ids=()):
+    """
+    Отмечает изменёнными записи и записи с изменёнными комментариями:
+    по полю updated их страницы находит экспорт статической копии.
+    """
+    update_all(
+        Post.all_objects.filter(
+            Q(pk__in=post_ids) | Q(comments__in=comment_ids)
+        ),
+        updated=timezone.now()
+    )
+
+
+@transaction.atomic
+def hide(post_ids=(), comment_ids=()):
+    """Скрывает записи и комментарии и закрывает жалобы на них."""
+    post_ids, comment_ids = list(post_ids), list(comment_ids)
+    update_all(Post.all_objects.filter(pk__in=post_ids), is_hidden=True)
+    update_all(Comment.all_objects.filter(pk__in=comment_ids), is_hidden=True)
+    update_archived(post_ids, comment_ids, is_hidden=True)
+    touch(post_ids, comment_ids)
+    fingerprints.set_active(False, post_ids, comment_ids)
+    resolve_flags(post_ids, comment_ids)
+    invalidate_feed_caches()
+
+
+@transaction.atomic
+def unhide(post_ids=(), comment_ids=()):
+    post_ids, comment_ids = list(post_ids), list(comment_ids)
+    update_all(Post.all_objects.filter(pk__in=post_ids), is_hidden=False)
+    update_all(
+        Comment.all_objects.filter(pk__in=comment_ids), is_hidden=False
+    )
+    update_archived(post_ids, comment_ids, is_hidden=False)
+    touch(post_ids, comment_ids)
+    fingerprints.set_active(True, post_ids, comment_ids)
+    forget_posts(post_ids)
+    invalidate_feed_caches()
+
+
+@transaction.atomic
+def delete(post_ids=(), comment_ids=()):
+    """
+    Удаляет записи мягко (флаг is_deleted; физически их удаляет команда
+    archive_posts --purge-deleted), а комментарии — сразу, вместе с
+    жалобами на них: в отличие от скрытия, unhide их не вернёт.
+    """
+    post_ids, comment_ids = list(post_ids), list(comment_ids)
+    update_all(Post.all_objects.filter(pk__in=post_ids), is_deleted=True)
+    update_archived(post_ids, is_deleted=True)
+    touch(post_ids, comment_ids)
+    fingerprints.set_active(False, post_ids)
+    resolve_flags(post_ids)
+    delete_queryset(Comment.all_objects.filter(pk__in=comment_ids))
+    delete_queryset(ArchivedComment.objects.filter(pk__in=comment_ids))
+    invalidate_feed_caches()
+
+
+@transaction.atomic
+def ban(user_ids):
+    """Блокирует пользователей и скрывает всё их содержимое."""
+    user_ids = list(user_ids)
+    User.objects.filter(pk__in=user_ids).update(is_active=False)
+    forget_users(user_ids)
+    posts = Post.all_objects.filter(author_id__in=user_ids)
+    comments = Comment.all_objects.filter(author_id__in=user_ids)
+    # жалобы лежат в основной базе: с записями других баз их не соединить
+    post_ids = [
+        pk for part in each_shard(posts)
+        for pk in part.values_list("pk", flat=True)
+    ]
+    comment_ids = [
+        pk for part in each_shard(comments)
+        for pk in part.values_list("pk", flat=True)
+    ]
+    update_all(posts, is_hidden=True, updated=timezone.now())
+    touch(comment_ids=comment_ids)
+    update_all(comments, is_hidden=True)
+    ArchivedPost.all_objects.filter(author_id__in=user_ids).update(
+        is_hidden=True
+    )
+    ArchivedComment.objects.filter(author_id__in=user_ids).update(
+        is_hidden=True
+    )
+    Fingerprint.objects.filter(author_id__in=user_ids).update(is_active=False)
+    resolve_flags(post_ids, comment_ids)
+    invalidate_feed_caches()
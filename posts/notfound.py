@@ -0,0 +1,90 @@
+"""
+Дешёвый ответ 404 для несуществующих авторов и записей.
+
+Одиночный сегмент пути попадает в профиль, поэтому сканеры, перебирающие
+/wp-admin/, /.env/ и подобное, раньше стоили запроса к базе и полного
+рендеринга шаблона. Теперь зарезервированные имена отсекаются до базы,
+найденные отсутствующими ключи запоминаются в кеше на
+NOT_FOUND_CACHE_TIMEOUT секунд, а анонимам отдаётся заранее отрендеренная
+страница 404. Запоминание сбрасывают сигналы (posts/signals.py) и
+действия, меняющие видимость записей через update().
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseNotFound
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.html import escape
+
+from users.validators import is_reserved_username
+
+PATH_PLACEHOLDER = "__not_found_path__"
+
+_prerendered = None
+
+
+def user_key(username):
+    return f"missing:user:{username}"
+
+
+def post_key(post_id):
+    # ключ без имени автора: сигналу сохранения записи не нужен запрос
+    # к пользователям, а имя из адреса хранится значением
+    return f"missing:post:{post_id}"
+
+
+def author_missing(username):
+    return is_reserved_username(username) or bool(
+        cache.get(user_key(username))
+    )
+
+
+def post_missing(username, post_id):
+    return author_missing(username) or (
+        cache.get(post_key(post_id)) == username
+    )
+
+
+def remember_missing(key, value=True):
+    cache.set(key, value, settings.NOT_FOUND_CACHE_TIMEOUT)
+
+
+def forget_users(usernames):
+    cache.delete_many([user_key(username) for username in usernames])
+
+
+def forget_post(post):
+    cache.delete(post_key(post.pk))
+
+
+def forget_posts(post_ids):
+    """Сбрасывает запомненное отсутствие записей, снова ставших видимыми."""
+    cache.delete_many([post_key(post_id) for post_id in post_ids])
+
+
+def prerendered_body():
+    """Страница 404 для анонимов, отрендеренная один раз на процесс."""
+    global _prerendered
+    if _prerendered is None or settings.DEBUG:
+        _prerendered = render_to_string(
+            "misc/404.html",
+            {"path": PATH_PLACEHOLDER}
+        )
+    return _prerendered
+
+
+def not_found(request):
+    """
+    Ответ 404. Пользователю с сессией страница рендерится полностью,
+    чтобы навигация показывала его имя.
+    """
+    if request.user.is_authenticated:
+        return render(
+            request,
+            "misc/404.html",
+            {"path": request.path},
+            status=404
+        )
+    return HttpResponseNotFound(
+        prerendered_body().replace(PATH_PLACEHOLDER, escape(request.path))
+    )
@@ -0,0 +1,64 @@
+"""
+Уведомления о комментариях к своим записям и новых подписчиках.
+
+Уведомление пишется в транзакции запроса: откат действия откатывает и
+его, а остановка воркера не теряет уже отвеченные. Число непрочитанных
+кешируется ненадолго (NOTIFICATIONS_CACHE_TIMEOUT) и при каждом
+изменении удаляется, а не сдвигается: при промахе оно пересчитывается
+по базе, поэтому значок не врёт дольше таймаута даже с кешем, своим у
+каждого воркера.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Notification
+
+
+def unread_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def unread_count(user_id):
+    count = cache.get(unread_key(user_id))
+    if count is None:
+        count = Notification.objects.filter(
+            recipient_id=user_id,
+            is_read=False
+        ).count()
+        cache.set(
+            unread_key(user_id),
+            count,
+            settings.NOTIFICATIONS_CACHE_TIMEOUT
+        )
+    return count
+
+
+def forget_unread(user_id):
+    """Счётчик будет посчитан заново при следующем чтении."""
+    cache.delete(unread_key(user_id))
+
+
+def notify(recipient_id, actor_id, verb, post_id=None, comment_id=None):
+    """Уведомляет recipient о действии actor (о своих действиях — нет)."""
+    if recipient_id == actor_id:
+        return
+    Notification.objects.create(
+        recipient_id=recipient_id,
+        actor_id=actor_id,
+        verb=verb,
+        post_id=post_id,
+        comment_id=comment_id
+    )
+    forget_unread(recipient_id)
+
+
+def mark_read(user_id, notification_ids):
+    """Отмечает прочитанными уведомления одним запросом."""
+    updated = Notification.objects.filter(
+        recipient_id=user_id,
+        is_read=False,
+        id__in=notification_ids
+    ).update(is_read=True)
+    if updated:
+        forget_unread(user_id)
+    return updated
@@ -0,0 +1,89 @@
+"""
+Паджинатор лент с кешированным числом записей и сокращённым списком
+страниц.
+
+COUNT(*) по ленте выполняется один раз и хранится в кеше под ключом,
+включающим номер поколения: любое изменение записей или подписок
+увеличивает поколение, и все счётчики пересчитываются при следующем
+чтении. Номера страниц выводятся окном вокруг текущей, поэтому размер
+HTML не растёт вместе с числом записей.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.utils.functional import cached_property
+
+from yatube.singleflight import get_or_build
+
+VERSION_KEY = "feed_count:version"
+
+
+def counts_version():
+    # начальное значение от времени: если ключ вытеснен из кеша,
+    # старые счётчики не оживут под прежним номером
+    cache.add(VERSION_KEY, int(time.time()), None)
+    return cache.get(VERSION_KEY, 0)
+
+
+def bump_counts():
+    """Сбрасывает кешированные счётчики всех лент."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time()), None)
+
+
+class FeedPage(Page):
+    @property
+    def elided_page_range(self):
+        return self.paginator.get_elided_page_range(self.number)
+
+
+class FeedPaginator(Paginator):
+    """
+    count_key — имя ленты для кеширования числа записей (например,
+    "index" или "group:3"); без него счётчик не кешируется.
+    """
+
+    ELLIPSIS = "…"
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        return get_or_build(
+            f"feed_count:{counts_version()}:{self.count_key}",
+            lambda: super(FeedPaginator, self).count,
+            settings.FEED_COUNT_CACHE_TIMEOUT
+        )
+
+    def _get_page(self, *args, **kwargs):
+        return FeedPage(*args, **kwargs)
+
+    def get_elided_page_range(self, number=1, on_each_side=3, on_ends=2):
+        """
+        Номера страниц: первые и последние on_ends и по on_each_side
+        вокруг текущей, пропуски обозначены ELLIPSIS.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
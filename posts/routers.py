@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, router
+
+ARCHIVE_MODELS = {'archivedpost', 'archivedcomment'}
+
+
+def is_archive_model(model):
+    """model — класс модели или её экземпляр."""
+    return (
+        model._meta.app_label == 'posts'
+        and model._meta.model_name in ARCHIVE_MODELS
+    )
+
+
+class ArchiveRouter:
+    """Размещает архивные таблицы в базе ARCHIVE_DATABASE."""
+
+    def db_for_read(self, model, **hints):
+        if is_archive_model(model):
+            return settings.ARCHIVE_DATABASE
+        instance = hints.get('instance')
+        if instance is not None and is_archive_model(instance):
+            # автор и группа архивной записи живут в основной базе
+            return DEFAULT_DB_ALIAS
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_archive_model(obj1) or is_archive_model(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        archive = settings.ARCHIVE_DATABASE
+        if archive == DEFAULT_DB_ALIAS:
+            return None
+        if app_label == 'posts' and model_name in ARCHIVE_MODELS:
+            return db == archive
+        if db == archive:
+            return False
+        return None
+
+
+SHARDED_MODELS = {'post', 'comment'}
+
+
+def is_sharded_model(model):
+    """model — класс модели или её экземпляр."""
+    return (
+        model._meta.app_label == 'posts'
+        and model._meta.model_name in SHARDED_MODELS
+    )
+
+
+def sharding_enabled():
+    return len(settings.POST_SHARDS) > 1
+
+
+def shard_for_author(author_id):
+    """База, в которой лежат записи автора author_id."""
+    return settings.POST_SHARDS[author_id % len(settings.POST_SHARDS)]
+
+
+def databases_for(model):
+    """Базы, в которых лежат строки model."""
+    if is_sharded_model(model) and sharding_enabled():
+        return list(settings.POST_SHARDS)
+    return [router.db_for_write(model)]
+
+
+def shard_of(instance):
+    """База записи или комментария; None, если её не определить."""
+    if not instance._state.adding and instance._state.db:
+        return instance._state.db
+    if instance._meta.model_name == 'post':
+        if instance.author_id is None:
+            return None
+        return shard_for_author(instance.author_id)
+    # новый комментарий живёт в базе своей записи
+    if instance._meta.get_field('post').is_cached(instance):
+        return shard_of(instance.post)
+    return None
+
+
+class ShardRouter:
+    """
+    Размещает записи и комментарии в базах POST_SHARDS по автору записи
+    (см. posts/sharding.py); комментарии — в базе своей записи. Остальные
+    модели живут в основной базе. С одной базой в POST_SHARDS ничего
+    не меняет.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not sharding_enabled():
+            return None
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if not is_sharded_model(model):
+            if is_sharded_model(instance):
+                # автор, группа, жалобы записи — в основной базе
+                return DEFAULT_DB_ALIAS
+            return None
+        if is_sharded_model(instance):
+            return shard_of(instance)
+        if model._meta.model_name == 'post' and (
+            instance._meta.label == settings.AUTH_USER_MODEL
+        ):
+            return shard_for_author(instance.pk)
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if is_sharded_model(obj1) or is_sharded_model(obj2):
+            return True
+        return None
@@ -0,0 +1,258 @@
+"""
+Записи и комментарии в нескольких базах (POST_SHARDS).
+
+Запись живёт в базе POST_SHARDS[id автора % len(POST_SHARDS)], её
+комментарии — там же; пользователи, группы, подписки, жалобы и всё
+остальное — в основной базе. Размещение выбирает ShardRouter
+(posts/routers.py), поэтому author.posts, post.comments и post.save()
+сами попадают в нужную базу. Схема во всех базах одинаковая: лишние
+таблицы в базах записей просто пустуют.
+
+id записей и комментариев уникальны во всех базах: процесс берёт их
+блоками по SHARD_ID_BLOCK из счётчика IdSequence в основной базе. Главная
+и ленты групп собираются из всех баз сразу (ShardedFeed), страница записи
+и профиль читают одну базу автора, лента подписок и опрос новых записей
+(posts_since) — все базы. Пакетное удаление (posts/deletion.py),
+модерация, уведомления и статическая выгрузка обходят все базы (each_shard),
+список записей в админке читает базу, выбранную фильтром «база».
+Популярное, RSS и поиск повторов по-прежнему читают только основную базу.
+
+После изменения POST_SHARDS записи по новым местам переносит reshard().
+"""
+import heapq
+import threading
+from collections import Counter, defaultdict
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max, prefetch_related_objects
+from django.shortcuts import get_object_or_404
+
+from .loaders import FeedList, run_parallel, with_feed_data
+from .models import Comment, Follow, IdSequence, Post, User
+from .routers import databases_for, shard_for_author, sharding_enabled
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def max_id(model):
+    """Наибольший id model во всех базах POST_SHARDS."""
+    return max(
+        model._base_manager.using(alias).aggregate(value=Max("id"))["value"]
+        or 0
+        for alias in settings.POST_SHARDS
+    )
+
+
+def reserve(model, size):
+    """Следующие size id model из общего счётчика: [первый, последний]."""
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        sequence, _ = IdSequence.objects.select_for_update().get_or_create(
+            name=model._meta.label_lower,
+            defaults={"value": max_id(model)}
+        )
+        first = sequence.value + 1
+        sequence.value += size
+        sequence.save(update_fields=["value"])
+    return [first, sequence.value]
+
+
+def next_id(model):
+    """Новый id записи или комментария, не занятый ни в одной базе."""
+    with _blocks_lock:
+        block = _blocks.get(model)
+        if block is None or block[0] > block[1]:
+            block = _blocks[model] = reserve(model, settings.SHARD_ID_BLOCK)
+        block[0] += 1
+        return block[0] - 1
+
+
+class ShardedFeed:
+    """
+    Лента записей из всех баз POST_SHARDS для Paginator.
+
+    Для среза [start:stop] каждая база отдаёт свои первые stop записей,
+    и они сливаются по дате публикации. Дальние страницы поэтому дороже,
+    чем в одной базе; бесконечная прокрутка (feed_more) режет по курсору
+    и всегда просит у баз одну порцию.
+    """
+
+    ordered = True
+
+    def __init__(self, queryset, prepare=with_feed_data):
+        self.queryset = queryset.order_by("-pub_date", "-id")
+        self.prepare = prepare
+
+    def count(self):
+        return sum(run_parallel(*[
+            self.queryset.using(alias).count
+            for alias in settings.POST_SHARDS
+        ]))
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            stop = self.count()
+        parts = run_parallel(*[
+            partial(list, self.prepare(self.queryset.using(alias))[:stop])
+            for alias in settings.POST_SHARDS
+        ])
+        merged = heapq.merge(
+            *parts,
+            key=lambda post: (post.pub_date, post.id),
+            reverse=True
+        )
+        return list(islice(merged, start, stop))
+
+
+def feed_list(queryset, prepare=with_feed_data):
+    """Лента записей queryset из одной базы или из всех баз POST_SHARDS."""
+    if sharding_enabled():
+        return ShardedFeed(queryset, prepare)
+    return FeedList(queryset, prepare)
+
+
+def gather(prepare):
+    """prepare, который выбирает записи сразу из всех баз POST_SHARDS."""
+    if not sharding_enabled():
+        return prepare
+    return lambda post_list: ShardedFeed(post_list, prepare)
+
+
+def followed_posts(user):
+    """Записи авторов, на которых подписан user."""
+    if not sharding_enabled():
+        return Post.objects.filter(author__following__user=user)
+    # подписки лежат в основной базе: соединения с ними в базах записей нет
+    return Post.objects.filter(author_id__in=list(
+        Follow.objects.filter(user=user).values_list("author_id", flat=True)
+    ))
+
+
+def newest(post_list):
+    """(pub_date, id) самой свежей записи post_list во всех базах или None."""
+    rows = [
+        post_list.using(alias).order_by("-pub_date", "-id").values_list(
+            "pub_date", "id"
+        ).first()
+        for alias in databases_for(Post)
+    ]
+    return max(filter(None, rows), default=None)
+
+
+def each_shard(queryset):
+    """queryset в каждой базе, где могут лежать его строки."""
+    return [queryset.using(alias) for alias in databases_for(queryset.model)]
+
+
+def count_all(queryset):
+    """Число строк queryset во всех базах."""
+    return sum(part.count() for part in each_shard(queryset))
+
+
+def attach_posts(items):
+    """
+    Подставляет записи с авторами в items, у которых есть post_id
+    (уведомления, жалобы): select_related("post") из основной базы не
+    видит записей в других базах.
+    """
+    post_ids = {item.post_id for item in items if item.post_id}
+    posts = {}
+    for post_list in each_shard(Post.all_objects.all()):
+        posts.update(post_list.in_bulk(post_ids))
+    prefetch_related_objects(list(posts.values()), "author")
+    for item in items:
+        if item.post_id:
+            type(item).post.field.set_cached_value(
+                item, posts.get(item.post_id)
+            )
+
+
+def author_posts(author_id):
+    """Записи автора из его базы; для author_id=None — пустая выборка."""
+    if author_id is None:
+        return Post.objects.none()
+    return Post.objects.using(shard_for_author(author_id)).filter(
+        author_id=author_id
+    )
+
+
+def get_post(username, post_id):
+    """Запись post_id автора username или Http404."""
+    if not sharding_enabled():
+        return get_object_or_404(
+            Post.objects,
+            pk=post_id,
+            author__username=username
+        )
+    # в базе записей нет пользователей: сначала автор, затем его база
+    author = get_object_or_404(User, username=username)
+    return get_object_or_404(author_posts(author.pk), pk=post_id)
+
+
+def copy_rows(model, rows, target):
+    """
+    Вставляет строки в базу target с прежними id и датами (raw, как
+    loaddata: auto_now_add не перезаписывает pub_date). Строки, уже
+    скопированные прерванным запуском, пропускаются.
+    """
+    existing = set(model._base_manager.using(target).filter(
+        id__in=[row.id for row in rows]
+    ).values_list("id", flat=True))
+    for row in rows:
+        if row.id not in existing:
+            row.save_base(raw=True, force_insert=True, using=target)
+
+
+def move_posts(post_ids, source, target):
+    """Переносит записи post_ids с комментариями из source в target."""
+    posts = Post.all_objects.using(source).filter(id__in=post_ids)
+    comments = Comment.all_objects.using(source).filter(post_id__in=post_ids)
+    # Сначала копируем, потом удаляем: повторный запуск после сбоя
+    # между этими шагами не создаст дублей.
+    with transaction.atomic(using=target):
+        copy_rows(Post, list(posts), target)
+        copy_rows(Comment, list(comments), target)
+    # жалобы, уведомления и рейтинг записей в основной базе остаются:
+    # удаляем только сами строки, без каскада Collector
+    with transaction.atomic(using=source):
+        comments._raw_delete(source)
+        posts._raw_delete(source)
+
+
+def reshard(sources=(), batch_size=500, dry_run=False):
+    """
+    Переносит записи с комментариями в базы, положенные им по POST_SHARDS.
+
+    Просматриваются базы POST_SHARDS и sources — например, выведенные
+    из POST_SHARDS. Возвращает {(откуда, куда): число записей}.
+    """
+    moved = Counter()
+    for source in dict.fromkeys([*settings.POST_SHARDS, *sources]):
+        posts = Post.all_objects.using(source).order_by("id")
+        last_id = 0
+        while True:
+            batch = list(posts.filter(id__gt=last_id).values_list(
+                "id", "author_id"
+            )[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            targets = defaultdict(list)
+            for post_id, author_id in batch:
+                target = shard_for_author(author_id)
+                if target != source:
+                    targets[target].append(post_id)
+            for target, post_ids in targets.items():
+                if not dry_run:
+                    move_posts(post_ids, source, target)
+                moved[source, target] += len(post_ids)
+    return moved
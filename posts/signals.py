@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import notfound
+from .models import Comment, Follow, Post
+from .paginators import bump_counts
+from .routers import sharding_enabled
+from .sharding import next_id
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    notfound.forget_users([instance.username])
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def assign_global_id(sender, instance, raw, **kwargs):
+    """В нескольких базах id выдаёт общий счётчик, а не автоинкремент."""
+    if instance.pk is None and not raw and sharding_enabled():
+        instance.pk = next_id(sender)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, **kwargs):
+    notfound.forget_post(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def feed_changed(sender, **kwargs):
+    bump_counts()
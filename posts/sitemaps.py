@@ -0,0 +1,139 @@
+"""
+Карта сайта: записи, авторы и группы.
+
+Большие разделы делятся на страницы по диапазонам первичных ключей, а не
+по OFFSET: каждая страница — выборка по индексу первичного ключа, и
+новые записи меняют только последнюю страницу. Индекс карты
+(sitemap.xml) перечисляет эти страницы.
+"""
+from django.conf import settings
+from django.contrib.sitemaps import Sitemap
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger
+from django.db.models import Max
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils.functional import cached_property
+
+from .models import Group, Post, User
+
+
+class IdRangePaginator:
+    """
+    Паджинатор для карты сайта: страница number содержит строки с
+    первичным ключом из ((number - 1) * per_page, number * per_page].
+
+    Страницы могут быть неполными, зато не требуют ни COUNT(*), ни OFFSET.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = per_page
+
+    @cached_property
+    def num_pages(self):
+        max_pk = self.object_list.order_by("-pk").values_list(
+            "pk",
+            flat=True
+        ).first()
+        return (max_pk or 0) // self.per_page + 1
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("Номер страницы должен быть числом")
+        if number < 1 or number > self.num_pages:
+            raise EmptyPage("Такой страницы нет")
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        object_list = self.object_list.filter(
+            pk__gt=(number - 1) * self.per_page,
+            pk__lte=number * self.per_page
+        ).order_by("pk")
+        return Page(object_list, number, self)
+
+
+class IdRangeSitemap(Sitemap):
+    @property
+    def limit(self):
+        return settings.SITEMAP_PAGE_SIZE
+
+    @property
+    def paginator(self):
+        return IdRangePaginator(self.items(), self.limit)
+
+
+class PostSitemap(IdRangeSitemap):
+    changefreq = "monthly"
+
+    def items(self):
+        return Post.objects.select_related("author").only(
+            "id",
+            "pub_date",
+            "author__username"
+        )
+
+    def location(self, item):
+        return reverse("post", args=[item.author.username, item.id])
+
+    def lastmod(self, item):
+        return item.pub_date
+
+
+class AuthorSitemap(IdRangeSitemap):
+    changefreq = "daily"
+
+    def items(self):
+        return User.objects.filter(
+            posts__is_deleted=False,
+            posts__is_hidden=False
+        ).annotate(last_post=Max("posts__pub_date")).only("id", "username")
+
+    def location(self, item):
+        return reverse("profile", args=[item.username])
+
+    def lastmod(self, item):
+        return item.last_post
+
+
+class GroupSitemap(Sitemap):
+    changefreq = "daily"
+
+    def items(self):
+        return Group.objects.filter(
+            posts__is_deleted=False,
+            posts__is_hidden=False
+        ).annotate(last_post=Max("posts__pub_date")).only(
+            "id",
+            "slug"
+        ).order_by("pk")
+
+    def location(self, item):
+        return reverse("group_posts", args=[item.slug])
+
+    def lastmod(self, item):
+        return item.last_post
+
+
+SITEMAPS = {
+    "posts": PostSitemap,
+    "authors": AuthorSitemap,
+    "groups": GroupSitemap,
+}
+
+
+def robots_txt(request):
+    """
+    Отправляет поисковых роботов к карте сайта и лентам вместо обхода
+    страниц паджинатора.
+    """
+    sitemap_url = request.build_absolute_uri(reverse("sitemap_index"))
+    return HttpResponse(
+        "User-agent: *\n"
+        "Disallow: /*?page=\n"
+        "Disallow: /admin/\n"
+        f"Sitemap: {sitemap_url}\n",
+        content_type="text/plain"
+    )
@@ -1,10 +1,55 @@
+import datetime as dt
+import gzip
+import io
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.sites.models import Site
 from django.core.cache import cache
 from django.core.cache.utils import make_template_fragment_key
+from django.core.checks import run_checks
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.test import (RequestFactory, TestCase, modify_settings,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+
+from users.auth import user_cache_key
+from users.validators import rename_reserved_users
+from yatube import admission, tracing
+from yatube.singleflight import get_or_build
+from yatube.slowlog import SlowQueryLogger, fingerprint, read_log
+from yatube.storage import CompressedManifestStaticStorage
+from yatube.views import serve
 
-from .models import Comment, Follow, Group, Post, User
+from . import fingerprints, moderation, sharding, trending
+from .admin import PREVIEW_LENGTH, estimated_count
+from .context_processors import about_site
+from .cursors import (after_cursor, between_cursors, decode_cursor,
+                      encode_cursor)
+from .deletion import delete_users
+from .export import ExportError, export
+from .graph import follow_page
+from .management.commands.importtime import parse_importtime
+from .models import (ArchivedComment, ArchivedPost, Comment, Fingerprint,
+                     Flag, Follow, Group, Notification, Post, PostScore, User)
+from .notifications import notify, unread_count
+from .paginators import FeedPaginator
+from .routers import shard_for_author
+from .warmup import warm
 
 
 @override_settings(CACHES={
@@ -259,7 +304,7 @@ class TestImage(TestCase):
 class TestCache(TestCase):
     def get_index(self):
         self.client.get(reverse("index"))
-        return make_template_fragment_key("index_page")
+        return make_template_fragment_key("index_page", [1])
 
     def test_cache(self):
         """
@@ -282,6 +327,20 @@ class TestCache(TestCase):
             msg="Кеш должен сохраняться только в течении 20 секунд"
         )
 
+    def test_viewer_links_not_shared(self):
+        """Ссылки конкретного пользователя не попадают в общий кеш."""
+        author = User.objects.create_user(username="author", password="123")
+        post = Post.objects.create(author=author, text="some text")
+        flag_url = reverse("flag_post", args=["author", post.id])
+        self.client.force_login(User.objects.create_user(username="reader"))
+        self.assertContains(self.client.get(reverse("index")), flag_url)
+        self.client.logout()
+        self.assertNotContains(self.client.get(reverse("index")), flag_url)
+        self.client.force_login(author)
+        resp = self.client.get(reverse("index"))
+        self.assertNotContains(resp, flag_url)
+        self.assertContains(resp, "Редактировать")
+
 
 class TestFollow(TestCase):
     def setUp(self):
@@ -380,3 +439,1914 @@ class TestFollow(TestCase):
             msg="Только авторизированный пользователь может "
                 "комментировать посты."
         )
+
+
+class TestAssets(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user1", password="123")
+        self.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21\xf9'
+            b'\x04\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00'
+            b'\x00\x02\x02\x4c\x01\x00\x3b'
+        )
+
+    def create_post(self, name):
+        return Post.objects.create(
+            author=self.user,
+            text="post with image",
+            image=SimpleUploadedFile(
+                name=name,
+                content=self.small_gif,
+                content_type='image/gif'
+            )
+        )
+
+    def test_content_hashed_upload(self):
+        """Загрузка сохраняется под хешем содержимого, дубли не копируются."""
+        first = self.create_post("first.gif")
+        second = self.create_post("second.GIF")
+        self.assertRegex(first.image.name, r'^posts/[0-9a-f]{32}\.gif$')
+        self.assertEqual(
+            first.image.name,
+            second.image.name,
+            msg="Одинаковые файлы должны храниться под одним именем"
+        )
+
+    def test_immutable_cache_headers(self):
+        """Хешированные загрузки отдаются с бессрочным Cache-Control."""
+        post = self.create_post("small.gif")
+        resp = self.client.get(post.image.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("immutable", resp["Cache-Control"])
+
+    @override_settings(SENDFILE_BACKEND="x-accel-redirect")
+    def test_sendfile(self):
+        """При SENDFILE_BACKEND тело файла отдаёт веб-сервер."""
+        post = self.create_post("small.gif")
+        resp = self.client.get(post.image.url)
+        self.assertEqual(
+            resp["X-Accel-Redirect"],
+            f"/protected/media/{post.image.name}"
+        )
+        self.assertEqual(resp.content, b"")
+
+    def test_precompressed(self):
+        """collectstatic сохраняет сжатую копию, и она отдаётся с gzip."""
+        css = b"body { color: red; }\n" * 100
+        with tempfile.TemporaryDirectory() as root:
+            storage = CompressedManifestStaticStorage(location=root)
+            storage.save("style.css", io.BytesIO(css))
+            storage.save("tiny.css", io.BytesIO(b"a{}"))
+            storage.compress("style.css")
+            storage.compress("tiny.css")
+            with open(os.path.join(root, "style.css.gz"), "rb") as f:
+                self.assertEqual(gzip.decompress(f.read()), css)
+            self.assertFalse(os.path.exists(os.path.join(root, "tiny.css.gz")))
+            factory = RequestFactory()
+            resp = serve(
+                factory.get("/", HTTP_ACCEPT_ENCODING="gzip, br"),
+                "style.css",
+                root
+            )
+            self.assertEqual(resp["Content-Encoding"], "gzip")
+            self.assertEqual(resp["Content-Type"], "text/css")
+            self.assertEqual(resp["Vary"], "Accept-Encoding")
+            resp = serve(factory.get("/"), "style.css", root)
+            self.assertNotIn("Content-Encoding", resp)
+            self.assertEqual(b"".join(resp.streaming_content), css)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    }
+)
+class TestPostsSince(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="123")
+        self.author = User.objects.create_user(
+            username="author",
+            password="123"
+        )
+        self.seen = Post.objects.create(author=self.author, text="seen")
+
+    def test_new_posts(self):
+        """Возвращаются только записи новее последней увиденной."""
+        new = Post.objects.create(author=self.user, text="new")
+        resp = self.client.get(
+            reverse("posts_since"), {"after": encode_cursor(self.seen)}
+        )
+        data = resp.json()
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(data["latest"], encode_cursor(new))
+        self.assertEqual([post["id"] for post in data["posts"]], [new.id])
+
+        resp = self.client.get(
+            reverse("posts_since"),
+            {"after": encode_cursor(new), "count": 1}
+        )
+        self.assertEqual(
+            resp.json(), {"count": 0, "latest": encode_cursor(new)}
+        )
+
+        resp = self.client.get(
+            reverse("posts_since"),
+            {"after": encode_cursor(self.seen), "count": 0}
+        )
+        self.assertEqual(len(resp.json()["posts"]), 1)
+
+    @override_settings(POLL_MAX_WAITERS=0)
+    def test_wait_limited(self):
+        """Аноним и запрос сверх POLL_MAX_WAITERS не ждут новых записей."""
+        params = {"after": encode_cursor(self.seen), "wait": 5}
+        start = time.monotonic()
+        self.client.get(reverse("posts_since"), params)
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("posts_since"), params)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(resp.json()["count"], 0)
+
+    def test_follow_feed(self):
+        """Лента подписок учитывает только авторов из подписок."""
+        self.client.force_login(self.user)
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(author=self.author, text="followed")
+        Post.objects.create(author=self.user, text="own")
+        resp = self.client.get(
+            reverse("posts_since"),
+            {"after": encode_cursor(self.seen), "feed": "follow", "count": 1}
+        )
+        self.assertEqual(resp.json()["count"], 1)
+        self.assertNotIn("posts", resp.json())
+
+    def test_bad_cursor(self):
+        resp = self.client.get(reverse("posts_since"), {"after": "1"})
+        self.assertEqual(resp.status_code, 400)
+
+
+class TestAsgi(TestCase):
+    def test_asgi_application(self):
+        """Проект обслуживает запросы через точку входа ASGI."""
+        from asgiref.sync import async_to_sync
+        from asgiref.testing import ApplicationCommunicator
+
+        from yatube.asgi import application
+
+        async def request():
+            communicator = ApplicationCommunicator(application, {
+                "type": "http",
+                "http_version": "1.1",
+                "method": "GET",
+                "path": "/",
+                "query_string": b"",
+                "headers": [(b"host", b"testserver")],
+            })
+            await communicator.send_input(
+                {"type": "http.request", "body": b""}
+            )
+            return await communicator.receive_output(timeout=5)
+
+        start = async_to_sync(request)()
+        self.assertEqual(start["type"], "http.response.start")
+        self.assertEqual(start["status"], 200)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    }
+)
+class TestLoaders(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="123")
+        self.author = User.objects.create_user(
+            username="author",
+            password="123"
+        )
+        Follow.objects.create(user=self.user, author=self.author)
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(author=self.author, text="post")
+        for i in range(3):
+            post = Post.objects.create(author=self.author, text=f"post {i}")
+            Comment.objects.create(post=post, author=self.user, text="text")
+            Comment.objects.create(post=self.post, author=self.user, text="t")
+
+    def test_post_view_queries(self):
+        """Страница записи загружается фиксированным числом запросов."""
+        url = reverse("post", args=[self.author.username, self.post.id])
+        # сессия, пользователь, запись, автор со счётчиками, два для
+        # комментариев и число непрочитанных уведомлений (кеш отключён)
+        with self.assertNumQueries(7):
+            resp = self.client.get(url)
+        author = resp.context["author"]
+        self.assertEqual(author.posts_count, 4)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.following_count, 0)
+        self.assertTrue(resp.context["following"])
+        self.assertEqual(resp.context["post"].comment_count, 3)
+
+    def test_profile_comment_counts(self):
+        """Число комментариев в ленте не требует запроса на каждую запись."""
+        url = reverse("profile", args=[self.author.username])
+        # сессия, пользователь, автор, число живых и архивных записей,
+        # страница и число непрочитанных уведомлений (кеш отключён)
+        with self.assertNumQueries(7):
+            resp = self.client.get(url)
+        self.assertContains(resp, "1 комментариев", count=3)
+        self.assertContains(resp, "3 комментариев", count=1)
+
+    def test_missing_author(self):
+        resp = self.client.get(reverse("profile", args=["nobody"]))
+        self.assertEqual(resp.status_code, 404)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    }
+)
+class TestArchive(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="123")
+        self.old = Post.objects.create(author=self.user, text="old post")
+        Comment.objects.create(post=self.old, author=self.user, text="old")
+        Post.objects.filter(pk=self.old.pk).update(
+            pub_date=timezone.now() - dt.timedelta(days=400)
+        )
+        self.new = Post.objects.create(author=self.user, text="new post")
+
+    def test_archive_command(self):
+        """Старые записи переносятся в архив и остаются доступны."""
+        call_command("archive_posts", days=365, stdout=io.StringIO())
+        self.assertFalse(Post.all_objects.filter(pk=self.old.pk).exists())
+        self.assertEqual(ArchivedPost.objects.get().id, self.old.id)
+        self.assertEqual(ArchivedComment.objects.get().post_id, self.old.id)
+
+        resp = self.client.get(reverse("profile", args=[self.user.username]))
+        self.assertEqual(
+            [post.text for post in resp.context["page"]],
+            ["new post", "old post"]
+        )
+        resp = self.client.get(
+            reverse("post", args=[self.user.username, self.old.id])
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "old post")
+        self.assertEqual(len(resp.context["items"]), 1)
+
+    def test_hidden_comment_archived_hidden(self):
+        """Скрытый комментарий переносится в архив и остаётся скрытым."""
+        Comment.objects.create(
+            post=self.old, author=self.user, text="hidden", is_hidden=True
+        )
+        call_command("archive_posts", days=365, stdout=io.StringIO())
+        self.assertTrue(ArchivedComment.objects.get(text="hidden").is_hidden)
+        resp = self.client.get(
+            reverse("post", args=[self.user.username, self.old.id])
+        )
+        self.assertNotContains(resp, "hidden")
+        self.assertEqual(resp.context["post"].comment_count, 1)
+
+    def test_hidden_post_archived_hidden(self):
+        """Скрытая старая запись уходит в архив и открывается модерацией."""
+        Post.all_objects.filter(pk=self.old.pk).update(is_hidden=True)
+        call_command("archive_posts", days=365, stdout=io.StringIO())
+        self.assertFalse(Post.all_objects.filter(pk=self.old.pk).exists())
+        self.assertTrue(ArchivedPost.all_objects.get(pk=self.old.pk).is_hidden)
+        url = reverse("profile", args=[self.user.username])
+        resp = self.client.get(url)
+        self.assertEqual(
+            [post.text for post in resp.context["page"]], ["new post"]
+        )
+        moderation.unhide([self.old.pk])
+        resp = self.client.get(url)
+        self.assertEqual(
+            [post.text for post in resp.context["page"]],
+            ["new post", "old post"]
+        )
+
+    def test_soft_delete(self):
+        """Помеченная удалённой запись пропадает из лент без каскада."""
+        comment = Comment.objects.create(
+            post=self.new, author=self.user, text="new"
+        )
+        self.new.soft_delete()
+        resp = self.client.get(reverse("index"))
+        self.assertNotIn(self.new, resp.context["page"])
+        self.assertTrue(Comment.objects.filter(pk=comment.pk).exists())
+        resp = self.client.get(reverse("profile", args=[self.user.username]))
+        self.assertNotIn(self.new, resp.context["page"])
+        resp = self.client.get(
+            reverse("post_edit", args=[self.user.username, self.new.id])
+        )
+        self.assertEqual(resp.status_code, 302)
+
+        out = io.StringIO()
+        call_command("dumpdata", "posts.post", stdout=out)
+        self.assertIn('"new post"', out.getvalue())
+
+        call_command(
+            "archive_posts",
+            days=365,
+            purge_deleted=True,
+            stdout=io.StringIO()
+        )
+        self.assertFalse(Post.all_objects.filter(pk=self.new.pk).exists())
+
+    def test_deleted_post_purged_from_archive(self):
+        """Удалённая старая запись архивируется и удаляется из архива."""
+        self.old.soft_delete()
+        call_command(
+            "archive_posts",
+            days=365,
+            purge_deleted=True,
+            stdout=io.StringIO()
+        )
+        self.assertFalse(ArchivedPost.all_objects.exists())
+        self.assertFalse(ArchivedComment.objects.exists())
+
+
+class TestBulkDelete(TestCase):
+    def setUp(self):
+        self.spammer = User.objects.create_user(username="spam", password="1")
+        self.user = User.objects.create_user(username="user", password="123")
+        Follow.objects.create(user=self.user, author=self.spammer)
+        Follow.objects.create(user=self.spammer, author=self.user)
+        self.own = Post.objects.create(author=self.user, text="own")
+        for i in range(5):
+            post = Post.objects.create(author=self.spammer, text=f"spam {i}")
+            Comment.objects.create(post=post, author=self.user, text="re")
+            Comment.objects.create(
+                post=self.own, author=self.spammer, text="x"
+            )
+
+    def test_delete_user(self):
+        """Пользователь удаляется с записями, комментариями и подписками."""
+        out = io.StringIO()
+        call_command("bulk_delete", user=["spam"], chunk_size=2, stdout=out)
+        self.assertFalse(User.objects.filter(username="spam").exists())
+        self.assertEqual(list(Post.all_objects.all()), [self.own])
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(Follow.objects.count(), 0)
+        self.assertIn("posts.Post: удалено 4", out.getvalue())
+
+    def test_delete_posts(self):
+        """Записи удаляются пакетно вместе с комментариями."""
+        post_ids = Post.objects.filter(author=self.spammer).values_list(
+            "id",
+            flat=True
+        )
+        call_command(
+            "bulk_delete",
+            post=list(post_ids),
+            chunk_size=2,
+            stdout=io.StringIO()
+        )
+        self.assertEqual(list(Post.all_objects.all()), [self.own])
+        self.assertEqual(Comment.objects.count(), 5)
+
+
+class TestAdminPerformance(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin",
+            email="admin@example.com",
+            password="123"
+        )
+        self.client.force_login(self.admin)
+        # первый запрос кладёт пользователя в кеш
+        self.client.get(reverse("index"))
+
+    def add_comments(self, number):
+        for i in range(number):
+            post = Post.objects.create(author=self.admin, text="текст " * 50)
+            Comment.objects.create(post=post, author=self.admin, text="re")
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries(self):
+        """Число запросов списка не зависит от количества строк."""
+        for name in ("posts_comment", "posts_post", "posts_follow"):
+            url = reverse(f"admin:{name}_changelist")
+            self.add_comments(1)
+            few = self.changelist_queries(url)
+            self.add_comments(5)
+            self.assertEqual(self.changelist_queries(url), few, msg=name)
+
+    def test_preview(self):
+        """В списке выводится укороченный текст записи."""
+        self.add_comments(1)
+        resp = self.client.get(reverse("admin:posts_comment_changelist"))
+        self.assertContains(resp, "…")
+        self.assertNotContains(resp, "текст " * 50)
+
+    def test_preview_exact_length(self):
+        """Текст длиной ровно в превью выводится без многоточия."""
+        Post.objects.create(author=self.admin, text="я" * PREVIEW_LENGTH)
+        resp = self.client.get(reverse("admin:posts_post_changelist"))
+        self.assertContains(resp, "я" * PREVIEW_LENGTH)
+        self.assertNotContains(resp, "…")
+
+    def test_search_limit_shown(self):
+        """Ограничение поиска по тексту показывается над списком."""
+        resp = self.client.get(
+            reverse("admin:posts_post_changelist"), {"q": "текст"}
+        )
+        self.assertContains(resp, "только за последние")
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=0)
+    def test_estimated_count(self):
+        """Для большой таблицы без фильтров берётся оценка из статистики."""
+        self.add_comments(3)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        resp = self.client.get(reverse("admin:posts_post_changelist"))
+        self.assertEqual(resp.context["cl"].result_count, 3)
+        self.assertTrue(estimated_count(Post.all_objects.all()))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    }
+)
+class TestModeration(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="123")
+        self.spammer = User.objects.create_user(username="spam", password="1")
+        self.post = Post.objects.create(author=self.user, text="post")
+        self.spam = Post.objects.create(author=self.spammer, text="spam")
+        self.comment = Comment.objects.create(
+            post=self.post,
+            author=self.spammer,
+            text="spam comment"
+        )
+        self.client.force_login(self.user)
+
+    def test_flag_and_hide(self):
+        """Жалоба попадает в очередь, скрытая запись пропадает из лент."""
+        flag_post = reverse(
+            "flag_post", args=[self.spammer.username, self.spam.id]
+        )
+        flag_comment = reverse(
+            "flag_comment",
+            args=[self.user.username, self.post.id, self.comment.id]
+        )
+        for url in (flag_post, flag_comment):
+            # переход по ссылке только показывает форму подтверждения
+            self.assertContains(self.client.get(url), "Отправить жалобу")
+        self.assertFalse(Flag.objects.exists())
+        self.client.post(flag_post)
+        self.client.post(flag_comment)
+        self.assertEqual(Flag.objects.filter(resolved=False).count(), 2)
+
+        moderation.hide(post_ids=[self.spam.id])
+        resp = self.client.get(reverse("index"))
+        self.assertNotIn(self.spam, resp.context["page"])
+        self.assertEqual(
+            Flag.objects.filter(resolved=False).get().comment,
+            self.comment
+        )
+
+    def test_delete_comment(self):
+        """Удалённый комментарий не возвращается снятием скрытия."""
+        Flag.objects.create(
+            reporter=self.user, post=self.post, comment=self.comment
+        )
+        moderation.delete(comment_ids=[self.comment.id])
+        moderation.unhide(comment_ids=[self.comment.id])
+        self.assertFalse(Comment.all_objects.exists())
+        self.assertFalse(Flag.objects.exists())
+
+    def test_ban(self):
+        """Блокировка скрывает всё содержимое автора одной операцией."""
+        moderation.ban(
+            User.objects.filter(username="spam").values_list("pk", flat=True)
+        )
+        self.spammer.refresh_from_db()
+        self.assertFalse(self.spammer.is_active)
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        resp = self.client.get(
+            reverse("post", args=[self.user.username, self.post.id])
+        )
+        self.assertNotContains(resp, "spam comment")
+        self.assertEqual(resp.context["post"].comment_count, 0)
+
+    def test_admin_queue_actions(self):
+        """Пакетные действия очереди модерации в админке."""
+        Flag.objects.create(reporter=self.user, post=self.spam)
+        Flag.objects.create(
+            reporter=self.user,
+            post=self.post,
+            comment=self.comment
+        )
+        admin_user = User.objects.create_superuser(
+            username="admin",
+            email="admin@example.com",
+            password="123"
+        )
+        self.client.force_login(admin_user)
+        url = reverse("admin:posts_flag_changelist")
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, {
+            "action": "ban_authors",
+            "_selected_action": Flag.objects.values_list("pk", flat=True),
+        })
+        self.assertFalse(User.objects.get(username="spam").is_active)
+        self.assertFalse(Flag.objects.filter(resolved=False).exists())
+        self.assertFalse(Comment.objects.exists())
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    }
+)
+class TestTrending(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="123")
+        self.quiet = Post.objects.create(author=self.user, text="quiet")
+        self.popular = Post.objects.create(author=self.user, text="popular")
+
+    def test_ranking(self):
+        """Записи с комментариями поднимаются в популярном."""
+        call_command("update_trending", stdout=io.StringIO())
+        for i in range(3):
+            Comment.objects.create(post=self.quiet, author=self.user, text="!")
+        call_command("update_trending", stdout=io.StringIO())
+        resp = self.client.get(reverse("trending"))
+        self.assertEqual(
+            list(resp.context["page"]), [self.quiet, self.popular]
+        )
+
+    def test_incremental(self):
+        """Повторный запуск без новых событий не меняет рейтинг."""
+        call_command("update_trending", stdout=io.StringIO())
+        scores = dict(PostScore.objects.values_list("post_id", "score"))
+        call_command("update_trending", stdout=io.StringIO())
+        self.assertEqual(
+            dict(PostScore.objects.values_list("post_id", "score")),
+            scores
+        )
+
+    def test_decay(self):
+        """Одинаковые события затухают одинаково: свежее весит больше."""
+        now = timezone.now()
+        self.assertAlmostEqual(
+            trending.event_score(1, now)
+            - trending.event_score(1, now - dt.timedelta(hours=24)),
+            1
+        )
+
+
+class TestNotifications(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="1")
+        self.reader = User.objects.create_user(username="reader", password="2")
+        self.post = Post.objects.create(author=self.author, text="text")
+        self.client.force_login(self.reader)
+
+    def test_comment_and_follow(self):
+        """Автор узнаёт о комментарии и новом подписчике."""
+        self.client.post(
+            reverse("add_comment", args=["author", self.post.id]),
+            {"text": "Комментарий"}
+        )
+        self.client.get(reverse("profile_follow", args=["author"]))
+        self.client.get(reverse("profile_follow", args=["author"]))
+        self.assertEqual(
+            list(Notification.objects.values_list("verb", flat=True)),
+            [Notification.FOLLOW, Notification.COMMENT],
+            msg="Повторная подписка не должна создавать уведомление"
+        )
+        self.assertEqual(unread_count(self.author.pk), 2)
+
+    def test_no_self_notifications(self):
+        """О собственных комментариях уведомления не приходят."""
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse("add_comment", args=["author", self.post.id]),
+            {"text": "Комментарий"}
+        )
+        self.assertFalse(Notification.objects.exists())
+
+    def test_inbox_marks_read(self):
+        """Просмотр уведомлений отмечает их прочитанными."""
+        self.client.get(reverse("profile_follow", args=["author"]))
+        self.client.force_login(self.author)
+        resp = self.client.get(reverse("index"))
+        self.assertEqual(resp.context["unread_notifications"], 1)
+        resp = self.client.get(reverse("notifications"))
+        self.assertContains(resp, "reader")
+        self.assertEqual(unread_count(self.author.pk), 0)
+        self.assertFalse(
+            Notification.objects.filter(is_read=False).exists()
+        )
+
+    def test_rolled_back_with_request(self):
+        """Уведомление откатывается вместе с действием."""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.reader, author=self.author)
+                notify(self.author.pk, self.reader.pk, Notification.FOLLOW)
+                raise RuntimeError
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(unread_count(self.author.pk), 0)
+
+    def test_badge_from_cache(self):
+        """Значок непрочитанных не обращается к базе, пока счётчик в кеше."""
+        self.client.get(reverse("profile_follow", args=["author"]))
+        unread_count(self.author.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_count(self.author.pk), 1)
+
+
+class TestAuthCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="user", password="123")
+        Post.objects.create(author=self.user, text="text")
+
+    def test_anonymous_without_session(self):
+        """Анонимный читатель ленты не вызывает запросов к сессиям."""
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse("index"))
+        self.assertFalse(resp.context["user"].is_authenticated)
+        self.assertFalse(
+            [q for q in queries if "django_session" in q["sql"]],
+            msg="Сессия анонимного пользователя не должна читаться"
+        )
+        self.assertNotIn("Cookie", resp.get("Vary", ""))
+
+    def test_user_cached(self):
+        """Пользователь и сессия берутся из кеша со второго запроса."""
+        self.client.force_login(self.user)
+        self.client.get(reverse("index"))
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse("index"))
+        self.assertEqual(resp.context["user"], self.user)
+        self.assertFalse(
+            [q for q in queries if '"auth_user"."password"' in q["sql"]
+             and "WHERE \"auth_user\".\"id\"" in q["sql"]],
+            msg="Пользователь должен браться из кеша"
+        )
+        self.assertFalse(
+            [q for q in queries if "django_session" in q["sql"]],
+            msg="Сессия должна браться из кеша"
+        )
+
+    def test_invalidation(self):
+        """Изменения пользователя и блокировка сбрасывают кеш."""
+        self.client.force_login(self.user)
+        self.client.get(reverse("index"))
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+        self.user.first_name = "Имя"
+        self.user.save()
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        self.client.get(reverse("index"))
+        moderation.ban([self.user.pk])
+        resp = self.client.get(reverse("index"))
+        self.assertFalse(resp.context["user"].is_authenticated)
+
+    def test_inactive_cached_user(self):
+        """Пользователь из кеша проверяется на is_active."""
+        self.client.force_login(self.user)
+        # в кеш попала копия после блокировки, но до сброса кеша
+        self.user.is_active = False
+        cache.set(user_cache_key(self.user.pk), self.user)
+        resp = self.client.get(reverse("index"))
+        self.assertFalse(resp.context["user"].is_authenticated)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=None)
+    def test_disabled(self):
+        """Без общего кеша пользователь читается из базы."""
+        self.client.force_login(self.user)
+        resp = self.client.get(reverse("index"))
+        self.assertTrue(resp.context["user"].is_authenticated)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+    def test_password_change_logs_out(self):
+        """Смена пароля завершает остальные сессии, несмотря на кеш."""
+        self.client.force_login(self.user)
+        self.client.get(reverse("index"))
+        self.user.set_password("new")
+        self.user.save()
+        resp = self.client.get(reverse("index"))
+        self.assertFalse(resp.context["user"].is_authenticated)
+
+
+class TestNotFound(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="user", password="123")
+        self.post = Post.objects.create(author=self.user, text="text")
+
+    def test_reserved_without_queries(self):
+        """Адреса сканеров отвечают 404 без запросов к базе."""
+        for path in ("/wp-admin/", "/xmlrpc.php/", "/config.php/1/"):
+            with self.assertNumQueries(0):
+                resp = self.client.get(path)
+            self.assertEqual(resp.status_code, 404, msg=path)
+            self.assertContains(resp, "Ошибка 404", status_code=404)
+
+    def test_missing_cached(self):
+        """Отсутствие автора и записи запоминается в кеше."""
+        missing_post = f"/user/{self.post.id + 100}/"
+        self.client.get("/nobody/")
+        self.client.get(missing_post)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/nobody/").status_code, 404)
+            resp = self.client.get(missing_post)
+        self.assertContains(resp, missing_post, status_code=404)
+
+    def test_created_after_miss(self):
+        """Созданные после промаха автор и запись сразу доступны."""
+        self.client.get("/newcomer/")
+        newcomer = User.objects.create_user(username="newcomer")
+        self.assertEqual(self.client.get("/newcomer/").status_code, 200)
+        next_id = self.post.id + 1
+        self.client.get(f"/newcomer/{next_id}/")
+        Post.objects.create(id=next_id, author=newcomer, text="new")
+        resp = self.client.get(f"/newcomer/{next_id}/")
+        self.assertEqual(resp.status_code, 200)
+
+    def test_unhidden_after_miss(self):
+        """Запись, показанная модератором, снова доступна."""
+        moderation.hide(post_ids=[self.post.id])
+        url = reverse("post", args=["user", self.post.id])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        moderation.unhide(post_ids=[self.post.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_save_without_author_query(self):
+        """Сброс запомненного отсутствия не читает автора записи."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = "edited"
+        with self.assertNumQueries(1):
+            post.save()
+
+    def test_rename_reserved_users(self):
+        """Занятые зарезервированные имена видны в check и меняет команда."""
+        admin = User.objects.create_user(username="Admin")
+        script = User.objects.create_user(username="shell.php")
+        warnings = run_checks(
+            include_deployment_checks=False, tags=["database"]
+        )
+        self.assertIn("Admin, shell.php", warnings[0].msg)
+
+        out = io.StringIO()
+        call_command("rename_reserved_users", dry_run=True, stdout=out)
+        self.assertIn(f"Admin -> Admin_{admin.pk}", out.getvalue())
+        self.assertTrue(User.objects.filter(username="Admin").exists())
+
+        out = io.StringIO()
+        call_command("rename_reserved_users", stdout=out)
+        self.assertIn(f"shell.php -> shell.php_{script.pk}", out.getvalue())
+        resp = self.client.get(reverse("profile", args=[f"Admin_{admin.pk}"]))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            run_checks(include_deployment_checks=False, tags=["database"]),
+            []
+        )
+
+    def test_signup_reserved(self):
+        """Зарезервированное имя нельзя занять при регистрации."""
+        resp = self.client.post(reverse("signup"), {
+            "username": "wp-admin",
+            "email": "a@example.com",
+            "password1": "Sup3r-secret",
+            "password2": "Sup3r-secret",
+        })
+        self.assertFormError(
+            resp,
+            "form",
+            "username",
+            "Это имя зарезервировано, выберите другое."
+        )
+
+
+class TestFeeds(TestCase):
+    def setUp(self):
+        cache.clear()
+        Site.objects.update_or_create(
+            id=2,
+            defaults={"domain": "testserver", "name": "testserver"}
+        )
+        self.user = User.objects.create_user(username="user", password="123")
+        self.group = Group.objects.create(
+            title="Группа",
+            slug="group",
+            description="Описание"
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            group=self.group,
+            text="Первая запись"
+        )
+
+    def test_feeds(self):
+        """Ленты RSS и Atom для главной, группы и автора."""
+        for name, args in (
+            ("index_rss", []),
+            ("index_atom", []),
+            ("group_rss", ["group"]),
+            ("group_atom", ["group"]),
+            ("author_rss", ["user"]),
+            ("author_atom", ["user"]),
+        ):
+            resp = self.client.get(reverse(name, args=args))
+            self.assertContains(resp, "Первая запись", msg_prefix=name)
+            self.assertIn("Last-Modified", resp, msg=name)
+
+    def test_feed_cached_until_new_post(self):
+        """Лента берётся из кеша, пока не появится новая запись."""
+        url = reverse("index_rss")
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        resp = self.client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=self.client.get(url)["Last-Modified"]
+        )
+        self.assertEqual(resp.status_code, 304)
+        Post.objects.create(author=self.user, text="Вторая запись")
+        self.assertContains(self.client.get(url), "Вторая запись")
+
+    def test_feed_changes_on_edit_and_hide(self):
+        """Правка и скрытие записи сбрасывают кеш ленты и 304."""
+        url = reverse("group_rss", args=["group"])
+        # Last-Modified с точностью до секунды: первая версия — минутой раньше
+        Post.objects.filter(pk=self.post.pk).update(
+            updated=timezone.now() - dt.timedelta(minutes=1)
+        )
+        modified = self.client.get(url)["Last-Modified"]
+        self.post.text = "Исправленная запись"
+        self.post.save()
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertContains(resp, "Исправленная запись")
+        etag = resp["ETag"]
+        moderation.hide(post_ids=[self.post.id])
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotContains(resp, "Исправленная запись")
+
+    @override_settings(SITEMAP_PAGE_SIZE=2)
+    def test_sitemap_chunks(self):
+        """Карта сайта делится на страницы по диапазонам ключей."""
+        for i in range(4):
+            Post.objects.create(author=self.user, text=f"post {i}")
+        last = Post.objects.order_by("-id").first()
+        resp = self.client.get(reverse("sitemap_index"))
+        pages = last.id // 2 + 1
+        self.assertContains(resp, "sitemap-posts.xml", count=pages)
+        resp = self.client.get(
+            reverse("sitemap", args=["posts"]),
+            {"p": pages}
+        )
+        self.assertContains(resp, f"/user/{last.id}/")
+        self.assertIn("Last-Modified", resp)
+        resp = self.client.get(reverse("sitemap", args=["posts"]), {"p": 99})
+        self.assertEqual(resp.status_code, 404)
+        resp = self.client.get(reverse("sitemap", args=["groups"]))
+        self.assertContains(resp, "/group/group/")
+        resp = self.client.get(reverse("sitemap", args=["authors"]))
+        self.assertContains(resp, "/user/")
+
+    def test_robots(self):
+        resp = self.client.get("/robots.txt")
+        self.assertContains(resp, "Sitemap: http://testserver/sitemap.xml")
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    },
+    FEED_BATCH_SIZE=10
+)
+class TestFeedMore(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="123")
+        self.group = Group.objects.create(
+            title="Группа",
+            slug="group",
+            description="Описание"
+        )
+        for i in range(25):
+            Post.objects.create(
+                author=self.user,
+                group=self.group,
+                text=f"post {i}"
+            )
+
+    def scroll(self, url):
+        """Все записи ленты: первая страница и порции по курсору."""
+        resp = self.client.get(url)
+        texts = [post.text for post in resp.context["page"]]
+        more = resp.context.get("next_cursor")
+        more_url = resp.context.get("more_url")
+        while more:
+            resp = self.client.get(more_url, {"after": more})
+            self.assertNotContains(resp, "<html")
+            texts += [post.text for post in resp.context["posts"]]
+            more = resp.context["next_cursor"]
+        return texts
+
+    def test_scroll_all_feeds(self):
+        """Прокрутка любой ленты выдаёт все записи без повторов."""
+        expected = [f"post {i}" for i in reversed(range(25))]
+        self.client.force_login(self.user)
+        Follow.objects.create(
+            user=User.objects.create_user(username="reader"),
+            author=self.user
+        )
+        for url in (
+            reverse("index"),
+            reverse("group_posts", args=["group"]),
+            reverse("profile", args=["user"]),
+        ):
+            self.assertEqual(self.scroll(url), expected, msg=url)
+        self.client.force_login(User.objects.get(username="reader"))
+        self.assertEqual(self.scroll(reverse("follow_index")), expected)
+
+    def test_profile_continues_into_archive(self):
+        """Лента автора продолжается архивными записями."""
+        old = Post.objects.order_by("pub_date")[:5]
+        Post.objects.filter(id__in=[post.id for post in old]).update(
+            pub_date=timezone.now() - dt.timedelta(days=400)
+        )
+        call_command("archive_posts", stdout=io.StringIO())
+        texts = self.scroll(reverse("profile", args=["user"]))
+        self.assertEqual(len(texts), 25)
+        self.assertEqual(ArchivedPost.objects.count(), 5)
+
+    def test_cursor_plan(self):
+        """Порция по курсору читается по индексу без сортировки остатка."""
+        first, second = Post.objects.all()[:2]
+        for post_list in (
+            after_cursor(Post.objects.all(), decode_cursor(
+                encode_cursor(first)
+            ))[:10],
+            between_cursors(
+                Post.objects.all(),
+                decode_cursor(encode_cursor(second)),
+                decode_cursor(encode_cursor(first))
+            ),
+        ):
+            plan = post_list.explain()
+            self.assertIn("USING INDEX", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+            self.assertNotIn("MULTI-INDEX OR", plan)
+        self.assertEqual(
+            list(after_cursor(Post.objects.all(), decode_cursor(
+                encode_cursor(first)
+            ))[:1]),
+            [second]
+        )
+
+    def test_bad_cursor(self):
+        for after in (
+            "x", "99999999999999999999999_1", "1_99999999999999999999"
+        ):
+            resp = self.client.get(reverse("index_more"), {"after": after})
+            self.assertEqual(resp.status_code, 400, msg=after)
+        resp = self.client.get(reverse("follow_more"), {"after": "1_1"})
+        self.assertEqual(resp.status_code, 403)
+
+
+class TestSettingsProfiles(TestCase):
+    def test_profile_module(self):
+        """Профиль из DJANGO_SETTINGS_MODULE не требует секретов боевого."""
+        env = {
+            key: value for key, value in os.environ.items()
+            if key not in ("SECRET_KEY", "YATUBE_ENV")
+        }
+        env["DJANGO_SETTINGS_MODULE"] = "yatube.settings.dev"
+        result = subprocess.run(
+            [
+                sys.executable, "-c",
+                "from django.conf import settings; print(settings.YATUBE_ENV)"
+            ],
+            cwd=settings.BASE_DIR,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        self.assertEqual(result.returncode, 0, msg=result.stderr)
+        self.assertEqual(result.stdout.strip(), "dev")
+
+
+class TestImportTime(TestCase):
+    def test_parse(self):
+        """Время импорта суммируется по пакетам верхнего уровня."""
+        packages = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |     django.utils\n"
+            "import time:        50 |        150 |   django\n"
+            "import time:        20 |         20 | posts.models\n"
+        )
+        self.assertEqual(packages["django"], [150, 2])
+        self.assertEqual(packages["posts"], [20, 1])
+
+    def test_feed_role(self):
+        """Воркер роли feed не импортирует админку и CKEditor."""
+        out = io.StringIO()
+        call_command("importtime", role=["full", "feed"], top=1000, stdout=out)
+        full, feed = out.getvalue().split("Роль feed")
+        self.assertIn("ckeditor", full)
+        self.assertNotIn("ckeditor", feed)
+        self.assertIn("пиковая память", feed)
+        # django.test с unittest нужен только выгрузке и прогреву кеша
+        self.assertNotIn("unittest", full)
+
+    def test_feed_role_footer(self):
+        """Без flatpages подвал ведёт на основной сайт или молчит о них."""
+        request = RequestFactory().get("/")
+        self.assertEqual(about_site(request), {"about_site": ""})
+        with modify_settings(
+            INSTALLED_APPS={"remove": "django.contrib.flatpages"}
+        ):
+            self.assertEqual(about_site(request), {"about_site": None})
+            footer = render_to_string("footer.html", about_site(request))
+            self.assertNotIn("/about-author/", footer)
+            with override_settings(MAIN_SITE_URL="https://yatube.example"):
+                footer = render_to_string("footer.html", about_site(request))
+            self.assertIn(
+                'href="https://yatube.example/about-author/"', footer
+            )
+
+
+class TestFeedPaginator(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="user", password="123")
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f"post {i}") for i in range(200)
+        )
+
+    def test_elided_range(self):
+        """Номера страниц выводятся окном вокруг текущей."""
+        paginator = FeedPaginator(range(1000), 10)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(50)),
+            [1, 2, "…", 47, 48, 49, 50, 51, 52, 53, "…", 99, 100]
+        )
+        self.assertEqual(
+            list(paginator.get_elided_page_range(2)),
+            [1, 2, 3, 4, 5, "…", 99, 100]
+        )
+        self.assertEqual(
+            list(FeedPaginator(range(50), 10).get_elided_page_range(3)),
+            [1, 2, 3, 4, 5]
+        )
+
+    def test_page_links_bounded(self):
+        """Число ссылок паджинатора не зависит от числа страниц."""
+        resp = self.client.get(reverse("index"), {"page": 10})
+        self.assertContains(resp, 'class="page-link" href="?page=', count=12)
+        self.assertContains(resp, "…", count=2)
+
+    def test_count_cached_until_write(self):
+        """COUNT(*) ленты выполняется один раз до изменения записей."""
+        url = reverse("profile", args=["user"])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse(
+            [q for q in queries if "COUNT(*)" in q["sql"]],
+            msg="Число записей должно браться из кеша"
+        )
+        Post.objects.create(author=self.user, text="new")
+        resp = self.client.get(url)
+        self.assertEqual(resp.context["paginator"].count, 201)
+        moderation.hide(post_ids=[Post.objects.first().id])
+        resp = self.client.get(url)
+        self.assertEqual(resp.context["paginator"].count, 200)
+
+
+class TestExportStatic(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username="user", password="123")
+        self.other = User.objects.create_user(username="other", password="123")
+        self.post = Post.objects.create(author=self.user, text="first post")
+        Post.objects.create(author=self.other, text="other post")
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def test_full_export(self):
+        """Публичные страницы выгружаются в <путь>/index.html."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f"post {i}") for i in range(10)
+        )
+        written = export(self.root)
+        self.assertEqual(written, 17)
+        with open(self.path("index.html"), encoding="utf-8") as f:
+            self.assertIn("post 9", f.read())
+        with open(self.path("page-2.html"), encoding="utf-8") as f:
+            self.assertIn("first post", f.read())
+        self.assertTrue(os.path.exists(self.path("user", "index.html")))
+        self.assertTrue(
+            os.path.exists(self.path("user", str(self.post.id), "index.html"))
+        )
+
+    def test_incremental(self):
+        """Повторно выгружаются только страницы, затронутые изменением."""
+        export(self.root)
+        os.remove(self.path("other", "index.html"))
+        Comment.objects.create(post=self.post, author=self.other, text="hi")
+        self.assertEqual(export(self.root), 3)
+        self.assertFalse(os.path.exists(self.path("other", "index.html")))
+        with open(
+            self.path("user", str(self.post.id), "index.html"),
+            encoding="utf-8"
+        ) as f:
+            self.assertIn("hi", f.read())
+
+    def test_hidden_post_removed(self):
+        """Скрытая запись пропадает из выгрузки при следующем запуске."""
+        export(self.root)
+        moderation.hide(post_ids=[self.post.id])
+        export(self.root)
+        self.assertFalse(
+            os.path.exists(self.path("user", str(self.post.id), "index.html"))
+        )
+        with open(self.path("index.html"), encoding="utf-8") as f:
+            self.assertNotIn("first post", f.read())
+
+    @override_settings(ALLOWED_HOSTS=["example.com"])
+    def test_allowed_hosts(self):
+        """Страницы отрисовываются для хоста из ALLOWED_HOSTS."""
+        self.assertEqual(export(self.root), 5)
+
+    def test_error_keeps_mirror(self):
+        """Ошибка страницы прерывает выгрузку, не трогая зеркало и метку."""
+        export(self.root)
+        with open(self.path(".export-watermark")) as f:
+            watermark = f.read()
+        Comment.objects.create(post=self.post, author=self.other, text="hi")
+        admission.state = admission.AdmissionState()
+        admission.state.in_flight["read"] = 48
+        try:
+            with self.assertRaises(ExportError):
+                export(self.root)
+        finally:
+            admission.state = admission.AdmissionState()
+        self.assertTrue(os.path.exists(self.path("index.html")))
+        with open(self.path(".export-watermark")) as f:
+            self.assertEqual(f.read(), watermark)
+
+
+class TestSlowQueryLog(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="123")
+        Post.objects.create(author=self.user, text="text")
+
+    def test_fingerprint(self):
+        """Отпечаток SQL не зависит от значений и длины списка IN."""
+        self.assertEqual(
+            fingerprint(
+                "SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'a'"
+            ),
+            fingerprint("SELECT  * FROM t WHERE id IN (%s) AND name = 'b''c'"),
+        )
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_EXPLAIN=True)
+    def test_log_with_plan(self):
+        """Медленный запрос пишется с представлением, шаблоном и планом."""
+        with self.assertLogs("yatube.slow_queries", "WARNING") as logs:
+            self.client.get(reverse("profile", args=["user"]))
+        records = list(read_log(logs.output))
+        self.assertTrue(records)
+        self.assertTrue(
+            all(r["view"] == "posts.views.profile" for r in records)
+        )
+        select = next(r for r in records if r["sql"].startswith("SELECT"))
+        self.assertTrue(select["plan"])
+
+    def test_template_position(self):
+        """Для запроса из шаблона записывается строка шаблона."""
+        template = Template("\n{% for post in posts %}{{ post }}{% endfor %}")
+        wrapper = SlowQueryLogger(connection, 0)
+        with self.assertLogs("yatube.slow_queries", "WARNING") as logs:
+            with connection.execute_wrapper(wrapper):
+                template.render(Context({"posts": Post.objects.all()}))
+        [record] = read_log(logs.output)
+        self.assertTrue(record["template"].endswith(":2"))
+
+    def test_report(self):
+        """Отчёт группирует запросы по отпечатку и сортирует по времени."""
+        record = {"view": "posts.views.index", "template": None, "plan": None}
+        lines = [
+            json.dumps(dict(record, fingerprint="SELECT a", ms=5)),
+            json.dumps(dict(record, fingerprint="SELECT b", ms=30)),
+            json.dumps(dict(record, fingerprint="SELECT a", ms=40)),
+        ]
+        log = os.path.join(tempfile.mkdtemp(), "slow.log")
+        with open(log, "w", encoding="utf-8") as f:
+            f.write("\n".join(f"2020-01-01 00:00:00 {line}" for line in lines))
+        out = io.StringIO()
+        call_command("slow_queries", log=log, stdout=out)
+        report = out.getvalue()
+        self.assertLess(report.index("SELECT a"), report.index("SELECT b"))
+        self.assertIn("2 × posts.views.index", report)
+
+
+class TestTracing(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="user", password="123")
+        self.post = Post.objects.create(author=self.user, text="text")
+        self.file = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+
+    def traces(self):
+        tracing.flush()
+        if not os.path.exists(self.file):
+            return []
+        with open(self.file, encoding="utf-8") as f:
+            return [
+                json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+                for line in f
+            ]
+
+    def test_spans(self):
+        """Трасса запроса содержит вложенные спаны SQL, кеша и шаблонов."""
+        with self.settings(TRACING_SAMPLE_RATE=1, TRACING_FILE=self.file):
+            self.client.get(reverse("post", args=["user", self.post.id]))
+        [spans] = self.traces()
+        by_id = {span["spanId"]: span for span in spans}
+        root = next(span for span in spans if not span["parentSpanId"])
+        self.assertEqual(root["name"], "GET posts.views.post_view")
+        view = next(
+            span for span in spans if span["name"] == "posts.views.post_view"
+        )
+        self.assertEqual(view["parentSpanId"], root["spanId"])
+        names = {span["name"] for span in spans}
+        self.assertTrue({"db.query", "cache.get", "template.render"} <= names)
+        for span in spans:
+            if span["parentSpanId"]:
+                self.assertIn(span["parentSpanId"], by_id)
+            self.assertEqual(span["traceId"], root["traceId"])
+
+    def test_traceparent(self):
+        """Решение доверенного сервиса из traceparent соблюдается."""
+        trace_id = "0af7651916cd43dd8448eb211c80319c"
+        with self.settings(
+            TRACING_SAMPLE_RATE=0,
+            TRACING_TRUSTED_CALLERS=["127.0.0.1"],
+            TRACING_FILE=self.file
+        ):
+            self.client.get(
+                reverse("index"),
+                HTTP_TRACEPARENT=f"00-{trace_id}-b7ad6b7169203331-00"
+            )
+            self.assertEqual(self.traces(), [])
+            self.client.get(
+                reverse("index"),
+                HTTP_TRACEPARENT=f"00-{trace_id}-b7ad6b7169203331-01"
+            )
+        [spans] = self.traces()
+        root = next(span for span in spans if span["kind"] == tracing.SERVER)
+        self.assertEqual(root["traceId"], trace_id)
+        self.assertEqual(root["parentSpanId"], "b7ad6b7169203331")
+
+    def test_untrusted_traceparent(self):
+        """Клиент не может включить трассировку своим заголовком."""
+        with self.settings(
+            TRACING_SAMPLE_RATE=0,
+            TRACING_TRUSTED_CALLERS=["10.0.0.1"],
+            TRACING_FILE=self.file
+        ):
+            self.client.get(
+                reverse("index"),
+                HTTP_TRACEPARENT="00-0af7651916cd43dd8448eb211c80319c"
+                "-b7ad6b7169203331-01"
+            )
+        self.assertEqual(self.traces(), [])
+
+    def test_export_queue_bounded(self):
+        """При заполненной очереди трассы отбрасываются и считаются."""
+        pending, tracing._export_queue = tracing._export_queue, queue.Queue(1)
+        dropped = tracing.dropped
+        try:
+            self.assertTrue(tracing.export([]))
+            self.assertFalse(tracing.export([]))
+        finally:
+            tracing._export_queue = pending
+        self.assertEqual(tracing.dropped, dropped + 1)
+        self.assertIn(
+            f"yatube_tracing_dropped_total {dropped + 1}", tracing.metrics()
+        )
+
+
+class TestFingerprints(TestCase):
+    TEXT = "Купите лучшие часы со скидкой прямо сейчас по ссылке в профиле"
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="user", password="123")
+        self.other = User.objects.create_user(username="other", password="123")
+        self.client.force_login(self.user)
+
+    def test_simhash_distance(self):
+        """Мелкая правка текста меняет SimHash на несколько бит."""
+        base = fingerprints.words(self.TEXT * 3)
+        edited = fingerprints.words((self.TEXT * 3).replace("часы", "часы!!"))
+        changed = fingerprints.words("Совсем другой текст о погоде и о море")
+        self.assertEqual(
+            fingerprints.text_hash(base), fingerprints.text_hash(edited)
+        )
+        near = fingerprints.simhash(base + ["сегодня"])
+        self.assertLessEqual(
+            fingerprints.distance(fingerprints.simhash(base), near), 5
+        )
+        self.assertGreater(
+            fingerprints.distance(
+                fingerprints.simhash(base), fingerprints.simhash(changed)
+            ),
+            5
+        )
+
+    def test_bands(self):
+        """Части simhash покрывают все 64 бита."""
+        parts = fingerprints.bands((1 << 64) - 1)
+        self.assertEqual(len(parts), fingerprints.BANDS)
+        self.assertEqual(sum(part.bit_length() for part in parts), 64)
+
+    def test_own_duplicate_rejected(self):
+        """Повтор своей записи не сохраняется."""
+        self.client.post(reverse("new_post"), {"text": self.TEXT})
+        resp = self.client.post(reverse("new_post"), {"text": self.TEXT + "!"})
+        self.assertFormError(
+            resp, "form", "text", "Вы уже публиковали такой текст."
+        )
+        self.assertEqual(
+            [str(message) for message in resp.context["messages"]],
+            ["Вы уже публиковали такой текст."]
+        )
+        self.assertEqual(Post.all_objects.count(), 1)
+
+    def test_new_post_atomic(self):
+        """Сбой записи отпечатка не оставляет запись без отпечатка."""
+        def fail(verdict, post=None, comment=None):
+            raise RuntimeError
+        record, fingerprints.record = fingerprints.record, fail
+        try:
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse("new_post"), {"text": self.TEXT})
+        finally:
+            fingerprints.record = record
+        self.assertFalse(Post.all_objects.exists())
+
+    def test_foreign_duplicate_queued(self):
+        """Повтор чужого текста скрыт и ждёт модератора."""
+        post = Post.objects.create(author=self.other, text="post")
+        self.client.post(
+            reverse("add_comment", args=["other", post.id]),
+            {"text": self.TEXT}
+        )
+        self.client.force_login(self.other)
+        resp = self.client.post(
+            reverse("new_post"), {"text": self.TEXT.upper()}, follow=True
+        )
+        self.assertContains(resp, "появится после проверки")
+        queued = Post.all_objects.get(is_hidden=True)
+        self.assertEqual(queued.author, self.other)
+        flag = Flag.objects.get(post=queued)
+        self.assertIn("комментария", flag.reason)
+
+        admin_user = User.objects.create_superuser(
+            username="admin",
+            email="admin@example.com",
+            password="123"
+        )
+        self.client.force_login(admin_user)
+        self.client.post(reverse("admin:posts_flag_changelist"), {
+            "action": "dismiss",
+            "_selected_action": [flag.pk],
+        })
+        # отклонённая жалоба очереди повторов возвращает запись в ленты
+        self.assertTrue(Post.objects.filter(pk=queued.pk).exists())
+        self.assertTrue(Flag.objects.get(pk=flag.pk).resolved)
+
+    def test_short_texts(self):
+        """Короткие тексты разных авторов не считаются повторами."""
+        post = Post.objects.create(author=self.other, text="post")
+        url = reverse("add_comment", args=["other", post.id])
+        self.client.post(url, {"text": "Спасибо!"})
+        self.client.force_login(self.other)
+        self.client.post(url, {"text": "Спасибо!"})
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_own_short_texts(self):
+        """Своё «Спасибо!» у другой записи проходит, у той же — в очередь."""
+        first = Post.objects.create(author=self.other, text="first")
+        second = Post.objects.create(author=self.other, text="second")
+        for post in (first, second, second):
+            self.client.post(
+                reverse("add_comment", args=["other", post.id]),
+                {"text": "Спасибо!"}
+            )
+        self.assertEqual(Comment.all_objects.count(), 3)
+        hidden = Comment.all_objects.get(is_hidden=True)
+        self.assertEqual(hidden.post, second)
+        self.assertIsNone(Flag.objects.get(comment=hidden).reporter)
+
+    def test_comment_in_other_thread_queued(self):
+        """Свой длинный комментарий под другой записью уходит модератору."""
+        first = Post.objects.create(author=self.other, text="first")
+        second = Post.objects.create(author=self.other, text="second")
+        for post in (first, second):
+            self.client.post(
+                reverse("add_comment", args=["other", post.id]),
+                {"text": self.TEXT}
+            )
+        self.assertTrue(Comment.all_objects.get(post=second).is_hidden)
+
+    def test_deleted_post_reposted(self):
+        """Удалённую запись можно опубликовать заново."""
+        self.client.post(reverse("new_post"), {"text": self.TEXT})
+        moderation.delete(post_ids=[Post.objects.get().pk])
+        self.client.post(reverse("new_post"), {"text": self.TEXT})
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_edit_fingerprinted(self):
+        """Правка записи проверяется и обновляет её отпечаток."""
+        self.client.post(reverse("new_post"), {"text": self.TEXT})
+        post = Post.objects.create(author=self.user, text="Старый текст")
+        url = reverse("post_edit", args=["user", post.id])
+        resp = self.client.post(url, {"text": self.TEXT})
+        self.assertFormError(
+            resp, "form", "text", "Вы уже публиковали такой текст."
+        )
+        text = "Совсем другой текст о погоде и о море у самого берега"
+        self.client.post(url, {"text": text})
+        self.assertEqual(
+            Fingerprint.objects.get(post=post).text_hash,
+            fingerprints.text_hash(fingerprints.words(text))
+        )
+        self.client.force_login(self.other)
+        self.client.post(reverse("new_post"), {"text": text})
+        self.assertTrue(Post.all_objects.get(author=self.other).is_hidden)
+
+    def test_lookup_is_one_query(self):
+        """Поиск повтора — один запрос по индексам."""
+        text = " ".join([self.TEXT] * 3)
+        verdict = fingerprints.check(text, self.user)
+        fingerprints.record(verdict, post=Post.objects.create(
+            author=self.user, text=text
+        ))
+        with self.assertNumQueries(1):
+            verdict = fingerprints.check(text + " сегодня", self.other)
+        self.assertEqual(verdict.action, fingerprints.QUEUE)
+
+
+class TestFollowLists(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="author", password="123"
+        )
+        self.viewer = User.objects.create_user(
+            username="viewer", password="123"
+        )
+        self.fans = [
+            User.objects.create_user(username=f"fan{i}", password="123")
+            for i in range(35)
+        ]
+        for fan in self.fans:
+            Follow.objects.create(user=fan, author=self.author)
+        for fan in self.fans[:3]:
+            Follow.objects.create(user=self.viewer, author=fan)
+
+    def test_keyset_pages(self):
+        """Подписчики листаются по курсору, новые первыми."""
+        first = follow_page("followers", self.author.id, self.viewer)
+        self.assertEqual(len(first.users), 30)
+        self.assertEqual(first.users[0], self.fans[-1])
+        second = follow_page(
+            "followers", self.author.id, self.viewer, first.next_cursor
+        )
+        self.assertEqual(second.users, self.fans[4::-1])
+        self.assertIsNone(second.next_cursor)
+        self.assertEqual(
+            [user.username for user in second.users if user.is_followed],
+            ["fan2", "fan1", "fan0"]
+        )
+
+    def test_query_count(self):
+        """Страница списка — три запроса при любом числе пользователей."""
+        with self.assertNumQueries(3):
+            follow_page("followers", self.author.id, self.viewer)
+        with self.assertNumQueries(3):
+            follow_page("following", self.viewer.id, self.viewer)
+
+    def test_pages_and_api(self):
+        """Страница и API списка подписок."""
+        self.client.force_login(self.viewer)
+        resp = self.client.get(reverse("following", args=["viewer"]))
+        self.assertContains(resp, "@fan2")
+        self.assertContains(resp, "Вы подписаны", count=3)
+        resp = self.client.get(reverse("followers_api", args=["author"]))
+        data = resp.json()
+        self.assertEqual(len(data["users"]), 30)
+        resp = self.client.get(
+            reverse("followers_api", args=["author"]), {"after": data["next"]}
+        )
+        self.assertEqual(len(resp.json()["users"]), 5)
+        self.assertIsNone(resp.json()["next"])
+        resp = self.client.get(reverse("followers_api", args=["nobody"]))
+        self.assertEqual(resp.status_code, 404)
+
+    def test_bad_cursor(self):
+        """Курсор вне диапазона BIGINT — 400, а не ошибка базы."""
+        for name in ("followers", "followers_api"):
+            for after in ("x", "-1", "99999999999999999999999"):
+                resp = self.client.get(
+                    reverse(name, args=["author"]), {"after": after}
+                )
+                self.assertEqual(resp.status_code, 400, msg=(name, after))
+
+
+class TestCacheWarmup(TestCase):
+    def setUp(self):
+        cache.clear()
+        Site.objects.update_or_create(
+            id=2, defaults={"domain": "testserver", "name": "testserver"}
+        )
+        self.user = User.objects.create_user(username="user", password="123")
+        self.group = Group.objects.create(title="group", slug="group")
+        Post.objects.create(author=self.user, text="text", group=self.group)
+
+    def test_warm(self):
+        """Прогрев отрисовывает горячие страницы и заполняет кеш."""
+        out = io.StringIO()
+        call_command("warm_cache", stdout=out)
+        self.assertIn("с ошибкой: 0", out.getvalue())
+        self.assertIn("/group/group/", out.getvalue())
+        self.assertIn("/user/", out.getvalue())
+        self.assertIsNotNone(
+            cache.get(make_template_fragment_key("index_page", [1]))
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(FeedPaginator([], 10, count_key="index").count, 1)
+
+    @override_settings(ALLOWED_HOSTS=["example.com"])
+    def test_warm_allowed_hosts(self):
+        """Прогрев проходит проверку ALLOWED_HOSTS боевого профиля."""
+        results = warm()
+        self.assertTrue(results)
+        self.assertEqual({status for _, status, _ in results}, {200})
+
+    def test_single_flight(self):
+        """При одновременных промахах значение строится один раз."""
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def build():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        def worker():
+            barrier.wait()
+            return get_or_build("single-flight-test", build, 60)
+
+        with ThreadPoolExecutor(8) as pool:
+            results = [pool.submit(worker) for _ in range(8)]
+            self.assertEqual({r.result() for r in results}, {"value"})
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(ADMISSION_TRUSTED_PROXIES=["127.0.0.1"])
+class TestAdmission(TestCase):
+    def setUp(self):
+        cache.clear()
+        admission.state = admission.AdmissionState()
+        self.user = User.objects.create_user(username="user", password="123")
+        self.author = User.objects.create_user(
+            username="author", password="123"
+        )
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text="text")
+        Comment.objects.create(post=post, author=self.user, text="comment")
+        self.client.force_login(self.user)
+
+    def test_queue_ms(self):
+        """Время в очереди по X-Request-Start в секундах и миллисекундах."""
+        factory = RequestFactory()
+        now = time.time()
+        for value in (f"t={now - 0.3:.3f}", str(int((now - 0.3) * 1000))):
+            request = factory.get("/", HTTP_X_REQUEST_START=value)
+            self.assertAlmostEqual(
+                admission.queue_ms(request, now), 300, delta=1
+            )
+        self.assertIsNone(admission.queue_ms(factory.get("/")))
+        request = factory.get(
+            "/",
+            HTTP_X_REQUEST_START=f"t={now - 5:.3f}",
+            REMOTE_ADDR="10.0.0.9"
+        )
+        self.assertIsNone(admission.queue_ms(request, now))
+
+    def test_shed(self):
+        """Сверх порога тяжёлые запросы отклоняются, записи — нет."""
+        admission.state.in_flight["heavy"] = 8
+        resp = self.client.get(reverse("follow_index"))
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp["Retry-After"], "5")
+        resp = self.client.get(reverse("index"))
+        self.assertEqual(resp.status_code, 200)
+        resp = self.client.post(
+            reverse("profile_follow", args=["author"])
+        )
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(admission.state.in_flight["read"], 0)
+        self.assertEqual(admission.state.in_flight["write"], 0)
+
+    def test_degrade(self):
+        """Долгое ожидание в очереди — лента без числа комментариев."""
+        url = reverse("profile", args=["author"])
+        resp = self.client.get(url)
+        self.assertContains(resp, "1 комментариев")
+        resp = self.client.get(
+            url, HTTP_X_REQUEST_START=f"t={time.time() - 1.5:.3f}"
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotContains(resp, "комментариев")
+        resp = self.client.get(
+            url, HTTP_X_REQUEST_START=f"t={time.time() - 3:.3f}"
+        )
+        self.assertEqual(resp.status_code, 503)
+
+    def test_degraded_fragment_not_cached(self):
+        """Упрощённая главная не попадает в общий кеш фрагментов."""
+        self.client.logout()
+        url = reverse("index")
+        resp = self.client.get(
+            url, HTTP_X_REQUEST_START=f"t={time.time() - 1.5:.3f}"
+        )
+        self.assertNotContains(resp, "комментариев")
+        resp = self.client.get(url)
+        self.assertContains(resp, "1 комментариев")
+
+    def test_stale_follow_feed(self):
+        """При перегрузке лента подписок отдаётся из сохранённой копии."""
+        resp = self.client.get(reverse("follow_index"))
+        self.assertContains(resp, "text")
+        Post.objects.create(author=self.author, text="fresh")
+        admission.state.in_flight["heavy"] = 2
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("follow_index"), {"page": "01"})
+        self.assertContains(resp, "text")
+        self.assertNotContains(resp, "fresh")
+        self.assertEqual(resp.context["page"].number, 1)
+
+    def test_rename_metrics_user(self):
+        """Существующий пользователь metrics переименовывается миграцией."""
+        user = User.objects.create_user(username="Metrics", password="123")
+        renamed = rename_reserved_users(User, ["metrics"])
+        self.assertEqual(renamed, {"Metrics": f"Metrics_{user.pk}"})
+        resp = self.client.get(reverse("profile", args=[f"Metrics_{user.pk}"]))
+        self.assertEqual(resp.status_code, 200)
+
+    def test_metrics(self):
+        """Счётчики в формате Prometheus доступны только сотрудникам."""
+        self.client.get(reverse("index"))
+        resp = self.client.get(reverse("metrics"))
+        self.assertEqual(resp.status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        resp = self.client.get(reverse("metrics"))
+        self.assertContains(
+            resp,
+            'yatube_admission_requests_total{class="read",decision="admit"} 3'
+        )
+        self.assertContains(
+            resp, 'yatube_admission_in_flight{class="heavy"} 0'
+        )
+
+
+@override_settings(POST_SHARDS=["default", "shard1"])
+class TestSharding(TestCase):
+    databases = {"default", "shard1"}
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(
+            username="reader", password="123"
+        )
+        self.group = Group.objects.create(title="group", slug="group")
+        users = [
+            User.objects.create_user(username=f"author{i}", password="123")
+            for i in range(2)
+        ]
+        self.authors = {
+            shard_for_author(user.pk): user for user in users
+        }
+        self.posts = []
+        for i in range(6):
+            author = self.authors["default" if i % 2 else "shard1"]
+            post = Post(author=author, group=self.group, text=f"post {i}")
+            post.save()
+            self.posts.append(post)
+
+    def test_routing(self):
+        """Запись — в базе автора, комментарий — в базе записи, id общие."""
+        shard_post = self.posts[0]
+        self.assertEqual(shard_post._state.db, "shard1")
+        self.assertTrue(Post.objects.using("shard1").filter(
+            pk=shard_post.pk
+        ).exists())
+        self.assertFalse(Post.objects.filter(pk=shard_post.pk).exists())
+        comment = Comment(post=shard_post, author=self.reader, text="text")
+        comment.save()
+        self.assertEqual(comment._state.db, "shard1")
+        self.assertEqual(list(shard_post.comments.all()), [comment])
+        self.assertEqual(shard_post.author, self.authors["shard1"])
+        ids = [post.pk for post in self.posts]
+        self.assertEqual(len(set(ids)), 6)
+        self.assertEqual(ids, sorted(ids))
+
+    def test_scatter_gather(self):
+        """Главная и группа собираются из всех баз по дате публикации."""
+        expected = [f"post {i}" for i in reversed(range(6))]
+        for url in (reverse("index"), reverse("group_posts", args=["group"])):
+            resp = self.client.get(url)
+            self.assertEqual(resp.context["paginator"].count, 6)
+            self.assertEqual(
+                [post.text for post in resp.context["page"]], expected
+            )
+        feed = sharding.feed_list(Post.objects.all())
+        self.assertEqual([post.text for post in feed[2:4]], expected[2:4])
+        resp = self.client.get(
+            reverse("index_more"),
+            {"after": encode_cursor(self.posts[3])}
+        )
+        self.assertEqual(
+            [post.text for post in resp.context["posts"]], expected[3:]
+        )
+
+    def test_author_pages(self):
+        """Профиль, страница записи и комментарий идут в базу автора."""
+        author = self.authors["shard1"]
+        post = self.posts[0]
+        resp = self.client.get(reverse("profile", args=[author.username]))
+        self.assertEqual(resp.context["author"].posts_count, 3)
+        self.assertEqual(len(resp.context["page"]), 3)
+        self.client.force_login(self.reader)
+        self.client.post(
+            reverse("add_comment", args=[author.username, post.pk]),
+            {"text": "Комментарий к записи в другой базе"}
+        )
+        self.assertEqual(Comment.objects.using("shard1").count(), 1)
+        resp = self.client.get(
+            reverse("post", args=[author.username, post.pk])
+        )
+        self.assertContains(resp, "Комментарий к записи в другой базе")
+        self.assertEqual(resp.context["post"].comment_count, 1)
+        resp = self.client.get(reverse("post", args=["reader", post.pk]))
+        self.assertEqual(resp.status_code, 404)
+        self.client.force_login(author)
+        self.client.post(reverse("new_post"), {"text": "Новая запись"})
+        new = Post.objects.using("shard1").get(text="Новая запись")
+        self.assertTrue(Fingerprint.objects.filter(post_id=new.pk).exists())
+
+    def test_archive(self):
+        """Старые записи архивируются из всех баз."""
+        Post.all_objects.using("shard1").update(
+            pub_date=timezone.now() - dt.timedelta(days=400)
+        )
+        call_command("archive_posts", days=365, stdout=io.StringIO())
+        self.assertFalse(Post.all_objects.using("shard1").exists())
+        self.assertEqual(ArchivedPost.objects.count(), 3)
+        self.assertEqual(sharding.count_all(Post.objects.all()), 3)
+
+    def test_follow_and_since(self):
+        """Лента подписок и опрос новых записей видят все базы."""
+        shard_author = self.authors["shard1"]
+        Follow.objects.create(user=self.reader, author=shard_author)
+        self.client.force_login(self.reader)
+        resp = self.client.get(reverse("follow_index"))
+        self.assertEqual(resp.context["paginator"].count, 3)
+        self.assertEqual(
+            [post.text for post in resp.context["page"]],
+            ["post 4", "post 2", "post 0"]
+        )
+        first = self.posts[0]
+        for params, count in (({}, 5), ({"feed": "follow"}, 2)):
+            resp = self.client.get(reverse("posts_since"), {
+                "after": encode_cursor(first), "count": 1, **params
+            })
+            self.assertEqual(resp.json()["count"], count)
+        resp = self.client.get(
+            reverse("posts_since"), {"after": encode_cursor(first)}
+        )
+        self.assertEqual(resp.json()["latest"], encode_cursor(self.posts[-1]))
+        self.assertEqual(resp.json()["posts"][-1]["text"], "post 1")
+
+    def test_flag_and_hide(self):
+        """Жалобы и модерация доходят до записей в другой базе."""
+        author = self.authors["shard1"]
+        post = self.posts[0]
+        comment = Comment(post=post, author=author, text="spam")
+        comment.save()
+        self.client.force_login(self.reader)
+        self.client.post(reverse("flag_post", args=[author.username, post.pk]))
+        self.client.post(reverse(
+            "flag_comment", args=[author.username, post.pk, comment.pk]
+        ))
+        self.assertEqual(Flag.objects.filter(resolved=False).count(), 2)
+
+        moderation.hide(post_ids=[post.pk], comment_ids=[comment.pk])
+        self.assertTrue(Post.all_objects.using("shard1").get(
+            pk=post.pk
+        ).is_hidden)
+        self.assertFalse(Comment.objects.using("shard1").exists())
+        self.assertFalse(Flag.objects.filter(resolved=False).exists())
+        resp = self.client.get(reverse("index"))
+        self.assertNotIn(post, resp.context["page"])
+
+        moderation.unhide(post_ids=[post.pk])
+        moderation.ban([author.pk])
+        self.assertFalse(Post.objects.using("shard1").exists())
+
+    def test_admin_lists(self):
+        """Список записей в админке читает базу, выбранную фильтром."""
+        admin_user = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="123"
+        )
+        self.client.force_login(admin_user)
+        url = reverse("admin:posts_post_changelist")
+        resp = self.client.get(url, {"shard": "shard1"})
+        self.assertEqual(resp.context["cl"].result_count, 3)
+        self.assertContains(resp, self.authors["shard1"].username)
+        self.client.post(url + "?shard=shard1", {
+            "action": "hide",
+            "_selected_action": [self.posts[0].pk],
+        })
+        self.assertTrue(Post.all_objects.using("shard1").get(
+            pk=self.posts[0].pk
+        ).is_hidden)
+
+    def test_notifications_and_export(self):
+        """Уведомления и выгрузка видят записи из другой базы."""
+        author = self.authors["shard1"]
+        post = self.posts[0]
+        self.client.force_login(self.reader)
+        self.client.post(
+            reverse("add_comment", args=[author.username, post.pk]),
+            {"text": "Комментарий к записи в другой базе"}
+        )
+        self.client.force_login(author)
+        resp = self.client.get(reverse("notifications"))
+        self.assertContains(
+            resp, reverse("post", args=[author.username, post.pk])
+        )
+
+        root = tempfile.mkdtemp()
+        export(root, full=True)
+        path = os.path.join(root, author.username, str(post.pk), "index.html")
+        with open(path, encoding="utf-8") as f:
+            self.assertIn("Комментарий к записи в другой базе", f.read())
+        with open(os.path.join(root, "index.html"), encoding="utf-8") as f:
+            self.assertIn("post 0", f.read())
+
+    def test_delete_users(self):
+        """Пакетное удаление пользователя удаляет его записи во всех базах."""
+        shard_author = self.authors["shard1"]
+        post = self.posts[0]
+        Comment(post=post, author=self.reader, text="c").save()
+        Flag.objects.create(reporter=self.reader, post=post)
+        Comment(
+            post=self.posts[1], author=shard_author, text="c"
+        ).save()
+        delete_users(User.objects.filter(pk=shard_author.pk))
+        self.assertFalse(Post.all_objects.using("shard1").exists())
+        self.assertFalse(Comment.all_objects.using("shard1").exists())
+        self.assertFalse(Comment.all_objects.exists())
+        self.assertFalse(Flag.objects.exists())
+        self.assertEqual(Post.all_objects.count(), 3)
+
+    def test_reshard(self):
+        """Команда reshard переносит записи с комментариями на место."""
+        with override_settings(POST_SHARDS=["default"]):
+            old = Post(author=self.authors["shard1"], text="old")
+            old.save()
+            Comment.objects.create(post=old, author=self.reader, text="c")
+            Flag.objects.create(reporter=self.reader, post=old)
+        pub_date = old.pub_date
+        out = io.StringIO()
+        call_command("reshard", "--dry-run", stdout=out)
+        self.assertIn("Переедет из default в shard1: 1", out.getvalue())
+        self.assertTrue(Post.objects.filter(pk=old.pk).exists())
+        call_command("reshard", stdout=io.StringIO())
+        moved = Post.objects.using("shard1").get(pk=old.pk)
+        self.assertEqual(moved.pub_date, pub_date)
+        self.assertEqual(moved.comments.count(), 1)
+        self.assertFalse(Post.all_objects.filter(pk=old.pk).exists())
+        self.assertFalse(Comment.all_objects.filter(post_id=old.pk).exists())
+        self.assertEqual(Flag.objects.filter(post_id=old.pk).count(), 1)
+        out = io.StringIO()
+        call_command("reshard", stdout=out)
+        self.assertIn("Всего записей: 0", out.getvalue())
@@ -0,0 +1,116 @@
+"""
+Рейтинг популярных записей с затуханием по времени.
+
+Вес события w в момент t даёт вклад w * 2 ** ((t - EPOCH) / H), где H —
+период полураспада. В PostScore.score хранится логарифм суммы вкладов,
+поэтому новое событие добавляется без пересчёта старых, а сравнивать
+рейтинги разных записей можно в любой момент: у всех одинаковое
+затухание. Команда update_trending учитывает только события после
+предыдущего запуска.
+"""
+import datetime as dt
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from yatube.singleflight import get_or_build
+
+from .loaders import count_subquery
+from .models import Comment, Follow, Post, PostScore
+
+EPOCH = dt.datetime(2020, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def event_score(weight, when):
+    """Логарифм вклада события с весом weight в момент when."""
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    return math.log2(weight) + (when - EPOCH).total_seconds() / half_life
+
+
+def add_scores(a, b):
+    """log2(2 ** a + 2 ** b) без переполнения."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def post_weight(followers):
+    """Публикация автора с большим числом подписчиков весит больше."""
+    return 1 + math.log1p(followers)
+
+
+def update_scores(now=None):
+    """
+    Учитывает события после предыдущего запуска.
+
+    Возвращает количество записей с изменившимся рейтингом.
+    """
+    now = now or timezone.now()
+    window_start = now - dt.timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    watermark = PostScore.objects.aggregate(Max("updated"))["updated__max"]
+    since = max(watermark, window_start) if watermark else window_start
+
+    scores = {}
+    new_posts = Post.objects.filter(
+        pub_date__gt=since,
+        pub_date__lte=now
+    ).annotate(
+        followers=count_subquery(Follow.objects, "author", "author_id")
+    ).values_list("id", "pub_date", "followers")
+    for post_id, pub_date, followers in new_posts:
+        scores[post_id] = add_scores(
+            scores.get(post_id),
+            event_score(post_weight(followers), pub_date)
+        )
+    new_comments = Comment.objects.filter(
+        created__gt=since,
+        created__lte=now,
+        post__pub_date__gte=window_start
+    ).values_list("post_id", "created")
+    for post_id, created in new_comments:
+        scores[post_id] = add_scores(
+            scores.get(post_id), event_score(1, created)
+        )
+
+    with transaction.atomic():
+        existing = PostScore.objects.in_bulk(list(scores))
+        created = []
+        for post_id, score in scores.items():
+            if post_id in existing:
+                row = existing[post_id]
+                row.score = add_scores(row.score, score)
+                row.updated = now
+            else:
+                created.append(
+                    PostScore(post_id=post_id, score=score, updated=now)
+                )
+        PostScore.objects.bulk_update(
+            existing.values(),
+            ["score", "updated"],
+            batch_size=500
+        )
+        PostScore.objects.bulk_create(created, batch_size=500)
+        # записи старше окна больше не попадают в популярное
+        PostScore.objects.filter(post__pub_date__lt=window_start).delete()
+    cache.delete("trending:ids")
+    return len(scores)
+
+
+def trending_ids():
+    """Идентификаторы популярных записей по убыванию рейтинга."""
+    return get_or_build(
+        "trending:ids",
+        lambda: list(PostScore.objects.filter(
+            post__is_deleted=False,
+            post__is_hidden=False
+        ).order_by("-score").values_list(
+            "post_id",
+            flat=True
+        )[:settings.TRENDING_SIZE]),
+        settings.TRENDING_CACHE_TIMEOUT
+    )
@@ -1,12 +1,72 @@
 from django.urls import path
 from django.views.decorators.cache import cache_page
 
-from . import views
+from . import feeds, views
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("new/", views.new_post, name="new_post"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("since/", views.posts_since, name="posts_since"),
+    path("popular/", views.trending, name="trending"),
+    path("notifications/", views.notifications, name="notifications"),
+    path("more/", views.feed_more, {"feed": "index"}, name="index_more"),
+    path(
+        "follow/more/",
+        views.feed_more,
+        {"feed": "follow"},
+        name="follow_more"
+    ),
+    path(
+        "group/<slug:slug>/more/",
+        views.feed_more,
+        {"feed": "group"},
+        name="group_more"
+    ),
+    path(
+        "<str:username>/more/",
+        views.feed_more,
+        {"feed": "profile"},
+        name="profile_more"
+    ),
+    path("feed/rss/", feeds.index_rss, name="index_rss"),
+    path("feed/atom/", feeds.index_atom, name="index_atom"),
+    path("group/<slug:slug>/feed/rss/", feeds.group_rss, name="group_rss"),
+    path("group/<slug:slug>/feed/atom/", feeds.group_atom, name="group_atom"),
+    path(
+        "<str:username>/feed/rss/",
+        feeds.author_rss,
+        name="author_rss"
+    ),
+    path(
+        "<str:username>/feed/atom/",
+        feeds.author_atom,
+        name="author_atom"
+    ),
+    path(
+        "api/<str:username>/followers/",
+        views.follow_list_api,
+        {"direction": "followers"},
+        name="followers_api"
+    ),
+    path(
+        "api/<str:username>/following/",
+        views.follow_list_api,
+        {"direction": "following"},
+        name="following_api"
+    ),
+    path(
+        "<str:username>/followers/",
+        views.follow_list,
+        {"direction": "followers"},
+        name="followers"
+    ),
+    path(
+        "<str:username>/following/",
+        views.follow_list,
+        {"direction": "following"},
+        name="following"
+    ),
     path("<str:username>/", views.profile, name="profile"),
     path("<str:username>/<int:post_id>/", views.post_view, name="post"),
     path(
@@ -19,6 +79,16 @@ urlpatterns = [
         views.add_comment, 
         name="add_comment"
     ),
+    path(
+        "<str:username>/<int:post_id>/flag/",
+        views.flag_post,
+        name="flag_post"
+    ),
+    path(
+        "<str:username>/<int:post_id>/comment/<int:comment_id>/flag/",
+        views.flag_comment,
+        name="flag_comment"
+    ),
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
     path(
         "<str:username>/follow/", 
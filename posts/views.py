@@ -1,24 +1,52 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.db import transaction
+from django.http import (HttpResponseBadRequest, HttpResponseForbidden,
+                         JsonResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 
+from . import fingerprints, sharding
+from .archive import ChainedList, archived_feed
+from .cursors import (MAX_ID, after_cursor, between_cursors, decode_cursor,
+                      encode_cursor, encode_cursor_values)
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .graph import follow_page
+from yatube.admission import degraded
 
+from .loaders import (FeedList, get_loaders, light_feed_data, load_page,
+                      run_parallel, with_author_and_group, with_feed_data)
+from .models import (ArchivedPost, Comment, Flag, Follow, Group,
+                     Notification, Post, User)
+from .notfound import (author_missing, not_found, post_key, post_missing,
+                       remember_missing, user_key)
+from .notifications import mark_read, notify
+from .paginators import FeedPage, FeedPaginator
+from .routers import shard_of, sharding_enabled
+from .trending import trending_ids
 
-def check_follows(user, author):
-    """"Подписан ли user на author"""
-    try:
-        Follow.objects.get(user=user, author=author)
-        return True
-    except:
-        return False
+# Записей и комментариев на странице
+PAGE_SIZE = 10
+
+REJECTED = "Вы уже публиковали такой текст."
+QUEUED = "Запись похожа на уже опубликованные и появится после проверки."
+
+
+def feed_data(request):
+    """Подготовка записей ленты: при перегрузке — без числа комментариев."""
+    return light_feed_data if degraded(request) else with_feed_data
 
 
 def index(request):
     """Вывод 10 записей на главную страницу"""
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
+    post_list = sharding.feed_list(Post.objects.all(), feed_data(request))
+    paginator = FeedPaginator(post_list, PAGE_SIZE, count_key="index")
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
     return render(
@@ -31,8 +59,13 @@ def index(request):
 def group_posts(request, slug):
     """Возвращение страницы сообщества и вывод новых записей"""
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
+    post_list = sharding.feed_list(
+        Post.objects.filter(group=group),
+        feed_data(request)
+    )
+    paginator = FeedPaginator(
+        post_list, PAGE_SIZE, count_key=f"group:{group.id}"
+    )
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
     return render(
@@ -42,62 +75,144 @@ def group_posts(request, slug):
     )
 
 
+def trending(request):
+    """Популярные записи: чтение готового рейтинга из PostScore."""
+    ids = trending_ids()
+    posts = feed_data(request)(Post.objects.filter(pk__in=ids)).in_bulk(ids)
+    post_list = [posts[post_id] for post_id in ids if post_id in posts]
+    paginator = FeedPaginator(post_list, PAGE_SIZE)
+    page_number = request.GET.get('page')
+    page = paginator.get_page(page_number)
+    return render(
+        request,
+        "trending.html",
+        {"page": page, "paginator": paginator, "trending": True}
+    )
+
+
+def save_post(request, post, verdict):
+    """
+    Сохраняет запись вместе с отпечатком и жалобой на повтор: в основной
+    базе и в базе записи — одной транзакцией.
+    """
+    post.is_hidden = verdict.action == fingerprints.QUEUE
+    with transaction.atomic(), transaction.atomic(using=shard_of(post)):
+        post.save()
+        fingerprints.record(verdict, post=post)
+    if post.is_hidden:
+        messages.warning(request, QUEUED)
+
+
 @login_required
 def new_post(request):
     """Создание новой записи"""
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
-        return redirect('index')
+        verdict = fingerprints.check(form.cleaned_data["text"], request.user)
+        if verdict.action == fingerprints.REJECT:
+            form.add_error("text", REJECTED)
+            messages.error(request, REJECTED)
+        else:
+            post = form.save(commit=False)
+            post.author = request.user
+            save_post(request, post, verdict)
+            return redirect('index')
 
     return render(request, 'new.html', {'form': form, "is_edit": False})
 
 
 def profile(request, username):
     """Возвращение  информации об авторе и его постов"""
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.all()
-    paginator = Paginator(post_list, 10)
+    if author_missing(username):
+        return not_found(request)
+    author = get_loaders(request).authors.load(username)
+    if author is None:
+        remember_missing(user_key(username))
+        return not_found(request)
+    post_list = ChainedList(
+        FeedList(sharding.author_posts(author.id), feed_data(request)),
+        FeedList(
+            ArchivedPost.objects.filter(author_id=author.id),
+            archived_feed
+        ),
+    )
+    paginator = FeedPaginator(
+        post_list, PAGE_SIZE, count_key=f"author:{author.id}"
+    )
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
     return render(
         request,
         "profile.html",
-        {"author": user, 
+        {"author": author, 
          "page": page, 
          "paginator": paginator, 
-         "following": check_follows(request.user, user)
+         "following": getattr(author, "is_followed", False)
         }
     )
 
 
 def post_view(request, username, post_id):
     """Возвращение отдельного поста и комментариев"""
+    if post_missing(username, post_id):
+        return not_found(request)
     form = CommentForm()
-    user = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, id=post_id, author=user)
-    comments_list = post.comments.all()
-    paginator = Paginator(comments_list, 10)
+    loaders = get_loaders(request)
+    if sharding_enabled():
+        # в базе записей нет пользователей: сначала автор, затем его база
+        author = loaders.authors.load(username)
+        post_list = with_feed_data(
+            sharding.author_posts(author.pk if author else None)
+        )
+        comments_list = Comment.objects.using(post_list.db).filter(
+            post_id=post_id
+        ).prefetch_related("author")
+    else:
+        post_list = with_feed_data(
+            Post.objects.filter(author__username=username)
+        )
+        comments_list = Comment.objects.filter(
+            post_id=post_id
+        ).select_related("author")
+    paginator = FeedPaginator(comments_list, PAGE_SIZE)
     page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post, author, page = run_parallel(
+        lambda: post_list.filter(id=post_id).first(),
+        lambda: loaders.authors.load(username),
+        lambda: load_page(paginator, page_number),
+    )
+    if post is None:
+        # старые записи могли быть перенесены в архив
+        if author is None:
+            remember_missing(user_key(username))
+            return not_found(request)
+        post = archived_feed(
+            ArchivedPost.objects.filter(author_id=author.id)
+        ).filter(id=post_id).first()
+        if post is None:
+            remember_missing(post_key(post_id), username)
+            return not_found(request)
+        comments_list = post.comments.filter(
+            is_hidden=False
+        ).prefetch_related("author")
+        paginator = FeedPaginator(comments_list, PAGE_SIZE)
+        page = load_page(paginator, page_number)
     return render(
         request, 
         "post.html", 
-        {"author": post.author, 
+        {"author": author, 
          "comment_context": comments_list,
          "post": post, 
          "items": page, 
          "form": form,
-         "following": check_follows(request.user, user)
+         "following": getattr(author, "is_followed", False)
         } 
     )
 
 
 @login_required
 def post_edit(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = sharding.get_post(username, post_id)
 
     if request.user != post.author:
         return redirect('post', username=username, post_id=post_id)
@@ -108,8 +223,17 @@ def post_edit(request, username, post_id):
         instance=post
     )        
     if request.POST and form.is_valid():
-        form.save()
-        return redirect('post', username=username, post_id=post_id)
+        verdict = fingerprints.check(
+            form.cleaned_data["text"],
+            request.user,
+            edited=post
+        )
+        if verdict.action == fingerprints.REJECT:
+            form.add_error("text", REJECTED)
+            messages.error(request, REJECTED)
+        else:
+            save_post(request, form.save(commit=False), verdict)
+            return redirect('post', username=username, post_id=post_id)
                 
     return render(
         request,
@@ -125,12 +249,26 @@ def add_comment(request, username, post_id):
     if request.POST and form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
-        comment.post = get_object_or_404(
-            Post, 
-            pk=post_id, 
-            author__username=username
+        comment.post = sharding.get_post(username, post_id)
+        verdict = fingerprints.check(
+            comment.text,
+            request.user,
+            thread=comment.post
         )
-        comment.save()
+        if verdict.action == fingerprints.REJECT:
+            return redirect('post', username=username, post_id=post_id)
+        comment.is_hidden = verdict.action == fingerprints.QUEUE
+        with transaction.atomic():
+            comment.save()
+            fingerprints.record(verdict, comment=comment)
+            if not comment.is_hidden:
+                notify(
+                    comment.post.author_id,
+                    request.user.pk,
+                    Notification.COMMENT,
+                    post_id=post_id,
+                    comment_id=comment.pk
+                )
     
     return redirect('post', username=username, post_id=post_id)
 
@@ -150,13 +288,57 @@ def server_error(request):
     return render(request, "misc/500.html", status=500)
 
 
+def requested_page(value):
+    """Номер страницы из ?page=; всё, что не число больше нуля, — 1."""
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
 @login_required
 def follow_index(request):
-    """Посты авторов, на которых подписан текущий пользователь."""
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    """
+    Посты авторов, на которых подписан текущий пользователь.
+
+    Записи страницы и число записей ленты время от времени сохраняются:
+    при перегрузке страница собирается из них, а не из базы. Сохраняются
+    данные, а не HTML: токен CSRF и значок уведомлений всегда свежие.
+    """
+    number = requested_page(request.GET.get('page'))
+    stale_key = f"follow:stale:{request.user.pk}:{number}"
+    if degraded(request):
+        stale = cache.get(stale_key)
+        if stale is not None:
+            object_list, count = stale
+            paginator = FeedPaginator(object_list, PAGE_SIZE)
+            paginator.count = count
+            return render(
+                request,
+                "follow.html",
+                {"page": FeedPage(object_list, number, paginator),
+                 "follow": True,
+                 "paginator": paginator}
+            )
+    post_list = sharding.feed_list(
+        sharding.followed_posts(request.user),
+        feed_data(request)
+    )
+    paginator = FeedPaginator(
+        post_list,
+        PAGE_SIZE,
+        count_key=f"follow:{request.user.pk}"
+    )
+    page = paginator.get_page(number)
+    # копия обновляется не чаще раза в ADMISSION_STALE_REFRESH секунд
+    if not degraded(request) and page.number == number and cache.add(
+        f"{stale_key}:fresh", True, settings.ADMISSION_STALE_REFRESH
+    ):
+        cache.set(
+            stale_key,
+            (list(page.object_list), paginator.count),
+            settings.ADMISSION_STALE_TIMEOUT
+        )
     return render(
         request, 
         "follow.html", 
@@ -164,12 +346,39 @@ def follow_index(request):
     )
 
 
+@login_required
+def notifications(request):
+    """Уведомления пользователя; показанные отмечаются прочитанными."""
+    notification_list = request.user.notifications.select_related("actor")
+    if not sharding_enabled():
+        notification_list = notification_list.select_related("post__author")
+    paginator = FeedPaginator(notification_list, 20)
+    page = load_page(paginator, request.GET.get('page'))
+    if sharding_enabled():
+        sharding.attach_posts(page.object_list)
+    mark_read(
+        request.user.pk,
+        [item.pk for item in page.object_list if not item.is_read]
+    )
+    return render(
+        request,
+        "notifications.html",
+        {"page": page, "paginator": paginator}
+    )
+
+
 @login_required
 def profile_follow(request, username):
     """Подписка на интересного автора."""
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            _, created = Follow.objects.get_or_create(
+                user=request.user,
+                author=author
+            )
+            if created:
+                notify(author.pk, request.user.pk, Notification.FOLLOW)
     return redirect(request.META.get('HTTP_REFERER') or "index")
 
 
@@ -183,3 +392,282 @@ def profile_unfollow(request, username):
     )
     follow.delete()
     return redirect(request.META.get('HTTP_REFERER') or "index")
+
+
+def parse_after(request):
+    """
+    Курсор списка подписок; при неверном формате или id вне диапазона
+    BIGINT — ValueError.
+    """
+    after = request.GET.get("after")
+    if not after:
+        return None
+    after = int(after)
+    if not 0 < after <= MAX_ID:
+        raise ValueError(f"курсор вне диапазона: {after}")
+    return after
+
+
+def follow_list(request, username, direction):
+    """Подписчики или подписки автора, страницами по курсору."""
+    if author_missing(username):
+        return not_found(request)
+    author = get_loaders(request).authors.load(username)
+    if author is None:
+        remember_missing(user_key(username))
+        return not_found(request)
+    try:
+        after = parse_after(request)
+    except ValueError:
+        return HttpResponseBadRequest()
+    page = follow_page(direction, author.id, request.user, after)
+    return render(
+        request,
+        "follow_list.html",
+        {"author": author,
+         "direction": direction,
+         "users": page.users,
+         "next_cursor": page.next_cursor,
+         "following": getattr(author, "is_followed", False)
+        }
+    )
+
+
+def user_as_dict(user):
+    return {
+        "username": user.username,
+        "full_name": user.get_full_name(),
+        "is_followed": user.is_followed,
+        "url": reverse("profile", args=[user.username]),
+    }
+
+
+def follow_list_api(request, username, direction):
+    """Подписчики или подписки автора в JSON; next — курсор страницы."""
+    author_id = User.objects.filter(username=username).values_list(
+        "id",
+        flat=True
+    ).first()
+    if author_id is None:
+        return JsonResponse({"error": "not found"}, status=404)
+    try:
+        after = parse_after(request)
+    except ValueError:
+        return HttpResponseBadRequest()
+    page = follow_page(direction, author_id, request.user, after)
+    return JsonResponse({
+        "users": [user_as_dict(user) for user in page.users],
+        "next": page.next_cursor,
+    })
+
+
+@login_required
+def flag_post(request, username, post_id):
+    """
+    Жалоба на запись. GET показывает форму подтверждения: по ссылке
+    переходят и предзагрузчики, и роботы, жалобу подаёт только POST.
+    """
+    post = sharding.get_post(username, post_id)
+    if request.method != "POST":
+        return render(request, "flag.html", {"post": post})
+    Flag.objects.get_or_create(
+        reporter=request.user,
+        post=post,
+        comment=None,
+        resolved=False
+    )
+    return redirect('post', username=username, post_id=post_id)
+
+
+@login_required
+def flag_comment(request, username, post_id, comment_id):
+    """Жалоба на комментарий; как и flag_post, подаётся только POST."""
+    post = sharding.get_post(username, post_id)
+    # комментарий лежит в базе своей записи
+    comment = get_object_or_404(
+        Comment.objects.using(post._state.db),
+        pk=comment_id,
+        post=post
+    )
+    if request.method != "POST":
+        return render(
+            request,
+            "flag.html",
+            {"post": post, "comment": comment}
+        )
+    Flag.objects.get_or_create(
+        reporter=request.user,
+        post_id=post_id,
+        comment=comment,
+        resolved=False
+    )
+    return redirect('post', username=username, post_id=post_id)
+
+
+def latest_cursor():
+    """
+    (pub_date, id) самой свежей записи во всех базах или None
+    (кешируется на несколько секунд).
+    """
+    latest = cache.get("posts:latest")
+    if latest is None:
+        latest = sharding.newest(Post.objects.all()) or ()
+        cache.set("posts:latest", latest, settings.POLL_CACHE_TIMEOUT)
+    return tuple(latest) or None
+
+
+def post_as_dict(post):
+    return {
+        "id": post.id,
+        "author": post.author.username,
+        "group": post.group.slug if post.group else None,
+        "text": post.text,
+        "pub_date": post.pub_date.isoformat(),
+        "url": reverse("post", args=[post.author.username, post.id]),
+    }
+
+
+_poll_waiters = 0
+_poll_waiters_lock = threading.Lock()
+
+
+@contextmanager
+def poll_slot():
+    """Место для long-poll: True, если ждущих меньше POLL_MAX_WAITERS."""
+    global _poll_waiters
+    with _poll_waiters_lock:
+        acquired = _poll_waiters < settings.POLL_MAX_WAITERS
+        if acquired:
+            _poll_waiters += 1
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with _poll_waiters_lock:
+                _poll_waiters -= 1
+
+
+def posts_since(request):
+    """
+    Записи новее последней увиденной клиентом.
+
+    Параметры: after — курсор последней записи на странице клиента
+    (posts/cursors.py: id записей из разных баз не растут со временем),
+    feed=follow — только подписки, count=1 — вернуть лишь количество,
+    wait — секунды ожидания новых записей (long-poll).
+    """
+    try:
+        after = decode_cursor(request.GET.get("after", ""))
+        wait = min(int(request.GET.get("wait", 0)), settings.POLL_MAX_WAIT)
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    follow = request.GET.get("feed") == "follow"
+    if follow and not request.user.is_authenticated:
+        return JsonResponse({"error": "login required"}, status=403)
+    count_only = request.GET.get("count") == "1"
+
+    latest = latest_cursor()
+    # ожидание держит поток воркера: ждут только вошедшие пользователи
+    # и не больше POLL_MAX_WAITERS запросов на процесс, остальные
+    # получают ответ сразу и повторяют опрос
+    if wait and (latest is None or latest <= after) and (
+        request.user.is_authenticated
+    ):
+        with poll_slot() as acquired:
+            deadline = time.monotonic() + wait
+            while acquired and (latest is None or latest <= after) and (
+                time.monotonic() < deadline
+            ):
+                time.sleep(settings.POLL_INTERVAL)
+                latest = latest_cursor()
+    if latest is None or latest <= after:
+        data = {"count": 0, "latest": encode_cursor_values(*after)}
+        if not count_only:
+            data["posts"] = []
+        return JsonResponse(data)
+
+    key = "posts_since:%s:%s:%s:%s" % (
+        request.user.pk if follow else "all",
+        count_only,
+        encode_cursor_values(*after),
+        encode_cursor_values(*latest)
+    )
+    data = cache.get(key)
+    if data is None:
+        if follow:
+            post_list = sharding.followed_posts(request.user)
+        else:
+            post_list = Post.objects.all()
+        post_list = sharding.feed_list(
+            between_cursors(post_list, after, latest),
+            with_author_and_group
+        )
+        data = {"count": post_list.count(), "latest": encode_cursor_values(
+            *latest
+        )}
+        if not count_only:
+            data["posts"] = [
+                post_as_dict(post)
+                for post in post_list[:settings.POLL_MAX_POSTS]
+            ]
+        cache.set(key, data, settings.POLL_CACHE_TIMEOUT)
+    return JsonResponse(data)
+
+
+def feed_more(request, feed, slug=None, username=None):
+    """
+    Следующая порция карточек ленты после курсора after — фрагмент HTML
+    для бесконечной прокрутки, без base.html, меню и карточки автора.
+    """
+    try:
+        cursor = decode_cursor(request.GET.get("after", ""))
+    except ValueError:
+        return HttpResponseBadRequest()
+    if feed == "follow":
+        if not request.user.is_authenticated:
+            return HttpResponseForbidden()
+        sources = [(
+            sharding.followed_posts(request.user),
+            sharding.gather(feed_data(request))
+        )]
+    elif feed == "group":
+        group = get_object_or_404(Group, slug=slug)
+        sources = [(
+            Post.objects.filter(group=group),
+            sharding.gather(feed_data(request))
+        )]
+    elif feed == "profile":
+        author_id = User.objects.filter(username=username).values_list(
+            "id",
+            flat=True
+        ).first()
+        if author_id is None:
+            return not_found(request)
+        # архивные записи старше живых и продолжают ленту автора
+        sources = [
+            (sharding.author_posts(author_id), feed_data(request)),
+            (ArchivedPost.objects.filter(author_id=author_id), archived_feed),
+        ]
+    else:
+        sources = [(Post.objects.all(), sharding.gather(feed_data(request)))]
+
+    size = settings.FEED_BATCH_SIZE
+    posts = []
+    for post_list, prepare in sources:
+        # на одну запись больше, чтобы узнать, есть ли следующая порция
+        posts += prepare(after_cursor(post_list, cursor))[
+            :size + 1 - len(posts)
+        ]
+        if len(posts) > size:
+            break
+    next_cursor = encode_cursor(posts[size - 1]) if len(posts) > size else ""
+    return render(
+        request,
+        "includes/feed_batch.html",
+        {
+            "posts": posts[:size],
+            "next_cursor": next_cursor,
+            "more_url": request.path,
+        }
+    )
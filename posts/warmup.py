@@ -0,0 +1,87 @@
+"""
+Прогрев кешей горячими страницами.
+
+После выкладки или очистки кеша первые запросы одновременно идут в базу
+и в Pillow. Команда warm_cache заранее отрисовывает первые страницы
+главной, ленты самых больших групп и профили авторов с наибольшим числом
+подписчиков. Заодно заполняются счётчики паджинатора, кеш фрагментов
+и хранилище миниатюр sorl: шаблоны карточек строят их при отрисовке.
+
+LocMemCache у каждого процесса свой, поэтому команда прогревает общий
+кеш (memcached, файловый) и хранилище миниатюр. Кеш самих воркеров
+прогревает фоновый прогрев после сброса кешей лент
+(CACHE_WARM_AFTER_INVALIDATION).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.http import QueryDict
+from django.urls import reverse
+
+from yatube import selfrequest
+
+from .models import Group, User
+
+SCHEDULED_KEY = "warmup:scheduled"
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+
+
+def hot_urls():
+    """Адреса для прогрева, самые посещаемые первыми."""
+    index = reverse("index")
+    urls = [index] + [
+        f"{index}?page={number}"
+        for number in range(2, settings.CACHE_WARM_INDEX_PAGES + 1)
+    ]
+    groups = Group.objects.annotate(size=Count("posts")).order_by(
+        "-size"
+    ).values_list("slug", flat=True)[:settings.CACHE_WARM_GROUPS]
+    urls += [reverse("group_posts", args=[slug]) for slug in groups]
+    authors = User.objects.annotate(followers=Count("following")).order_by(
+        "-followers"
+    ).values_list("username", flat=True)[:settings.CACHE_WARM_PROFILES]
+    urls += [reverse("profile", args=[username]) for username in authors]
+    urls += [
+        reverse("trending"), reverse("index_rss"), reverse("sitemap_index")
+    ]
+    return urls
+
+
+def warm(urls=None):
+    """
+    Отрисовывает страницы от имени анонимного посетителя.
+
+    Возвращает список (адрес, код ответа, миллисекунды).
+    """
+    results = []
+    for url in hot_urls() if urls is None else urls:
+        start = time.monotonic()
+        path, _, query = url.partition("?")
+        response = selfrequest.get(path, QueryDict(query))
+        results.append(
+            (url, response.status_code, (time.monotonic() - start) * 1000)
+        )
+    return results
+
+
+def _warm_in_thread():
+    # серия сбросов подряд успевает собраться в один прогрев
+    time.sleep(settings.CACHE_WARM_DELAY)
+    close_old_connections()
+    try:
+        warm()
+    finally:
+        close_old_connections()
+
+
+def schedule_warmup():
+    """Фоновый прогрев после сброса кешей лент, если он включён."""
+    if not settings.CACHE_WARM_AFTER_INVALIDATION:
+        return
+    if cache.add(SCHEDULED_KEY, 1, settings.CACHE_WARM_DELAY):
+        transaction.on_commit(lambda: _executor.submit(_warm_in_thread))
@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save
+
+        from . import checks  # noqa: F401
+        from .auth import forget_user
+
+        User = get_user_model()
+        post_save.connect(forget_user, sender=User)
+        post_delete.connect(forget_user, sender=User)
@@ -0,0 +1,70 @@
+"""
+Пользователь текущего запроса с кешированием между запросами.
+
+Стандартный AuthenticationMiddleware на каждый запрос читает пользователя
+из базы. Здесь пользователь хранится в кеше по id и сбрасывается при
+сохранении или удалении; хеш сессии и право входа (is_active)
+проверяются и для пользователя из кеша, так же, как в
+django.contrib.auth.get_user, поэтому смена пароля и блокировка
+по-прежнему разлогинивают остальные сессии.
+
+Сброс должен дойти до всех воркеров, поэтому кеш включается
+(AUTH_USER_CACHE_TIMEOUT) только в профилях с общим кешем.
+"""
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user_model, load_backend)
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+
+def user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def forget_users(user_ids):
+    """Сбрасывает кеш пользователей, изменённых в обход save()."""
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+def forget_user(sender, instance, **kwargs):
+    forget_users([instance.pk])
+
+
+def load_user(request):
+    session = request.session
+    try:
+        user_id = get_user_model()._meta.pk.to_python(session[SESSION_KEY])
+        backend_path = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    backend = load_backend(backend_path)
+    timeout = settings.AUTH_USER_CACHE_TIMEOUT
+    key = user_cache_key(user_id)
+    user = cache.get(key) if timeout else None
+    if user is None:
+        user = backend.get_user(user_id)
+        if user is None:
+            return AnonymousUser()
+        if timeout:
+            cache.set(key, user, timeout)
+    can_authenticate = getattr(backend, "user_can_authenticate", None)
+    if can_authenticate is not None and not can_authenticate(user):
+        return AnonymousUser()
+    session_hash = session.get(HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(
+        session_hash,
+        user.get_session_auth_hash()
+    )):
+        session.flush()
+        return AnonymousUser()
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = load_user(request)
+    return request._cached_user
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.checks import Tags, Warning, register
+
+from .validators import (RESERVED_SUFFIXES, RESERVED_USERNAMES,
+                         reserved_users)
+
+
+@register(Tags.database)
+def reserved_usernames_check(app_configs, **kwargs):
+    """
+    Пользователи, чьи имена зарезервированы после регистрации: их профили
+    отвечают 404. Проверка обращается к базе, поэтому запускается только
+    как manage.py check --database default.
+    """
+    usernames = list(reserved_users(
+        get_user_model(), RESERVED_USERNAMES, RESERVED_SUFFIXES
+    ).values_list("username", flat=True)[:20])
+    if not usernames:
+        return []
+    return [Warning(
+        "Профили пользователей с зарезервированными именами недоступны: "
+        + ", ".join(usernames),
+        hint=(
+            "Переименуйте их командой rename_reserved_users "
+            "(сначала с --dry-run) и сообщите владельцам новые имена."
+        ),
+        id="users.W001",
+    )]
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from users.validators import (RESERVED_SUFFIXES, RESERVED_USERNAMES,
+                              rename_reserved_users)
+
+
+class Command(BaseCommand):
+    help = (
+        "Переименовывает пользователей с зарезервированными именами: "
+        "их профили отвечают 404"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать, кто как будет переименован",
+        )
+
+    def handle(self, *args, **options):
+        renamed = rename_reserved_users(
+            get_user_model(),
+            sorted(RESERVED_USERNAMES),
+            RESERVED_SUFFIXES,
+            options["dry_run"]
+        )
+        verb = "Будет переименован" if options["dry_run"] else "Переименован"
+        for old, new in renamed.items():
+            self.stdout.write(f"{verb} {old} -> {new}")
+        self.stdout.write(f"Всего пользователей: {len(renamed)}")
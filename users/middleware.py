@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.utils.functional import SimpleLazyObject
+
+from .auth import get_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    AuthenticationMiddleware с кешированным пользователем.
+
+    Без сессионной cookie пользователь анонимный, и сессия не читается
+    вовсе; иначе пользователь берётся из кеша при первом обращении.
+    """
+
+    def process_request(self, request):
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            request.user = AnonymousUser()
+            return
+        request.user = SimpleLazyObject(lambda: get_user(request))
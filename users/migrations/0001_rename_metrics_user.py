@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.db import migrations
+
+from users.validators import rename_reserved_users
+
+
+def rename_metrics(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    rename_reserved_users(User, ["metrics"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_metrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+import re
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Имена, совпадающие с разделами сайта и частыми адресами сканеров:
+# профиль с таким именем был бы недоступен или притягивал бы мусорный
+# трафик, поэтому такие адреса отвечают 404 без обращения к базе.
+RESERVED_USERNAMES = frozenset({
+    "__debug__", "about", "about-author", "about-spec", "admin", "api",
+    "auth", "feed", "follow", "group", "media", "metrics", "more", "new",
+    "notifications", "popular", "since", "static",
+    ".env", ".git", "apple-touch-icon.png", "cgi-bin", "favicon.ico",
+    "phpmyadmin", "robots.txt", "sitemap.xml", "wp-admin", "wp-content",
+    "wp-includes", "wp-login.php", "xmlrpc.php",
+})
+RESERVED_SUFFIXES = (".php", ".asp", ".aspx", ".jsp", ".cgi", ".env", ".bak")
+
+# Допустимое имя пользователя (UnicodeUsernameValidator, max_length=150)
+USERNAME_RE = re.compile(r"^[\w.@+-]{1,150}\Z")
+
+
+def is_reserved_username(username):
+    """Имя, которого не может быть у пользователя."""
+    name = username.lower()
+    return (
+        name in RESERVED_USERNAMES
+        or name.endswith(RESERVED_SUFFIXES)
+        or not USERNAME_RE.match(username)
+    )
+
+
+def validate_not_reserved(username):
+    if is_reserved_username(username):
+        raise ValidationError(
+            "Это имя зарезервировано, выберите другое.",
+            code="reserved"
+        )
+
+
+def reserved_users(User, names, suffixes=()):
+    """Пользователи с именами из names или с окончаниями из suffixes."""
+    lookup = Q()
+    for name in names:
+        lookup |= Q(username__iexact=name)
+    for suffix in suffixes:
+        lookup |= Q(username__iendswith=suffix)
+    if not lookup:
+        return User.objects.none()
+    return User.objects.filter(lookup).order_by("pk")
+
+
+def rename_reserved_users(User, names, suffixes=(), dry_run=False):
+    """
+    Переименовывает пользователей, чьи имена стали зарезервированными:
+    их профили иначе отвечали бы 404. К имени добавляется id — «admin_12».
+    User — модель пользователя (в миграции данных — из её apps).
+    Возвращает {старое имя: новое}; с dry_run ничего не сохраняет.
+    """
+    renamed = {}
+    for user in reserved_users(User, names, suffixes):
+        username = f"{user.username}_{user.pk}"
+        while User.objects.filter(username=username).exists():
+            username += "_"
+        renamed[user.username] = username
+        if not dry_run:
+            user.username = username
+            user.save(update_fields=["username"])
+    return renamed
@@ -0,0 +1,197 @@
+"""
+Контроль допуска запросов при перегрузке.
+
+Каждое представление относится к классу из ADMISSION_CLASSES: "write"
+(действия пользователей), "read" (дешёвые кешируемые страницы) или
+"heavy" (тяжёлые выборки вроде ленты подписок). Для класса в
+ADMISSION_LIMITS заданы пороги: число запросов в работе, начиная с
+которого ответ упрощается, число, начиная с которого запрос сразу
+получает 503, и предельное ожидание в очереди веб-сервера (заголовок
+X-Request-Start от nginx: proxy_set_header X-Request-Start "t=$msec";
+принимается только от адресов ADMISSION_TRUSTED_PROXIES).
+
+Упрощённый ответ (request.degraded) обходится без числа комментариев
+в карточках, а лента подписок отдаётся из последней сохранённой копии.
+Так при всплеске трафика сайт отвечает медленнее и беднее, но отвечает.
+
+Счётчики живут в процессе: у синхронного воркера в работе не больше
+одного запроса, и перегрузку показывает прежде всего время в очереди.
+Состояние отдаётся в формате Prometheus по адресу /metrics/.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+
+from . import tracing
+
+ADMIT, DEGRADE, SHED = "admit", "degrade", "shed"
+DEFAULT_CLASS = "read"
+
+
+def view_name(view_func):
+    return f"{view_func.__module__}.{view_func.__name__}"
+
+
+def queue_ms(request, now=None):
+    """
+    Время ожидания запроса в очереди веб-сервера по X-Request-Start
+    (секунды, миллисекунды или микросекунды от эпохи) или None, если
+    заголовка нет или он пришёл не от доверенного прокси.
+    """
+    if request.META.get("REMOTE_ADDR") not in (
+        settings.ADMISSION_TRUSTED_PROXIES
+    ):
+        return None
+    value = request.META.get("HTTP_X_REQUEST_START", "")
+    try:
+        start = float(value[2:] if value.startswith("t=") else value)
+    except ValueError:
+        return None
+    if start > 1e14:
+        start /= 1e6
+    elif start > 1e11:
+        start /= 1e3
+    now = time.time() if now is None else now
+    return max((now - start) * 1000, 0)
+
+
+class AdmissionState:
+    """Запросы в работе и счётчики решений по классам представлений."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = defaultdict(int)
+        self.decisions = defaultdict(int)
+        self.duration_sum = defaultdict(float)
+        self.duration_count = defaultdict(int)
+        self.last_queue_ms = {}
+
+    def decide(self, view_class, waited_ms):
+        """Решение по запросу; допущенный учитывается как запрос в работе."""
+        degrade_at, shed_at, max_queue_ms = settings.ADMISSION_LIMITS.get(
+            view_class, (None, None, None)
+        )
+        with self.lock:
+            in_flight = self.in_flight[view_class]
+            late = max_queue_ms is not None and waited_ms is not None
+            if (shed_at is not None and in_flight >= shed_at) or (
+                late and waited_ms > max_queue_ms
+            ):
+                decision = SHED
+            elif (degrade_at is not None and in_flight >= degrade_at) or (
+                late and waited_ms > max_queue_ms / 2
+            ):
+                decision = DEGRADE
+            else:
+                decision = ADMIT
+            if decision != SHED:
+                self.in_flight[view_class] += 1
+            self.decisions[view_class, decision] += 1
+            if waited_ms is not None:
+                self.last_queue_ms[view_class] = waited_ms
+        return decision
+
+    def release(self, view_class, duration):
+        with self.lock:
+            self.in_flight[view_class] -= 1
+            self.duration_sum[view_class] += duration
+            self.duration_count[view_class] += 1
+
+    def metrics(self):
+        """Состояние в текстовом формате Prometheus."""
+        lines = []
+        with self.lock:
+            classes = sorted(
+                set(settings.ADMISSION_LIMITS) | set(self.in_flight)
+            )
+            lines.append("# TYPE yatube_admission_in_flight gauge")
+            for view_class in classes:
+                lines.append(
+                    f'yatube_admission_in_flight{{class="{view_class}"}} '
+                    f"{self.in_flight[view_class]}"
+                )
+            lines.append("# TYPE yatube_admission_requests_total counter")
+            for (view_class, decision), count in sorted(
+                self.decisions.items()
+            ):
+                lines.append(
+                    f'yatube_admission_requests_total{{class="{view_class}",'
+                    f'decision="{decision}"}} {count}'
+                )
+            lines.append("# TYPE yatube_admission_queue_ms gauge")
+            for view_class, waited_ms in sorted(self.last_queue_ms.items()):
+                lines.append(
+                    f'yatube_admission_queue_ms{{class="{view_class}"}} '
+                    f"{waited_ms:.1f}"
+                )
+            lines.append("# TYPE yatube_admission_duration_seconds summary")
+            for view_class in sorted(self.duration_count):
+                labels = f'{{class="{view_class}"}}'
+                lines.append(
+                    f"yatube_admission_duration_seconds_sum{labels} "
+                    f"{self.duration_sum[view_class]:.3f}"
+                )
+                lines.append(
+                    f"yatube_admission_duration_seconds_count{labels} "
+                    f"{self.duration_count[view_class]}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+state = AdmissionState()
+
+
+def degraded(request):
+    """Нужно ли упростить ответ на этот запрос."""
+    return getattr(request, "degraded", False)
+
+
+class AdmissionMiddleware:
+    """Допускает, упрощает или отклоняет запрос до вызова представления."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.admission_class = None
+        start = time.monotonic()
+        try:
+            return self.get_response(request)
+        finally:
+            if request.admission_class is not None:
+                state.release(
+                    request.admission_class, time.monotonic() - start
+                )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = settings.ADMISSION_CLASSES.get(
+            view_name(view_func), DEFAULT_CLASS
+        )
+        decision = state.decide(view_class, queue_ms(request))
+        if decision == SHED:
+            response = HttpResponse(
+                "Сайт перегружен, повторите запрос позже.",
+                content_type="text/plain; charset=utf-8",
+                status=503
+            )
+            response["Retry-After"] = settings.ADMISSION_RETRY_AFTER
+            return response
+        request.admission_class = view_class
+        request.degraded = decision == DEGRADE
+
+
+def metrics(request):
+    """Счётчики контроля допуска для Prometheus (staff и INTERNAL_IPS)."""
+    if not (
+        request.user.is_staff
+        or request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS
+    ):
+        raise PermissionDenied
+    return HttpResponse(
+        state.metrics() + tracing.metrics(),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
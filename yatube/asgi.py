@@ -0,0 +1,32 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Django 2.2 has no ASGI handler of its own, so on this version the WSGI
+application is wrapped with asgiref's WsgiToAsgi adapter. Slow clients are
+then handled by the ASGI server's event loop, and only the view itself
+occupies a thread from the pool (ASGI_THREADS sets its size).
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
+"""
+
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+from yatube.startup import timed_setup  # noqa: E402
+
+timed_setup()
+
+try:
+    from django.core.asgi import get_asgi_application
+except ImportError:
+    from asgiref.wsgi import WsgiToAsgi
+    from django.core.wsgi import get_wsgi_application
+
+    def get_asgi_application():
+        return WsgiToAsgi(get_wsgi_application())
+
+application = get_asgi_application()
@@ -0,0 +1,49 @@
+"""
+Запросы к сайту изнутри процесса: статическая выгрузка и прогрев кеша.
+
+Страница отрисовывается обычным обработчиком со всеми middleware, как для
+анонимного посетителя, но без тестового клиента Django: его сигналы
+шаблонов нужны только тестам, а хост "testserver" не пропустил бы
+ALLOWED_HOSTS боевого профиля. Хост запроса — INTERNAL_REQUEST_HOST или
+первый конкретный хост из ALLOWED_HOSTS.
+"""
+import threading
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def request_host():
+    """Хост, который пропустит проверка ALLOWED_HOSTS."""
+    if settings.INTERNAL_REQUEST_HOST:
+        return settings.INTERNAL_REQUEST_HOST
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            # ".example.com" разрешает и сам example.com
+            return host.lstrip(".")
+    return "localhost"
+
+
+def get_handler():
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            handler = BaseHandler()
+            handler.load_middleware()
+            _handler = handler
+    return _handler
+
+
+def get(path, params=None):
+    """Ответ сайта на GET-запрос анонимного посетителя."""
+    # django.test тянет за собой unittest: воркерам сайта он не нужен,
+    # поэтому импортируется только при самом запросе
+    from django.test import RequestFactory
+
+    request = RequestFactory(SERVER_NAME=request_host()).get(
+        path, params or {}
+    )
+    return get_handler().get_response(request)
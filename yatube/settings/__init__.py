@@ -0,0 +1,36 @@
+"""
+Профили настроек: dev, test и production.
+
+Профиль можно указать модулем: DJANGO_SETTINGS_MODULE=yatube.settings.dev.
+Тогда этот файл ничего не импортирует — Python выполняет его раньше
+модуля профиля, и боевой профиль не должен требовать здесь своих секретов.
+
+С DJANGO_SETTINGS_MODULE=yatube.settings профиль выбирается переменной
+окружения YATUBE_ENV. Без неё тесты (manage.py test и pytest) работают с
+профилем test, всё остальное — с production: забытая переменная на
+сервере не должна включать DEBUG и debug_toolbar. Для локальной
+разработки задайте YATUBE_ENV=dev.
+"""
+import os
+import sys
+
+
+def running_tests():
+    return sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+
+if os.environ.get('DJANGO_SETTINGS_MODULE', __name__) == __name__:
+    YATUBE_ENV = os.environ.get('YATUBE_ENV') or (
+        'test' if running_tests() else 'production'
+    )
+
+    if YATUBE_ENV == 'production':
+        from .production import *  # noqa: F401,F403
+    elif YATUBE_ENV == 'test':
+        from .test import *  # noqa: F401,F403
+    elif YATUBE_ENV == 'dev':
+        from .dev import *  # noqa: F401,F403
+    else:
+        raise ValueError(
+            f'Неизвестный профиль настроек YATUBE_ENV={YATUBE_ENV}'
+        )
@@ -0,0 +1,439 @@
+"""
+Django settings for yatube project: defaults shared by all profiles.
+
+Generated by 'django-admin startproject' using Django 2.2.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/2.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/2.2/ref/settings/
+"""
+
+import os
+import tempfile
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'dy^_79_6$$!tc+(@-*hb79g+gg_^sw7xhk_(+x@xx%a!!&8-tn'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    "localhost",
+    "127.0.0.1",
+    "[::1]",
+    "testserver",
+    "*",
+]
+
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'users',
+    'posts',
+    'django.contrib.sites',
+    'django.contrib.flatpages',
+    'django.contrib.sitemaps',
+    'ckeditor',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'sorl.thumbnail',
+]
+
+# Роль процесса: 'full' — весь сайт, 'feed' — узлы, которые отдают только
+# ленты и записи. Им не нужны админка, CKEditor и flatpages: без них воркер
+# быстрее запускается и занимает меньше памяти.
+YATUBE_ROLE = os.environ.get('YATUBE_ROLE', 'full')
+ADMIN_ONLY_APPS = [
+    'django.contrib.flatpages',
+    'ckeditor',
+    'django.contrib.admin',
+]
+if YATUBE_ROLE == 'feed':
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS if app not in ADMIN_ONLY_APPS
+    ]
+# Адрес основного сайта, например https://yatube.example: на узлах ленты
+# ссылки подвала на flatpages ведут туда, а без него не показываются
+MAIN_SITE_URL = os.environ.get('MAIN_SITE_URL', '').rstrip('/')
+
+MIDDLEWARE = [
+    'yatube.admission.AdmissionMiddleware',
+    'yatube.tracing.TracingMiddleware',
+    'yatube.slowlog.SlowQueryMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'users.middleware.CachedAuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'posts.context_processors.notifications',
+                'posts.context_processors.about_site',
+            ],
+            'libraries': {
+                'user_filters': 'yatube.templatetags.user_filters'
+            },
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+    }
+}
+
+# Архив старых записей можно вынести в отдельный файл SQLite:
+# DATABASES['archive'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': os.path.join(BASE_DIR, 'archive.sqlite3'),
+# }
+# ARCHIVE_DATABASE = 'archive'
+ARCHIVE_DATABASE = 'default'
+# Записи старше стольких дней переносит в архив команда archive_posts
+ARCHIVE_AFTER_DAYS = 365
+
+# Записи с комментариями можно разнести по нескольким базам: запись
+# попадает в базу POST_SHARDS[id автора % len(POST_SHARDS)], комментарий —
+# в базу своей записи (posts/sharding.py). Схема во всех базах одинаковая
+# (migrate --database=<база>), после изменения списка записи переносит
+# команда reshard. С одной базой всё работает как обычно.
+# DATABASES['shard1'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': os.path.join(BASE_DIR, 'shard1.sqlite3'),
+# }
+# POST_SHARDS = ['default', 'shard1']
+POST_SHARDS = ['default']
+# Сколько id записей или комментариев процесс получает за одно обращение
+# к общему счётчику в основной базе
+SHARD_ID_BLOCK = 100
+
+DATABASE_ROUTERS = [
+    'posts.routers.ArchiveRouter',
+    'posts.routers.ShardRouter',
+]
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+
+STATIC_ROOT = os.path.join(BASE_DIR, "static")
+
+# Хешированные имена статики из манифеста collectstatic
+STATICFILES_STORAGE = 'yatube.storage.ManifestStaticStorage'
+
+
+#Login
+
+LOGIN_URL = "/auth/login"
+LOGIN_REDIRECT_URL = "index"
+#LOGOUT_REDIRECT_URL = "index"
+
+
+EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
+
+
+SITE_ID = 2
+
+
+CKEDITOR_BASEPATH = "/static/ckeditor/ckeditor/"
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Загрузки сохраняются под хешем содержимого, миниатюры sorl.thumbnail
+# уже именуются хешем исходника и параметров
+DEFAULT_FILE_STORAGE = 'yatube.storage.ContentHashedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+THUMBNAIL_BACKEND = 'yatube.thumbnails.TracedThumbnailBackend'
+
+# Отдача MEDIA_URL и STATIC_URL самим Django при DEBUG = False
+SERVE_ASSETS = True
+# Время кеширования файлов без хеша в имени, секунды
+MUTABLE_ASSETS_MAX_AGE = 60 * 60
+# None, 'x-sendfile' или 'x-accel-redirect': байты файла отдаёт веб-сервер
+SENDFILE_BACKEND = None
+SENDFILE_URL_PREFIX = '/protected/'
+
+CKEDITOR_UPLOAD_PATH = 'uploads/'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Опрос новых записей (posts_since): время жизни кеша, предел long-poll,
+# интервал проверки, максимум записей в ответе и одновременно ждущих
+# запросов на процесс (каждый занимает поток воркера)
+POLL_CACHE_TIMEOUT = 2
+POLL_MAX_WAIT = 25
+POLL_INTERVAL = 1
+POLL_MAX_POSTS = 20
+POLL_MAX_WAITERS = 4
+
+# Параллельные независимые выборки в представлениях (кроме SQLite)
+PARALLEL_QUERIES = True
+PARALLEL_QUERIES_WORKERS = 8
+
+# Админка: до такого числа строк список считается точным COUNT(*),
+# поиск по тексту без фильтра по дате охватывает последние дни
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_TEXT_SEARCH_DAYS = 30
+
+# Популярное: период полураспада рейтинга, окно учёта событий, размер
+# ленты и время кеширования её списка
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_WINDOW_DAYS = 7
+TRENDING_SIZE = 50
+TRENDING_CACHE_TIMEOUT = 60
+
+# Сессии: по умолчанию в кеше с записью в базу; для хранения целиком в
+# подписанной cookie задайте
+# SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies
+SESSION_ENGINE = os.environ.get(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.cached_db'
+)
+# Сколько секунд пользователь текущей сессии хранится в кеше; None —
+# не кешировать. Только с общим для всех воркеров кешем: сброс после
+# блокировки или смены пароля в LocMemCache одного воркера не виден другим
+AUTH_USER_CACHE_TIMEOUT = None
+
+# Сколько секунд счётчик непрочитанных живёт в кеше: с кешем, своим у
+# каждого воркера, значок может отставать на это время
+NOTIFICATIONS_CACHE_TIMEOUT = 60
+
+# Прогрев кеша (команда warm_cache): сколько первых страниц главной,
+# самых больших групп и профилей с наибольшим числом подписчиков
+CACHE_WARM_INDEX_PAGES = 3
+CACHE_WARM_GROUPS = 10
+CACHE_WARM_PROFILES = 20
+# Прогревать ли кеш воркера в фоне после сброса кешей лент; сбросы
+# за CACHE_WARM_DELAY секунд дают один прогрев
+CACHE_WARM_AFTER_INVALIDATION = False
+CACHE_WARM_DELAY = 5
+
+# Сколько секунд ждать значение кеша, которое уже строит другой запрос,
+# прежде чем построить его самому (yatube/singleflight.py)
+SINGLE_FLIGHT_WAIT = 5
+
+# Сколько секунд хранится число записей ленты для паджинатора; любое
+# изменение записей или подписок сбрасывает его сразу
+FEED_COUNT_CACHE_TIMEOUT = 60 * 10
+
+# Записей в одной порции бесконечной прокрутки ленты
+FEED_BATCH_SIZE = 10
+
+# Пользователей на странице списков подписчиков и подписок
+FOLLOW_LIST_SIZE = 30
+
+# Карта сайта и RSS/Atom: строк на страницу карты, записей в ленте и
+# предельное время кеширования (новая запись сбрасывает кеш сразу)
+SITEMAP_PAGE_SIZE = 5000
+FEED_SIZE = 20
+FEEDS_CACHE_TIMEOUT = 60 * 60
+
+# Повторы: за сколько часов сравниваются тексты, сколько бит SimHash
+# могут различаться у повтора (не больше 5, см. posts/fingerprints.py)
+# и со скольких слов текст сравнивается с чужими (короткие — только
+# с собственными и только точно)
+DUPLICATE_WINDOW_HOURS = 24
+DUPLICATE_MAX_DISTANCE = 5
+DUPLICATE_MIN_WORDS = 5
+
+# Сколько секунд помнить, что автора или записи нет (ответ 404 без базы)
+NOT_FOUND_CACHE_TIMEOUT = 60 * 5
+
+# Каталог статической выгрузки публичных страниц (команда export_static)
+STATIC_EXPORT_ROOT = os.path.join(BASE_DIR, 'public')
+# Хост запросов выгрузки и прогрева кеша к самому сайту
+# (yatube/selfrequest.py); по умолчанию — первый из ALLOWED_HOSTS
+INTERNAL_REQUEST_HOST = os.environ.get('INTERNAL_REQUEST_HOST')
+
+# Замер времени импорта приложений при запуске (см. yatube/startup.py)
+STARTUP_IMPORT_TIMING = False
+
+# Запросы к базе дольше стольких миллисекунд пишутся в SLOW_QUERY_LOG
+# (отчёт: slow_queries). Журнал включается переменной окружения
+# SLOW_QUERY_THRESHOLD_MS и пишется вне каталога проекта; план
+# выполнения — повторный запрос EXPLAIN — только при SLOW_QUERY_EXPLAIN=1
+SLOW_QUERY_THRESHOLD_MS = (
+    int(os.environ['SLOW_QUERY_THRESHOLD_MS'])
+    if os.environ.get('SLOW_QUERY_THRESHOLD_MS') else None
+)
+SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', '') == '1'
+SLOW_QUERY_LOG = os.environ.get(
+    'SLOW_QUERY_LOG',
+    os.path.join(tempfile.gettempdir(), 'yatube-slow_queries.log')
+)
+
+# Трассировка: доля запросов, для которых пишутся спаны (0 — выключена);
+# трассы уходят коллектору OTLP/HTTP, например
+# http://localhost:4318/v1/traces, а без него — строками в TRACING_FILE
+TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', 0))
+TRACING_EXPORT_URL = os.environ.get('TRACING_EXPORT_URL')
+TRACING_FILE = os.environ.get(
+    'TRACING_FILE',
+    os.path.join(tempfile.gettempdir(), 'yatube-traces.jsonl')
+)
+# Сколько трасс ждут отправки; сверх этого новые отбрасываются
+TRACING_QUEUE_SIZE = 1000
+TRACING_SERVICE_NAME = 'yatube'
+# Адреса, чьё решение трассировать (traceparent с флагом sampled)
+# соблюдается даже при TRACING_SAMPLE_RATE=0; через запятую
+TRACING_TRUSTED_CALLERS = [
+    address for address in
+    os.environ.get('TRACING_TRUSTED_CALLERS', '').split(',') if address
+]
+
+# Контроль допуска при перегрузке (yatube/admission.py): класс
+# представления — "write", "read" (по умолчанию) или "heavy"
+ADMISSION_CLASSES = {
+    'posts.views.new_post': 'write',
+    'posts.views.post_edit': 'write',
+    'posts.views.add_comment': 'write',
+    'posts.views.profile_follow': 'write',
+    'posts.views.profile_unfollow': 'write',
+    'posts.views.flag_post': 'write',
+    'posts.views.flag_comment': 'write',
+    'posts.views.follow_index': 'heavy',
+    'posts.views.feed_more': 'heavy',
+    'posts.views.posts_since': 'heavy',
+}
+# Пороги класса: со скольких запросов в работе ответ упрощается, со
+# скольких запрос получает 503 и сколько миллисекунд он может ждать
+# в очереди веб-сервера (после половины этого срока ответ упрощается);
+# None — без порога. Записи пользователей не упрощаются и не
+# отклоняются по очереди: их меньше всего и терять их дороже всего
+ADMISSION_LIMITS = {
+    'write': (None, 64, None),
+    'read': (16, 48, 2000),
+    'heavy': (2, 8, 500),
+}
+# Через сколько секунд клиенту повторить отклонённый запрос
+ADMISSION_RETRY_AFTER = 5
+# Сколько секунд хранится копия ленты подписок для ответа при перегрузке
+# и как часто она обновляется обычными запросами
+ADMISSION_STALE_TIMEOUT = 60 * 10
+ADMISSION_STALE_REFRESH = 60
+# Адреса прокси (nginx), которым можно верить в X-Request-Start: от
+# остальных заголовок игнорируется, иначе любой клиент сдвинул бы
+# пороги очереди. Через запятую в переменной окружения
+ADMISSION_TRUSTED_PROXIES = [
+    address for address in
+    os.environ.get('ADMISSION_TRUSTED_PROXIES', '').split(',') if address
+]
+
+# Адреса, с которых доступны /metrics/ без входа под сотрудником
+INTERNAL_IPS = []
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'timestamped': {
+            'format': '%(asctime)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            'class': 'logging.FileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'formatter': 'timestamped',
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'yatube': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'yatube.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
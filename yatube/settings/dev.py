@@ -0,0 +1,20 @@
+"""Локальная разработка: отладка и debug_toolbar."""
+from .base import *  # noqa: F401,F403
+
+YATUBE_ENV = 'dev'
+
+DEBUG = True
+
+INSTALLED_APPS += [
+    'debug_toolbar',
+]
+
+MIDDLEWARE += [
+    'debug_toolbar.middleware.DebugToolbarMiddleware',
+]
+
+INTERNAL_IPS = [
+    "127.0.0.1"
+]
+
+STARTUP_IMPORT_TIMING = True
@@ -0,0 +1,85 @@
+"""
+Боевой профиль.
+
+Секреты, хосты, база и кеш задаются переменными окружения. Соединения с
+базой живут между запросами, кеш общий для всех воркеров, шаблоны
+компилируются один раз, статика заранее сжата, отладочных приложений нет.
+"""
+import copy
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+
+YATUBE_ENV = 'production'
+
+DEBUG = False
+
+# ключ из base.py лежит в репозитории и для боевого сайта не годится
+SECRET_KEY = os.environ.get('SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured(
+        'Задайте SECRET_KEY в окружении или YATUBE_ENV=dev для разработки'
+    )
+
+ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost').split(',')
+
+DATABASES = {
+    'default': {
+        'ENGINE': os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': os.environ.get(
+            'DB_NAME',
+            os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # соединение переиспользуется запросами воркера до 10 минут
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+    }
+}
+
+# Общий кеш: memcached (пакет python-memcached), если задан
+# CACHE_LOCATION, иначе файловый.
+# LocMemCache у каждого воркера свой, и счётчики в нём расходятся.
+if os.environ.get('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['CACHE_LOCATION'].split(','),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, '.cache'),
+        }
+    }
+
+# кеш выше общий, поэтому пользователя сессии можно хранить в нём
+AUTH_USER_CACHE_TIMEOUT = 60 * 5
+
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+TEMPLATES[0]['OPTIONS']['context_processors'].remove(
+    'django.template.context_processors.debug'
+)
+
+STATICFILES_STORAGE = 'yatube.storage.CompressedManifestStaticStorage'
+
+# SERVE_ASSETS=0, если статику и загрузки отдаёт nginx (gzip_static on)
+SERVE_ASSETS = os.environ.get('SERVE_ASSETS', '1') == '1'
+
+SESSION_COOKIE_SECURE = os.environ.get('HTTPS', '') == '1'
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
+
+STARTUP_IMPORT_TIMING = True
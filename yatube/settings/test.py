@@ -0,0 +1,30 @@
+"""Тесты: быстрый хеш паролей и загрузки во временном каталоге."""
+import os
+import tempfile
+
+from .base import *  # noqa: F401,F403
+
+YATUBE_ENV = 'test'
+
+# Стойкий хеш паролей в тестах только тратит время на каждый логин
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+MEDIA_ROOT = os.path.join(tempfile.gettempdir(), 'yatube-test', 'media')
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# Тесты идут в одном процессе, и LocMemCache для них общий
+AUTH_USER_CACHE_TIMEOUT = 60 * 5
+
+# Планы медленных запросов добавили бы запросы в проверки их числа
+SLOW_QUERY_THRESHOLD_MS = None
+
+# Вторая база для проверки разнесения записей по базам (POST_SHARDS)
+DATABASES['shard1'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.path.join(
+        tempfile.gettempdir(), 'yatube-test', 'shard1.sqlite3'
+    ),
+}
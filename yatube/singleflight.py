@@ -0,0 +1,66 @@
+"""
+Однократное построение значения кеша при одновременных промахах.
+
+Когда горячий ключ истекает или сбрасывается, все запросы, пришедшие
+за ним одновременно, иначе пересчитали бы его каждый сам. get_or_build
+пропускает к построению только один: внутри процесса — по блокировке
+на ключ, между процессами — по метке в кеше (cache.add атомарен в
+memcached и файловом кеше). Остальные ждут, пока значение появится,
+а если строитель не успел за SINGLE_FLIGHT_WAIT секунд, строят сами.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+MISSING = object()
+POLL_INTERVAL = 0.05
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def get_or_build(key, build, timeout=DEFAULT_TIMEOUT, cache=default_cache):
+    """Значение key из кеша или результат build(), построенный однажды."""
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        return value
+    lock = _lock(key)
+    try:
+        with lock:
+            value = cache.get(key, MISSING)
+            if value is not MISSING:
+                return value
+            building = f"{key}:building"
+            if not cache.add(building, 1, settings.SINGLE_FLIGHT_WAIT):
+                value = wait_for(key, cache)
+                if value is not MISSING:
+                    return value
+            try:
+                value = build()
+                cache.set(key, value, timeout)
+            finally:
+                cache.delete(building)
+            return value
+    finally:
+        with _locks_guard:
+            if _locks.get(key) is lock and not lock.locked():
+                del _locks[key]
+
+
+def wait_for(key, cache):
+    """Ждёт значение, которое строит другой процесс."""
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return value
+    return MISSING
@@ -0,0 +1,185 @@
+"""
+Журнал медленных запросов к базе.
+
+SlowQueryMiddleware оборачивает выполнение SQL на время запроса
+(connection.execute_wrapper). Запрос дольше SLOW_QUERY_THRESHOLD_MS
+записывается в логгер yatube.slow_queries одной строкой JSON: отпечаток
+SQL без значений, длительность, представление и шаблон, из которых он
+выполнен, и при SLOW_QUERY_EXPLAIN — план выполнения (EXPLAIN QUERY PLAN
+в SQLite, EXPLAIN в PostgreSQL): ради него запрос выполняется ещё раз.
+Отчёт по журналу строит команда slow_queries.
+"""
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("yatube.slow_queries")
+
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+PARAMS_RE = re.compile(r"%s|\?")
+IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+SPACE_RE = re.compile(r"\s+")
+
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """SQL без значений: запросы, различающиеся только ими, совпадают."""
+    sql = STRING_RE.sub("?", sql)
+    sql = NUMBER_RE.sub("?", sql)
+    sql = PARAMS_RE.sub("?", sql)
+    sql = IN_LIST_RE.sub("(...)", sql)
+    return SPACE_RE.sub(" ", sql).strip()
+
+
+def template_position():
+    """Шаблон и строка, отрисовка которых выполняет запрос, если есть."""
+    frame = sys._getframe()
+    while frame is not None:
+        if frame.f_code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                name = origin.template_name or origin.name
+                return f"{name}:{token.lineno}"
+        frame = frame.f_back
+    return None
+
+
+def explain(connection, sql, params):
+    """План запроса; None для запросов, кроме SELECT, и неизвестных СУБД."""
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    if prefix is None or not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [
+                " ".join(str(column) for column in row)
+                for row in cursor.fetchall()
+            ]
+    except Exception:
+        # план не важнее самого запроса: например, транзакция уже прервана
+        return None
+    finally:
+        _local.explaining = False
+
+
+class SlowQueryLogger:
+    """execute_wrapper, который записывает запросы дольше порога."""
+
+    def __init__(self, connection, threshold_ms):
+        self.connection = connection
+        self.threshold = threshold_ms / 1000
+        self.view = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, "explaining", False):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+        if duration >= self.threshold:
+            self.log(sql, params, many, duration)
+        return result
+
+    def log(self, sql, params, many, duration):
+        logger.warning(json.dumps({
+            "fingerprint": fingerprint(sql),
+            "sql": sql,
+            "ms": round(duration * 1000, 2),
+            "database": self.connection.alias,
+            "view": self.view,
+            "template": template_position(),
+            "plan": (
+                explain(self.connection, sql, params)
+                if settings.SLOW_QUERY_EXPLAIN and not many else None
+            ),
+        }, ensure_ascii=False, default=str))
+
+
+class SlowQueryMiddleware:
+    """Включает журнал медленных запросов для каждого запроса к сайту."""
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_THRESHOLD_MS is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.slow_query_loggers = [
+            SlowQueryLogger(connection, settings.SLOW_QUERY_THRESHOLD_MS)
+            for connection in connections.all()
+        ]
+        with ExitStack() as stack:
+            for wrapper in request.slow_query_loggers:
+                stack.enter_context(
+                    wrapper.connection.execute_wrapper(wrapper)
+                )
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = f"{view_func.__module__}.{view_func.__name__}"
+        for wrapper in request.slow_query_loggers:
+            wrapper.view = view
+
+
+def read_log(lines):
+    """Записи журнала; строки не в формате JSON пропускаются."""
+    for line in lines:
+        start = line.find("{")
+        if start == -1:
+            continue
+        try:
+            yield json.loads(line[start:])
+        except ValueError:
+            continue
+
+
+def aggregate(records):
+    """
+    Сводка по отпечаткам SQL, от наибольшего суммарного времени.
+
+    Для каждого отпечатка: число запросов, суммарное и наибольшее время,
+    самые частые места вызова и план самого долгого запроса.
+    """
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record["fingerprint"], {
+            "fingerprint": record["fingerprint"],
+            "count": 0,
+            "total_ms": 0,
+            "max_ms": 0,
+            "callers": Counter(),
+            "plan": None,
+        })
+        group["count"] += 1
+        group["total_ms"] += record["ms"]
+        caller = record.get("template") or record.get("view")
+        if caller:
+            group["callers"][caller] += 1
+        if record["ms"] >= group["max_ms"]:
+            group["max_ms"] = record["ms"]
+            group["plan"] = record.get("plan") or group["plan"]
+    return sorted(
+        groups.values(),
+        key=lambda group: group["total_ms"],
+        reverse=True
+    )
@@ -0,0 +1,79 @@
+"""
+Замер времени импорта приложений при запуске процесса.
+
+Вызывается из wsgi.py и asgi.py до get_wsgi_application(): пакеты и
+модели каждого приложения из INSTALLED_APPS импортируются с замером, и в
+журнал "yatube.startup" пишется, сколько стоит каждое приложение.
+Так видно, какие приложения замедляют запуск воркеров и что стоит
+убрать из профиля, где они не используются.
+"""
+import importlib
+import logging
+import time
+
+import django
+from django.apps import AppConfig, apps
+from django.conf import settings
+
+logger = logging.getLogger("yatube.startup")
+
+
+def import_app(entry):
+    """Импортирует пакет приложения; entry может быть путём к AppConfig."""
+    try:
+        importlib.import_module(entry)
+    except ImportError:
+        importlib.import_module(entry.rpartition(".")[0])
+
+
+def timed_setup():
+    """
+    django.setup() с замером времени импорта каждого приложения.
+
+    Возвращает словарь {приложение: секунды}; если приложения уже
+    загружены (например, manage.py runserver), ничего не замеряет.
+    """
+    if not settings.STARTUP_IMPORT_TIMING or apps.ready:
+        return {}
+    timings = {}
+    started = time.perf_counter()
+    for entry in settings.INSTALLED_APPS:
+        start = time.perf_counter()
+        import_app(entry)
+        timings[entry] = time.perf_counter() - start
+
+    import_models = AppConfig.import_models
+    # модели одного приложения могут импортировать модели другого:
+    # вложенное время относится к вложенному приложению
+    nested = [0.0]
+
+    def timed_import_models(app_config):
+        outer, nested[0] = nested[0], 0.0
+        start = time.perf_counter()
+        import_models(app_config)
+        seconds = time.perf_counter() - start
+        for entry in timings:
+            if entry == app_config.name or entry.startswith(
+                app_config.name + ".apps."
+            ):
+                timings[entry] += seconds - nested[0]
+        nested[0] = outer + seconds
+
+    AppConfig.import_models = timed_import_models
+    try:
+        django.setup(set_prefix=False)
+    finally:
+        AppConfig.import_models = import_models
+    total = time.perf_counter() - started
+    for entry, seconds in sorted(
+        timings.items(),
+        key=lambda item: item[1],
+        reverse=True
+    ):
+        logger.info("import %-40s %7.1f ms", entry, seconds * 1000)
+    logger.info(
+        "django.setup() %.1f ms, из них ready() и прочее %.1f ms",
+        total * 1000,
+        (total - sum(timings.values())) * 1000
+    )
+    return timings
@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import os
+import posixpath
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ManifestStaticStorage(ManifestStaticFilesStorage):
+    """
+    Статика под хешированными именами из манифеста collectstatic.
+
+    Если файла нет в манифесте (collectstatic ещё не запускали, например
+    в тестах), отдаётся исходное имя вместо ошибки при рендеринге шаблона.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+
+class CompressedManifestStaticStorage(ManifestStaticStorage):
+    """
+    Статика из манифеста с заранее сжатыми копиями ``<имя>.gz``.
+
+    collectstatic один раз сжимает текстовые файлы с максимальной
+    степенью, и веб-сервер (gzip_static в nginx или yatube.views.serve)
+    отдаёт готовую копию, не тратя процессор на каждый ответ.
+    """
+
+    compress_extensions = (
+        '.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml'
+    )
+    min_compress_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if not dry_run and hashed_name and processed is True:
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        if os.path.splitext(name)[1].lower() not in self.compress_extensions:
+            return
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < self.min_compress_size:
+            return
+        compressed = gzip.compress(data, compresslevel=9)
+        if len(compressed) >= len(data):
+            return
+        with open(self.path(name) + '.gz', 'wb') as target:
+            target.write(compressed)
+
+
+class ContentHashedStorage(FileSystemStorage):
+    """
+    Хранилище загрузок, адресуемое по содержимому.
+
+    Файл сохраняется под именем ``<каталог>/<sha256>.<расширение>``, поэтому
+    его URL никогда не меняет содержимое и может кешироваться навсегда.
+    Одинаковые файлы записываются на диск один раз.
+    """
+
+    hash_length = 32
+
+    def content_name(self, name, content):
+        sha = hashlib.sha256()
+        for chunk in content.chunks():
+            sha.update(chunk)
+        dir_name, file_name = posixpath.split(name)
+        ext = os.path.splitext(file_name)[1].lower()
+        return posixpath.join(
+            dir_name,
+            sha.hexdigest()[:self.hash_length] + ext
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
@@ -1,4 +1,10 @@
 from django import template
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from posts.cursors import encode_cursor
+from yatube.admission import degraded
+from yatube.singleflight import get_or_build
 
 register = template.Library()
 
@@ -6,3 +12,58 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={"class": css})
+
+
+@register.filter
+def feed_cursor(post):
+    """Курсор ленты после записи post (см. posts/cursors.py)."""
+    return encode_cursor(post) if post else ""
+
+
+class CacheOnceNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        key = make_template_fragment_key(
+            self.fragment_name,
+            [var.resolve(context) for var in self.vary_on]
+        )
+        if degraded(context.get("request")):
+            # упрощённый при перегрузке фрагмент не сохраняем: иначе все
+            # получали бы его до истечения срока и после спада нагрузки
+            value = cache.get(key)
+            return self.nodelist.render(context) if value is None else value
+        return get_or_build(
+            key,
+            lambda: self.nodelist.render(context),
+            int(self.expire_time.resolve(context))
+        )
+
+
+@register.tag
+def cache_once(parser, token):
+    """
+    {% cache %} с однократным построением фрагмента: при одновременных
+    промахах шаблон отрисовывает один запрос, остальные ждут его. Ключи
+    совпадают с ключами {% cache %}. Упрощённый ответ при перегрузке
+    (request.degraded) берёт готовый фрагмент, но своего не сохраняет.
+
+        {% cache_once 20 index_page page.number %}...{% endcache_once %}
+    """
+    nodelist = parser.parse(("endcache_once",))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' требует время кеширования и имя фрагмента"
+        )
+    return CacheOnceNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]]
+    )
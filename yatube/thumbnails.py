@@ -0,0 +1,13 @@
+"""Бэкенд sorl.thumbnail, записывающий построение миниатюр в трассу."""
+from sorl.thumbnail.base import ThumbnailBackend
+
+from . import tracing
+
+
+class TracedThumbnailBackend(ThumbnailBackend):
+    def get_thumbnail(self, file_, geometry_string, **options):
+        with tracing.span("thumbnail", attributes={
+            "thumbnail.source": str(file_),
+            "thumbnail.geometry": geometry_string,
+        }):
+            return super().get_thumbnail(file_, geometry_string, **options)
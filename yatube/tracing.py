@@ -0,0 +1,384 @@
+"""
+Трассировка запросов: вложенные спаны в формате OTLP JSON.
+
+TracingMiddleware открывает корневой спан для доли запросов
+TRACING_SAMPLE_RATE или для запросов с заголовком traceparent, в котором
+вызывающая сторона уже решила трассировать. Заголовку верят только от
+адресов TRACING_TRUSTED_CALLERS (свои сервисы и прокси): иначе любой
+клиент включал бы дорогую трассировку каждому своему запросу. Внутри
+него спаны получают представление, каждый SQL-запрос, операции кеша,
+отрисовка шаблонов (включая {% include %}) и миниатюры sorl. Вне
+трассируемого запроса span() ничего не делает, поэтому обёртки почти
+ничего не стоят.
+
+Завершённая трасса отправляется в фоновом потоке коллектору
+TRACING_EXPORT_URL (OTLP/HTTP, /v1/traces) или дописывается строкой
+в файл TRACING_FILE. Очередь на отправку ограничена
+TRACING_QUEUE_SIZE: если коллектор не успевает, новые трассы
+отбрасываются и считаются в yatube_tracing_dropped_total на /metrics/.
+"""
+import functools
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# SpanKind из спецификации OpenTelemetry
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_ERROR = 2
+
+CACHE_METHODS = (
+    "get", "set", "add", "delete", "get_many", "set_many", "delete_many",
+    "get_or_set", "incr", "decr", "touch",
+)
+
+TRACEPARENT_RE = re.compile(
+    r"^00-(?P<trace_id>[0-9a-f]{32})-(?P<parent_id>[0-9a-f]{16})"
+    r"-(?P<flags>[0-9a-f]{2})$"
+)
+
+_local = threading.local()
+_export_lock = threading.Lock()
+_export_queue = None
+dropped = 0
+_instrumented = False
+
+
+class Span:
+    def __init__(self, trace_id, name, parent_id="", kind=INTERNAL,
+                 attributes=None, trace=None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.error = None
+        # завершённые спаны трассы копятся в списке корневого
+        self.trace = [] if trace is None else trace
+        self.start = time.time_ns()
+        self.end = None
+
+    def child(self, name, kind=INTERNAL, attributes=None):
+        return Span(
+            self.trace_id, name, self.span_id, kind, attributes, self.trace
+        )
+
+    def finish(self):
+        self.end = time.time_ns()
+        self.trace.append(self)
+
+
+def current_span():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def activate(span):
+    """Делает span текущим родителем для спанов этого потока."""
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    _local.stack.append(span)
+    try:
+        yield span
+    finally:
+        _local.stack.pop()
+
+
+@contextmanager
+def span(name, kind=INTERNAL, attributes=None):
+    """Дочерний спан текущего; вне трассы ничего не записывает."""
+    parent = current_span()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, kind, attributes)
+    try:
+        with activate(child):
+            yield child
+    except Exception as error:
+        child.error = repr(error)
+        raise
+    finally:
+        child.finish()
+
+
+def traced(name, attributes=None):
+    """Декоратор: вызов функции — отдельный спан."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_span() is None:
+                return func(*args, **kwargs)
+            with span(name, attributes=attributes(*args, **kwargs)
+                      if callable(attributes) else attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def bind(func):
+    """
+    Функция для другого потока, продолжающая текущую трассу: с тем же
+    родительским спаном и записью SQL-запросов соединений этого потока.
+    """
+    parent = current_span()
+    if parent is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with activate(parent), traced_queries():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def query_span(execute, sql, params, many, context):
+    connection = context["connection"]
+    with span("db.query", CLIENT, {
+        "db.system": connection.vendor,
+        "db.name": connection.alias,
+        "db.statement": sql,
+    }):
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def traced_queries():
+    """Спан для каждого SQL-запроса соединений текущего потока."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(query_span))
+        yield
+
+
+def instrument():
+    """Оборачивает шаблоны и классы кешей спанами (один раз на процесс)."""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    from django.template.base import Template
+
+    Template.render = traced(
+        "template.render",
+        lambda template, context: {"template.name": template.name}
+    )(Template.render)
+
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if getattr(backend, "_traced", False):
+            continue
+        backend._traced = True
+        for method in CACHE_METHODS:
+            if hasattr(backend, method):
+                setattr(backend, method, traced(
+                    f"cache.{method}", cache_attributes
+                )(getattr(backend, method)))
+
+
+def cache_attributes(cache, key=None, *args, **kwargs):
+    if isinstance(key, str):
+        return {"cache.key": key}
+    return {"cache.keys": len(key or ())}
+
+
+def start_trace(request):
+    """
+    Корневой спан запроса или None, если запрос не трассируется.
+
+    Решение доверенной вызывающей стороны из traceparent (W3C Trace
+    Context) важнее собственной выборки; от остальных заголовок
+    игнорируется.
+    """
+    match = None
+    if request.META.get("REMOTE_ADDR") in settings.TRACING_TRUSTED_CALLERS:
+        match = TRACEPARENT_RE.match(request.META.get("HTTP_TRACEPARENT", ""))
+    if match:
+        if not int(match.group("flags"), 16) & 1:
+            return None
+        trace_id, parent_id = match.group("trace_id", "parent_id")
+    elif random.random() < settings.TRACING_SAMPLE_RATE:
+        trace_id, parent_id = os.urandom(16).hex(), ""
+    else:
+        return None
+    return Span(trace_id, request.method, parent_id, SERVER, {
+        "http.method": request.method,
+        "http.target": request.get_full_path(),
+    })
+
+
+def attribute_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans):
+    """Трасса в формате OTLP JSON (ExportTraceServiceRequest)."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{
+            "key": "service.name",
+            "value": attribute_value(settings.TRACING_SERVICE_NAME),
+        }]},
+        "scopeSpans": [{
+            "scope": {"name": __name__},
+            "spans": [{
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent_id,
+                "name": span.name,
+                "kind": span.kind,
+                "startTimeUnixNano": str(span.start),
+                "endTimeUnixNano": str(span.end),
+                "attributes": [
+                    {"key": key, "value": attribute_value(value)}
+                    for key, value in span.attributes.items()
+                ],
+                "status": (
+                    {"code": STATUS_ERROR, "message": span.error}
+                    if span.error else {}
+                ),
+            } for span in spans],
+        }],
+    }]}
+
+
+def write_trace(payload, url, path):
+    if url:
+        request = urllib.request.Request(
+            url, payload.encode(), {"Content-Type": "application/json"}
+        )
+        urllib.request.urlopen(request, timeout=5).close()
+    else:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(payload + "\n")
+
+
+def export_queue():
+    """Очередь трасс на отправку; поток-отправитель стартует с ней."""
+    global _export_queue
+    with _export_lock:
+        if _export_queue is None:
+            _export_queue = queue.Queue(settings.TRACING_QUEUE_SIZE)
+            threading.Thread(
+                target=export_worker, args=(_export_queue,),
+                name="tracing", daemon=True
+            ).start()
+        return _export_queue
+
+
+def export_worker(pending):
+    while True:
+        args = pending.get()
+        try:
+            if args is not None:
+                write_trace(*args)
+        except Exception:
+            # коллектор недоступен — трасса теряется, запросы не страдают
+            pass
+        finally:
+            pending.task_done()
+
+
+def export(spans):
+    """Отправляет трассу в фоне: запрос не ждёт коллектор.
+
+    Если очередь заполнена, трасса отбрасывается; возвращает,
+    принята ли она.
+    """
+    global dropped
+    try:
+        export_queue().put_nowait((
+            json.dumps(to_otlp(spans), ensure_ascii=False),
+            settings.TRACING_EXPORT_URL,
+            settings.TRACING_FILE,
+        ))
+    except queue.Full:
+        with _export_lock:
+            dropped += 1
+        return False
+    return True
+
+
+def flush():
+    """Дожидается отправки всех завершённых трасс."""
+    export_queue().join()
+
+
+def metrics():
+    """Счётчик отброшенных трасс в текстовом формате Prometheus."""
+    return (
+        "# TYPE yatube_tracing_dropped_total counter\n"
+        f"yatube_tracing_dropped_total {dropped}\n"
+    )
+
+
+class TracingMiddleware:
+    """Корневой спан запроса; спаны SQL, кеша, шаблонов и миниатюр."""
+
+    def __init__(self, get_response):
+        # без своей выборки остаются трассы, начатые доверенными сервисами
+        if not (
+            settings.TRACING_SAMPLE_RATE or settings.TRACING_TRUSTED_CALLERS
+        ):
+            raise MiddlewareNotUsed
+        instrument()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        root = start_trace(request)
+        if root is None:
+            return self.get_response(request)
+        request.trace_span = root
+        try:
+            with activate(root), traced_queries():
+                try:
+                    response = self.get_response(request)
+                finally:
+                    self.finish_view(request)
+        except Exception as error:
+            root.error = repr(error)
+            raise
+        else:
+            root.attributes["http.status_code"] = response.status_code
+            if response.status_code >= 500:
+                root.error = response.reason_phrase
+            return response
+        finally:
+            root.finish()
+            export(root.trace)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        root = getattr(request, "trace_span", None)
+        if root is None:
+            return
+        view = f"{view_func.__module__}.{view_func.__name__}"
+        root.name = f"{request.method} {view}"
+        # спан представления длится до возврата ответа в __call__
+        request.trace_view_span = root.child(
+            view, attributes={"code.function": view}
+        )
+        _local.stack.append(request.trace_view_span)
+
+    def finish_view(self, request):
+        view_span = getattr(request, "trace_view_span", None)
+        if view_span is not None:
+            _local.stack.remove(view_span)
+            view_span.finish()
@@ -16,16 +16,34 @@ Including another URLconf
 from django.conf import settings
 from django.conf.urls import handler404, handler500, url
 from django.conf.urls.static import static
-from django.contrib import admin
-from django.contrib.flatpages import views
-from django.urls import include, path
+from django.contrib.sitemaps import views as sitemap_views
+from django.urls import include, path, re_path
 from django.views.static import serve
 
+from posts.feeds import all_posts, cached_by_watermark
+from posts.sitemaps import SITEMAPS, robots_txt
+
+from . import admission
+from . import views as asset_views
+
+# карта сайта устаревает при любом изменении записей; ?p= — её страница
+cached_sitemap = cached_by_watermark(all_posts, params=("p",))
+
 urlpatterns = [
-    path('about-author/', views.flatpage, {'url': '/about-author/'}, name='about-author'),
-    path('about-spec/', views.flatpage, {'url': '/about-spec/'}, name='about-spec'),
-    path('admin/', admin.site.urls),
-    path('about/', include('django.contrib.flatpages.urls')),
+    path('robots.txt', robots_txt, name='robots_txt'),
+    path('metrics/', admission.metrics, name='metrics'),
+    path(
+        'sitemap.xml',
+        cached_sitemap(sitemap_views.index),
+        {'sitemaps': SITEMAPS, 'sitemap_url_name': 'sitemap'},
+        name='sitemap_index'
+    ),
+    path(
+        'sitemap-<section>.xml',
+        cached_sitemap(sitemap_views.sitemap),
+        {'sitemaps': SITEMAPS},
+        name='sitemap'
+    ),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('', include('posts.urls')),
@@ -35,8 +53,46 @@ urlpatterns = [
 handler404 = "posts.views.page_not_found"  
 handler500 = "posts.views.server_error"  
 
-if settings.DEBUG:
+# Админка и flatpages подключаются, только если установлены (роль full):
+# на узлах ленты их модули даже не импортируются.
+if 'django.contrib.flatpages' in settings.INSTALLED_APPS:
+    from django.contrib.flatpages import views
+
+    urlpatterns[:0] = [
+        path(
+            'about-author/',
+            views.flatpage,
+            {'url': '/about-author/'},
+            name='about-author'
+        ),
+        path(
+            'about-spec/',
+            views.flatpage,
+            {'url': '/about-spec/'},
+            name='about-spec'
+        ),
+        path('about/', include('django.contrib.flatpages.urls')),
+    ]
+
+if 'django.contrib.admin' in settings.INSTALLED_APPS:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
+if 'debug_toolbar' in settings.INSTALLED_APPS:
     import debug_toolbar
+    urlpatterns += (path("__debug__/", include(debug_toolbar.urls)),)
+
+if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += (path("__debug__/", include(debug_toolbar.urls)),)
+elif settings.SERVE_ASSETS:
+    for prefix, root in (
+        (settings.MEDIA_URL, settings.MEDIA_ROOT),
+        (settings.STATIC_URL, settings.STATIC_ROOT),
+    ):
+        urlpatterns.insert(0, re_path(
+            r'^%s(?P<path>.*)$' % prefix.lstrip('/'),
+            asset_views.serve,
+            {'document_root': root}
+        ))
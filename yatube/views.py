@@ -0,0 +1,87 @@
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils._os import safe_join
+from django.views import static
+
+# Хешированное имя: "style.0123456789ab.css" от ManifestStaticFilesStorage,
+# "posts/<sha256>.jpg" от ContentHashedStorage и "cache/ab/cd/<md5>.jpg"
+# от sorl.thumbnail.
+HASHED_NAME_RE = re.compile(r'(^|[./])[0-9a-f]{12,}\.\w+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def cache_control_for(path):
+    """Заголовок Cache-Control для файла по его имени."""
+    if HASHED_NAME_RE.search(path):
+        return IMMUTABLE_CACHE_CONTROL
+    return 'public, max-age=%d' % settings.MUTABLE_ASSETS_MAX_AGE
+
+
+def sendfile_response(path, document_root):
+    """
+    Ответ без тела: файл отдаёт веб-сервер перед Django.
+
+    SENDFILE_BACKEND = 'x-sendfile' передаёт абсолютный путь (Apache,
+    lighttpd), 'x-accel-redirect' — путь во внутреннем location nginx,
+    собранный из SENDFILE_URL_PREFIX и пути внутри document_root.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    fullpath = Path(safe_join(document_root, path))
+    if not fullpath.is_file():
+        raise Http404('"%s" does not exist' % path)
+    content_type, encoding = mimetypes.guess_type(str(fullpath))
+    response = HttpResponse(
+        content_type=content_type or 'application/octet-stream'
+    )
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if settings.SENDFILE_BACKEND == 'x-accel-redirect':
+        prefix = settings.SENDFILE_URL_PREFIX.rstrip('/')
+        root_name = Path(document_root).name
+        response['X-Accel-Redirect'] = f'{prefix}/{root_name}/{path}'
+    else:
+        response['X-Sendfile'] = str(fullpath)
+    return response
+
+
+def compressed_path(request, path, document_root):
+    """
+    Путь к заранее сжатой копии файла (см. CompressedManifestStaticStorage),
+    если клиент принимает gzip и такая копия есть.
+    """
+    if 'gzip' not in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        return None
+    gz_path = path + '.gz'
+    if Path(safe_join(document_root, gz_path)).is_file():
+        return gz_path
+    return None
+
+
+def serve(request, path, document_root=None):
+    """
+    Отдача статики и загрузок с долгоживущими заголовками кеширования.
+
+    Файлы с хешем содержимого в имени кешируются браузером навсегда,
+    остальные — на MUTABLE_ASSETS_MAX_AGE секунд. Сжатая копия файла
+    отдаётся с Content-Encoding: gzip и исходным типом содержимого.
+    """
+    gz_path = compressed_path(request, path, document_root)
+    served_path = gz_path or path
+    if settings.SENDFILE_BACKEND:
+        response = sendfile_response(served_path, document_root)
+    else:
+        response = static.serve(
+            request,
+            served_path,
+            document_root=document_root
+        )
+    if gz_path:
+        response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = cache_control_for(path)
+    return response
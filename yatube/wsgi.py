@@ -13,4 +13,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
+from yatube.startup import timed_setup  # noqa: E402
+
+timed_setup()
 application = get_wsgi_application()